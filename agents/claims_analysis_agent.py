@@ -1,11 +1,18 @@
-from langchain_groq import ChatGroq
 from langchain_core.messages import HumanMessage, SystemMessage
-from typing import List, Dict, Optional, Any, Union
+from typing import List, Dict, Optional, Any, Union, Iterator, Tuple, Iterable
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+import os
 import json
+import time
 import logging
 from datetime import datetime
 from utils.data_loader import DataLoader
 from utils.claims_embedder import ClaimsEmbedder
+from utils.llm_cache import cache_key, get_llm_cache
+from utils.llm_backends import cache_model_name, create_llm
+from utils.policy_rules import required_documents
+from utils.prompt_builder import PromptBuilder, compact_claim, rank_claim_history
+from utils.metrics import record, span, traced
 import numpy as np
 
 # Configure logger
@@ -13,20 +20,53 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class ClaimsAnalysisAgent:
-    def __init__(self, groq_api_key: str, model: str = "mixtral-8x7b-32768"):
+    # Independent sections of a claim analysis, keyed by the method producing each
+    ANALYSIS_SECTIONS = {
+        "analysis": "analyze_claim",
+        "similar_claims": "get_similar_claims",
+        "fraud_indicators": "detect_fraud_indicators",
+        "settlement": "suggest_settlement_amount",
+        "settlement_metrics": "get_settlement_metrics"
+    }
+
+    def __init__(self,
+                 groq_api_key: Optional[str],
+                 model: str = "mixtral-8x7b-32768",
+                 max_concurrent_sections: Optional[int] = None,
+                 use_cache: bool = True,
+                 prompt_token_budget: int = 3000,
+                 history_items: int = 10,
+                 llm=None):
         logger.info("Initializing ClaimsAnalysisAgent")
-        self.llm = ChatGroq(
-            groq_api_key=groq_api_key,
-            model_name=model,
-            temperature=0.3,
-            max_tokens=2048
-        )
+        self.model = model
+        self.temperature = 0.3
+        # Chat model from the configured backend unless one is injected
+        self.llm = llm or create_llm(groq_api_key, model, self.temperature, max_tokens=2048)
+        self.cache_model = cache_model_name(self.llm, model)
+        self.use_cache = use_cache
+        self.llm_cache = get_llm_cache()
+        self.prompt_token_budget = prompt_token_budget
+        self.history_items = history_items
+        self.last_prompt_report: Dict[str, int] = {}
         self.data_loader = DataLoader()
         self.claims_embedder = ClaimsEmbedder()
         self.policy_context = None
         
+        # Bounded pool for running the LLM-backed analysis sections concurrently.
+        # The app shares one agent between every session, so this caps the
+        # sections in flight across the whole server, not per request.
+        if max_concurrent_sections is None:
+            max_concurrent_sections = int(os.getenv("ANALYSIS_WORKERS", "16"))
+        self._section_executor = ThreadPoolExecutor(
+            max_workers=max_concurrent_sections,
+            thread_name_prefix="claim-analysis"
+        )
+        
         # Initialize embeddings with historical data
         self._initialize_embeddings()
+        
+        # Make newly saved claims searchable without a full rebuild
+        self.data_loader.add_save_listener(self._on_claim_saved)
 
     def _ensure_serializable(self, data: Any) -> Union[Dict, List, str, float, int, bool, None]:
         """Convert any non-serializable types to standard Python types"""
@@ -45,17 +85,29 @@ class ClaimsAnalysisAgent:
         """Initialize or load vector stores"""
         try:
             logger.info("Loading claims history for embeddings")
-            claims_data = self.data_loader.load_claims_history()
+            claims_data, position = self.data_loader.load_claims_history_with_position()
             if claims_data:
                 logger.info(f"Found {len(claims_data)} claims in history")
                 if not self.claims_embedder.load_vector_store():
                     logger.info("Creating new vector store for claims")
-                    self.claims_embedder.create_vector_store(claims_data)
+                    self.claims_embedder.create_vector_store(claims_data, position)
+                else:
+                    # Re-embed only claims added, changed or removed since the index was built
+                    self.claims_embedder.sync_claims(claims_data, position)
             else:
                 logger.warning("No claims data found for embeddings")
         except Exception as e:
             logger.error(f"Error initializing embeddings: {str(e)}")
 
+    def _on_claim_saved(self, claim_data: Dict):
+        """Queue a newly saved claim for incremental indexing"""
+        self.claims_embedder.enqueue_claims([claim_data])
+
+    def get_cache_stats(self) -> Dict:
+        """Get this agent's LLM response cache hit and miss counts"""
+        return self.llm_cache.stats()["namespaces"].get("claims_analysis", {"hits": 0, "misses": 0})
+
+    @traced
     def set_policy_context(self, policy_data: Dict):
         """Set the insurance policy context for analysis"""
         try:
@@ -64,125 +116,209 @@ class ClaimsAnalysisAgent:
         except Exception as e:
             logger.error(f"Error setting policy context: {str(e)}")
 
-    def _get_response(self, messages: List[dict]) -> str:
-        """Get response from LLM"""
+    def _add_policy_context(self, messages: List[dict]) -> List[dict]:
+        """Prepend the current policy context to the messages, if one is set"""
+        if self.policy_context:
+            logger.debug("Adding policy context to messages")
+            context_message = SystemMessage(content=f"""You are the Claims Analysis Oracle, a specialized AI system for analyzing insurance claims.
+            
+            Current Policy Information:
+            Policy Type: {self.policy_context.get('policy_type', 'N/A')}
+            Coverage Limits: ${self.policy_context.get('coverage_limit', 0):,.2f}
+            Deductible: ${self.policy_context.get('deductible', 0):,.2f}
+            Policy Status: {self.policy_context.get('status', 'Unknown')}
+            
+            Key Guidelines:
+            1. Analyze claim validity against policy terms
+            2. Check for coverage limits and exclusions
+            3. Identify potential fraud indicators
+            4. Consider claim history patterns
+            5. Recommend optimal settlement approaches
+            """)
+            messages.insert(0, context_message)
+        return messages
+
+    def _get_response(self, messages: List[dict], use_cache: Optional[bool] = None) -> str:
+        """Get response from LLM, served from the response cache when possible"""
         try:
-            if self.policy_context:
-                logger.debug("Adding policy context to messages")
-                context_message = SystemMessage(content=f"""You are the Claims Analysis Oracle, a specialized AI system for analyzing insurance claims.
-                
-                Current Policy Information:
-                Policy Type: {self.policy_context.get('policy_type', 'N/A')}
-                Coverage Limits: ${self.policy_context.get('coverage_limit', 0):,.2f}
-                Deductible: ${self.policy_context.get('deductible', 0):,.2f}
-                Policy Status: {self.policy_context.get('status', 'Unknown')}
-                
-                Key Guidelines:
-                1. Analyze claim validity against policy terms
-                2. Check for coverage limits and exclusions
-                3. Identify potential fraud indicators
-                4. Consider claim history patterns
-                5. Recommend optimal settlement approaches
-                """)
-                messages.insert(0, context_message)
+            messages = self._add_policy_context(messages)
+            
+            use_cache = self.use_cache if use_cache is None else use_cache
+            key = cache_key(self.cache_model, self.temperature, messages)
+            if use_cache:
+                cached = self.llm_cache.get(key, namespace="claims_analysis")
+                if cached is not None:
+                    logger.debug("Serving LLM response from cache")
+                    return cached
             
             logger.debug("Sending request to LLM")
-            response = self.llm.invoke(messages)
+            with span("llm_call"):
+                response = self.llm.invoke(messages)
+            if use_cache:
+                self.llm_cache.put(key, response.content)
             return response.content
         except Exception as e:
             logger.error(f"Error getting LLM response: {str(e)}")
             return f"Error generating response: {str(e)}"
 
+    def _stream_response(self, messages: List[dict], use_cache: Optional[bool] = None) -> Iterator[str]:
+        """Stream the LLM response as text chunks.
+        
+        A cached response is yielded in one piece; otherwise chunks are yielded
+        as the model produces them and the full text is cached once complete.
+        """
+        try:
+            messages = self._add_policy_context(messages)
+            
+            use_cache = self.use_cache if use_cache is None else use_cache
+            key = cache_key(self.cache_model, self.temperature, messages)
+            if use_cache:
+                cached = self.llm_cache.get(key, namespace="claims_analysis")
+                if cached is not None:
+                    logger.debug("Serving LLM response from cache")
+                    yield cached
+                    return
+            
+            logger.debug("Streaming request to LLM")
+            chunks = []
+            start = time.perf_counter()
+            for chunk in self.llm.stream(messages):
+                if chunk.content:
+                    if not chunks:
+                        record("llm_first_token", time.perf_counter() - start)
+                    chunks.append(chunk.content)
+                    yield chunk.content
+            record("llm_call", time.perf_counter() - start)
+            if use_cache:
+                self.llm_cache.put(key, "".join(chunks))
+        except Exception as e:
+            logger.error(f"Error streaming LLM response: {str(e)}")
+            yield f"Error generating response: {str(e)}"
+
+    def run_analysis_sections(self,
+                              claim_details: Dict,
+                              sections: Optional[Iterable[str]] = None) -> Iterator[Tuple[str, Any]]:
+        """Start analysis sections concurrently, returning (section, result) pairs as each finishes.
+        
+        Each LLM round trip runs on the bounded section pool, so wall-clock time
+        approaches the slowest single section instead of their sum. The similar
+        claims search is shared between sections through the retrieval cache.
+        Sections are submitted immediately, so callers can do other work (such
+        as streaming another section) before consuming the results.
+        """
+        futures = self.submit_analysis_sections(claim_details, sections)
+        return ((futures[future], future.result()) for future in as_completed(futures))
+
+    def submit_analysis_sections(self,
+                                 claim_details: Dict,
+                                 sections: Optional[Iterable[str]] = None) -> Dict[Future, str]:
+        """Start analysis sections on the section pool, returning future -> section name"""
+        sections = list(sections or self.ANALYSIS_SECTIONS)
+        logger.info(f"Running {len(sections)} analysis sections for claim {claim_details.get('claim_id', 'unknown')}")
+        
+        return {
+            self._section_executor.submit(getattr(self, self.ANALYSIS_SECTIONS[section]), claim_details): section
+            for section in sections
+        }
+
+    def _analysis_messages(self, claim_details: Dict) -> List[dict]:
+        """Build the messages for a full claim analysis"""
+        logger.info(f"Analyzing claim {claim_details.get('claim_id', 'unknown')}")
+        
+        # Get similar claims using semantic search
+        similar_claims = self.claims_embedder.find_similar_claims(claim_details)
+        logger.info(f"Found {len(similar_claims)} similar claims")
+        
+        # Get policy claim history
+        claim_history = self.data_loader.search_claims(
+            policy_number=claim_details.get('policy_number')
+        )
+        logger.info(f"Found {len(claim_history)} claims in policy history")
+        
+        history_summary = self.data_loader.get_claim_statistics(claim_details.get('policy_number'))
+        
+        # Build a compact prompt within the token budget: the full claim,
+        # the most similar claims, aggregates over the whole policy history
+        # and only the most relevant individual history entries
+        prompt_start = time.perf_counter()
+        prompt = PromptBuilder(self.prompt_token_budget)
+        prompt.add("claim", self._ensure_serializable(claim_details), max_tokens=600)
+        prompt.add_items(
+            "similar_claims",
+            [
+                dict(compact_claim(claim['content']), score=round(claim['similarity_score'], 3))
+                for claim in similar_claims
+            ],
+            max_tokens=self.prompt_token_budget // 3
+        )
+        prompt.add("history_summary", self._ensure_serializable(history_summary), max_tokens=300)
+        prompt.add_items(
+            "recent_history",
+            [
+                compact_claim(claim)
+                for claim in rank_claim_history(claim_history, claim_details, limit=self.history_items)
+            ]
+        )
+        self.last_prompt_report = prompt.report()
+        logger.info(f"Analysis prompt tokens by section: {self.last_prompt_report}")
+        
+        messages = [
+            SystemMessage(content=f"""Analyze this insurance claim thoroughly.
+            
+            Claim Details:
+            {prompt['claim']}
+            
+            Similar Claims History:
+            {prompt['similar_claims']}
+            
+            Policy Claim History Summary:
+            {prompt['history_summary']}
+            
+            Most Relevant Past Claims For This Policy:
+            {prompt['recent_history']}
+            
+            Provide a detailed analysis in the following format:
+            
+            1. 📋 Claim Overview
+               - Basic details review
+               - Initial assessment
+               - Completeness check
+            
+            2. 🔍 Historical Analysis
+               - Similar claims patterns
+               - Policy claim history
+               - Typical outcomes
+            
+            3. ⚠️ Risk Assessment
+               - Policy compliance
+               - Documentation status
+               - Potential issues
+            
+            4. 💰 Cost Analysis
+               - Amount reasonableness
+               - Historical comparisons
+               - Cost factors
+            
+            5. 📊 Settlement Recommendation
+               - Suggested action
+               - Amount recommendation
+               - Justification
+            
+            6. 📝 Processing Notes
+               - Required actions
+               - Timeline estimate
+               - Special considerations
+            """),
+            HumanMessage(content="Please analyze this claim and provide recommendations")
+        ]
+        record("prompt_build", time.perf_counter() - prompt_start)
+        return messages
+
+    @traced
     def analyze_claim(self, claim_details: Dict) -> str:
         """Analyze a new insurance claim and provide recommendations"""
         try:
-            logger.info(f"Analyzing claim {claim_details.get('claim_id', 'unknown')}")
-            
-            # Get similar claims using semantic search
-            similar_claims = self.claims_embedder.find_similar_claims(claim_details)
-            logger.info(f"Found {len(similar_claims)} similar claims")
-            
-            # Convert similar claims to JSON serializable format
-            serializable_similar_claims = []
-            for claim in similar_claims:
-                serializable_claim = {
-                    'content': claim['content'],
-                    'metadata': claim['metadata'],
-                    'similarity_score': float(claim['similarity_score'])  # Convert float32 to float
-                }
-                serializable_similar_claims.append(serializable_claim)
-            
-            # Get policy claim history
-            claim_history = self.data_loader.search_claims(
-                policy_number=claim_details.get('policy_number')
-            )
-            logger.info(f"Found {len(claim_history)} claims in policy history")
-            
-            # Ensure all numeric values are standard Python types
-            serializable_claim_details = {}
-            for key, value in claim_details.items():
-                if hasattr(value, 'dtype'):  # Check if it's a numpy type
-                    serializable_claim_details[key] = float(value)
-                else:
-                    serializable_claim_details[key] = value
-            
-            # Convert claim history to serializable format
-            serializable_history = []
-            for hist_claim in claim_history:
-                serializable_hist_claim = {}
-                for key, value in hist_claim.items():
-                    if hasattr(value, 'dtype'):  # Check if it's a numpy type
-                        serializable_hist_claim[key] = float(value)
-                    else:
-                        serializable_hist_claim[key] = value
-                serializable_history.append(serializable_hist_claim)
-            
-            messages = [
-                SystemMessage(content=f"""Analyze this insurance claim thoroughly.
-                
-                Claim Details:
-                {json.dumps(serializable_claim_details, indent=2)}
-                
-                Similar Claims History:
-                {json.dumps(serializable_similar_claims, indent=2)}
-                
-                Policy Claim History:
-                {json.dumps(serializable_history, indent=2)}
-                
-                Provide a detailed analysis in the following format:
-                
-                1. 📋 Claim Overview
-                   - Basic details review
-                   - Initial assessment
-                   - Completeness check
-                
-                2. 🔍 Historical Analysis
-                   - Similar claims patterns
-                   - Policy claim history
-                   - Typical outcomes
-                
-                3. ⚠️ Risk Assessment
-                   - Policy compliance
-                   - Documentation status
-                   - Potential issues
-                
-                4. 💰 Cost Analysis
-                   - Amount reasonableness
-                   - Historical comparisons
-                   - Cost factors
-                
-                5. 📊 Settlement Recommendation
-                   - Suggested action
-                   - Amount recommendation
-                   - Justification
-                
-                6. 📝 Processing Notes
-                   - Required actions
-                   - Timeline estimate
-                   - Special considerations
-                """),
-                HumanMessage(content="Please analyze this claim and provide recommendations")
-            ]
+            messages = self._analysis_messages(claim_details)
             
             logger.debug("Requesting claim analysis from LLM")
             response = self._get_response(messages)
@@ -193,93 +329,117 @@ class ClaimsAnalysisAgent:
             logger.error(f"Error analyzing claim: {str(e)}")
             return f"Error analyzing claim: {str(e)}"
 
+    @traced
+    def stream_analyze_claim(self, claim_details: Dict) -> Iterator[str]:
+        """Streaming variant of analyze_claim, yielding text chunks as they arrive"""
+        try:
+            messages = self._analysis_messages(claim_details)
+        except Exception as e:
+            logger.error(f"Error analyzing claim: {str(e)}")
+            yield f"Error analyzing claim: {str(e)}"
+            return
+        
+        logger.debug("Streaming claim analysis from LLM")
+        yield from self._stream_response(messages)
+
+    def _similar_claims_messages(self, claim_details: Dict) -> Tuple[Optional[List[dict]], str]:
+        """Build the similar claims summary and the messages for its analysis.
+        
+        Returns (None, message) when there are no similar claims to analyze.
+        """
+        logger.info(f"Searching for claims similar to {claim_details.get('claim_id', 'unknown')}")
+        
+        # Get similar claims using semantic search
+        similar_claims = self.claims_embedder.find_similar_claims(claim_details)
+        
+        if not similar_claims:
+            logger.info("No similar claims found")
+            return None, f"""
+            🔍 No similar claims found for:
+            - Policy: {claim_details.get('policy_number')}
+            - Type: {claim_details.get('claim_type')}
+            
+            This appears to be the first claim of this type for this policy.
+            """
+        
+        logger.info(f"Found {len(similar_claims)} similar claims")
+        
+        # Format claims for analysis
+        prompt_start = time.perf_counter()
+        claims_analysis = []
+        total_amount = 0
+        approval_count = 0
+        
+        for claim in similar_claims:
+            content = claim['content']
+            amount = content.get('amount') or 0.0
+            status = content.get('status') or 'Unknown'
+            
+            total_amount += amount
+            if status.lower() == 'approved':
+                approval_count += 1
+            
+            claims_analysis.append({
+                'claim_id': content.get('claim_id'),
+                'amount': amount,
+                'status': status,
+                'similarity_score': claim['similarity_score']
+            })
+        
+        # Calculate statistics
+        avg_amount = total_amount / len(similar_claims)
+        approval_rate = (approval_count / len(similar_claims)) * 100
+        
+        logger.info(f"Calculated statistics: avg_amount=${avg_amount:.2f}, approval_rate={approval_rate:.1f}%")
+        
+        summary = f"""
+        📊 Similar Claims Analysis
+        
+        Found {len(similar_claims)} similar claims:
+        • Average Amount: ${avg_amount:,.2f}
+        • Approval Rate: {approval_rate:.1f}%
+        
+        Most Similar Claims:
+        """
+        
+        # Add details of each similar claim
+        for claim in claims_analysis[:3]:
+            summary += f"""
+            Claim {claim['claim_id']}:
+            • Amount: ${claim['amount']:,.2f}
+            • Status: {claim['status']}
+            • Similarity: {(1 - claim['similarity_score'])*100:.1f}%
+            """
+        
+        # Add analysis and recommendations
+        messages = [
+            SystemMessage(content=f"""Analyze these similar claims and provide insights.
+            
+            Current Claim:
+            {json.dumps(claim_details, indent=2)}
+            
+            Similar Claims:
+            {json.dumps(claims_analysis, indent=2)}
+            
+            Provide specific insights about:
+            1. Amount patterns
+            2. Approval likelihood
+            3. Processing considerations
+            4. Risk factors
+            """),
+            HumanMessage(content="Analyze similar claims patterns")
+        ]
+        record("prompt_build", time.perf_counter() - prompt_start)
+        
+        return messages, summary
+
+    @traced
     def get_similar_claims(self, claim_details: Dict) -> str:
         """Find and analyze similar historical claims using embeddings"""
         try:
-            logger.info(f"Searching for claims similar to {claim_details.get('claim_id', 'unknown')}")
-            
-            # Get similar claims using semantic search
-            similar_claims = self.claims_embedder.find_similar_claims(claim_details)
-            
-            if not similar_claims:
-                logger.info("No similar claims found")
-                return f"""
-                🔍 No similar claims found for:
-                - Policy: {claim_details.get('policy_number')}
-                - Type: {claim_details.get('claim_type')}
-                
-                This appears to be the first claim of this type for this policy.
-                """
-            
-            logger.info(f"Found {len(similar_claims)} similar claims")
-            
-            # Format claims for analysis
-            claims_analysis = []
-            total_amount = 0
-            approval_count = 0
-            
-            for claim in similar_claims:
-                content = claim['content']
-                amount = float(content.get('Amount', '0').replace('$', '').strip())
-                status = content.get('Status', 'Unknown')
-                
-                total_amount += amount
-                if status.lower() == 'approved':
-                    approval_count += 1
-                
-                # Convert numpy float32 to regular float for JSON serialization
-                similarity_score = float(claim['similarity_score'])
-                
-                claims_analysis.append({
-                    'claim_id': str(content.get('Claim ID')),
-                    'amount': float(amount),
-                    'status': str(status),
-                    'similarity_score': float(similarity_score)
-                })
-            
-            # Calculate statistics
-            avg_amount = total_amount / len(similar_claims)
-            approval_rate = (approval_count / len(similar_claims)) * 100
-            
-            logger.info(f"Calculated statistics: avg_amount=${avg_amount:.2f}, approval_rate={approval_rate:.1f}%")
-            
-            summary = f"""
-            📊 Similar Claims Analysis
-            
-            Found {len(similar_claims)} similar claims:
-            • Average Amount: ${avg_amount:,.2f}
-            • Approval Rate: {approval_rate:.1f}%
-            
-            Most Similar Claims:
-            """
-            
-            # Add details of each similar claim
-            for claim in claims_analysis[:3]:
-                summary += f"""
-                Claim {claim['claim_id']}:
-                • Amount: ${claim['amount']:,.2f}
-                • Status: {claim['status']}
-                • Similarity: {(1 - claim['similarity_score'])*100:.1f}%
-                """
-            
-            # Add analysis and recommendations
-            messages = [
-                SystemMessage(content=f"""Analyze these similar claims and provide insights.
-                
-                Current Claim:
-                {json.dumps(claim_details, indent=2)}
-                
-                Similar Claims:
-                {json.dumps(claims_analysis, indent=2)}
-                
-                Provide specific insights about:
-                1. Amount patterns
-                2. Approval likelihood
-                3. Processing considerations
-                4. Risk factors
-                """),
-                HumanMessage(content="Analyze similar claims patterns")
-            ]
+            messages, summary = self._similar_claims_messages(claim_details)
+            if messages is None:
+                return summary
             
             logger.debug("Requesting similar claims analysis from LLM")
             analysis = self._get_response(messages)
@@ -290,6 +450,25 @@ class ClaimsAnalysisAgent:
             logger.error(f"Error in get_similar_claims: {str(e)}")
             return f"Error finding similar claims: {str(e)}"
 
+    @traced
+    def stream_similar_claims(self, claim_details: Dict) -> Iterator[str]:
+        """Streaming variant of get_similar_claims: the summary first, then the analysis as it arrives"""
+        try:
+            messages, summary = self._similar_claims_messages(claim_details)
+        except Exception as e:
+            logger.error(f"Error in get_similar_claims: {str(e)}")
+            yield f"Error finding similar claims: {str(e)}"
+            return
+        
+        yield summary
+        if messages is None:
+            return
+        
+        yield "\n\n💡 Analysis:\n"
+        logger.debug("Streaming similar claims analysis from LLM")
+        yield from self._stream_response(messages)
+
+    @traced
     def detect_fraud_indicators(self, claim_details: Dict) -> List[str]:
         """Detect potential fraud indicators in a claim"""
         try:
@@ -317,8 +496,7 @@ class ClaimsAnalysisAgent:
             
             if similar_claims:
                 # Calculate average amount from similar claims
-                amounts = [float(claim['content'].get('Amount', '0').replace('$', '').strip()) 
-                          for claim in similar_claims]
+                amounts = [claim['content'].get('amount') or 0.0 for claim in similar_claims]
                 avg_amount = sum(amounts) / len(amounts)
                 
                 if claim_details.get('amount', 0) > avg_amount * 2:
@@ -339,36 +517,13 @@ class ClaimsAnalysisAgent:
             logger.error(f"Error in fraud detection: {str(e)}")
             return ["Error in fraud detection analysis"]
 
+    @traced
     def get_required_documents(self, claim_type: str) -> List[str]:
         """Get list of required documents for a claim type"""
         logger.debug(f"Getting required documents for claim type: {claim_type}")
-        document_requirements = {
-            "Emergency Care": [
-                "Hospital Report",
-                "Medical Bills",
-                "Treatment Records",
-                "Emergency Room Documentation"
-            ],
-            "Prescription": [
-                "Prescription",
-                "Pharmacy Bill",
-                "Doctor's Note"
-            ],
-            "Specialist Visit": [
-                "Referral Letter",
-                "Specialist Report",
-                "Medical Bills",
-                "Treatment Plan"
-            ],
-            "Preventive Care": [
-                "Provider Report",
-                "Medical Bills",
-                "Preventive Care Schedule"
-            ]
-        }
-        
-        return document_requirements.get(claim_type, ["Medical Documentation", "Bills"])
+        return required_documents(claim_type)
     
+    @traced
     def suggest_settlement_amount(self, claim_details: Dict) -> tuple[float, str]:
         """Suggest optimal settlement amount based on similar claims and policy terms"""
         try:
@@ -397,8 +552,8 @@ class ClaimsAnalysisAgent:
             
             for claim in similar_claims:
                 content = claim['content']
-                original_amount = float(content.get('Amount', '0').replace('$', '').strip())
-                settlement_amount = float(content.get('Settlement Amount', '0').replace('$', '').strip() or '0')
+                original_amount = content.get('amount') or 0.0
+                settlement_amount = content.get('settlement_amount') or 0.0
                 
                 if original_amount > 0 and settlement_amount > 0:
                     ratio = settlement_amount / original_amount
@@ -432,8 +587,8 @@ class ClaimsAnalysisAgent:
             # Add details of similar claims settlements
             for i, claim in enumerate(similar_claims[:3], 1):
                 content = claim['content']
-                original = float(content.get('Amount', '0').replace('$', '').strip())
-                settlement = float(content.get('Settlement Amount', '0').replace('$', '').strip() or '0')
+                original = content.get('amount') or 0.0
+                settlement = content.get('settlement_amount') or 0.0
                 if original > 0 and settlement > 0:
                     ratio = settlement / original
                     explanation += f"""
@@ -443,6 +598,7 @@ class ClaimsAnalysisAgent:
                     • Ratio: {ratio:.1%}
                     """
             
+            prompt_start = time.perf_counter()
             messages = [
                 SystemMessage(content=f"""Analyze this settlement recommendation:
                 
@@ -457,6 +613,7 @@ class ClaimsAnalysisAgent:
                 Provide a brief justification for this settlement amount."""),
                 HumanMessage(content="Provide settlement justification")
             ]
+            record("prompt_build", time.perf_counter() - prompt_start)
             
             justification = self._get_response(messages)
             explanation += f"\n\n💭 Justification:\n{justification}"
@@ -469,6 +626,7 @@ class ClaimsAnalysisAgent:
             # Return default values in case of error
             return claim_details.get('amount', 0) * 0.8, f"Error calculating settlement: {str(e)}"
     
+    @traced
     def get_settlement_metrics(self, claim_details: Dict) -> Dict:
         """Get additional settlement metrics and insights"""
         try:
@@ -497,24 +655,16 @@ class ClaimsAnalysisAgent:
                 content = claim['content']
                 
                 # Processing time
-                if 'Processing Time' in content:
-                    try:
-                        processing_time = float(content['Processing Time'])
-                        processing_times.append(processing_time)
-                    except ValueError:
-                        pass
+                if content.get('processing_time') is not None:
+                    processing_times.append(content['processing_time'])
                 
                 # Settlement amounts
-                amount_str = content.get('Settlement Amount', '0').replace('$', '').strip()
-                try:
-                    settlement_amount = float(amount_str)
-                    if settlement_amount > 0:
-                        settlement_amounts.append(settlement_amount)
-                except ValueError:
-                    pass
+                settlement_amount = content.get('settlement_amount')
+                if settlement_amount:
+                    settlement_amounts.append(settlement_amount)
                 
                 # Approval count
-                if content.get('Status', '').lower() == 'approved':
+                if (content.get('status') or '').lower() == 'approved':
                     approved_count += 1
             
             # Calculate final metrics
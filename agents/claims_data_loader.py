@@ -2,11 +2,13 @@ import json
 import os
 from typing import List, Dict
 import logging
+from utils.claims_store import get_claims_store
 
 class ClaimsDataLoader:
     def __init__(self, data_directory: str = "claims_data"):
         self.data_directory = data_directory
         self._ensure_data_directory()
+        self.claims_store = get_claims_store(self.data_directory)
         
     def _ensure_data_directory(self):
         """Create data directory if it doesn't exist"""
@@ -14,17 +16,10 @@ class ClaimsDataLoader:
             os.makedirs(self.data_directory)
             
     def load_claims_history(self) -> List[Dict]:
-        """Load historical claims data from text files"""
+        """Load historical claims data from the claims snapshot and log"""
         claims_data = []
         try:
-            # Load the main claims history file
-            history_file = os.path.join(self.data_directory, "claims_history.txt")
-            if os.path.exists(history_file):
-                with open(history_file, 'r') as f:
-                    claims_data = json.loads(f.read())
-                logging.info(f"Loaded {len(claims_data)} historical claims")
-            else:
-                logging.warning("No claims history file found")
+            claims_data = self.claims_store.claims()
         except Exception as e:
             logging.error(f"Error loading claims history: {str(e)}")
             claims_data = []
@@ -34,12 +29,7 @@ class ClaimsDataLoader:
     def save_new_claim(self, claim_data: Dict):
         """Save a new claim to the history"""
         try:
-            claims_data = self.load_claims_history()
-            claims_data.append(claim_data)
-            
-            history_file = os.path.join(self.data_directory, "claims_history.txt")
-            with open(history_file, 'w') as f:
-                json.dump(claims_data, f, indent=4)
+            self.claims_store.append(claim_data)
                 
             logging.info(f"Saved new claim {claim_data.get('claim_id')}")
         except Exception as e:
@@ -70,25 +60,6 @@ class ClaimsDataLoader:
     
     def get_claim_statistics(self) -> Dict:
         """Calculate statistics from claims history"""
-        claims_data = self.load_claims_history()
-        
-        if not claims_data:
-            return {}
-        
-        total_claims = len(claims_data)
-        approved_claims = len([c for c in claims_data if c['status'] == 'Approved'])
-        total_amount = sum(c['amount'] for c in claims_data)
-        avg_processing_time = sum(c['processing_time'] for c in claims_data) / total_claims
-        
-        return {
-            'total_claims': total_claims,
-            'approved_claims': approved_claims,
-            'approval_rate': (approved_claims / total_claims) * 100 if total_claims > 0 else 0,
-            'total_amount': total_amount,
-            'average_amount': total_amount / total_claims if total_claims > 0 else 0,
-            'average_processing_time': avg_processing_time,
-            'claim_types': {
-                claim_type: len([c for c in claims_data if c['claim_type'] == claim_type])
-                for claim_type in set(c['claim_type'] for c in claims_data)
-            }
-        }
\ No newline at end of file
+        statistics = self.claims_store.statistics()
+        statistics.pop('settled_amount', None)
+        return statistics
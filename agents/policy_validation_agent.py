@@ -1,25 +1,56 @@
-from langchain_groq import ChatGroq
 from langchain_core.messages import HumanMessage, SystemMessage
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator
+import os
 import json
+import time
 import logging
+import threading
 from utils.data_loader import DataLoader
 from utils.policy_embedder import PolicyEmbedder
+from utils.policy_rules import PolicyRules, format_verdict
+from utils.policy_sections import PolicySections
+from utils.llm_cache import cache_key, get_llm_cache
+from utils.llm_backends import cache_model_name, create_llm
+from utils.prompt_builder import PromptBuilder
+from utils.metrics import record, span, timed, traced
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Policy fields that are always relevant when validating a claim
+CORE_POLICY_FIELDS = [
+    "policy_number", "policy_type", "status", "effective_date", "expiration_date",
+    "coverage_limit", "remaining_coverage", "deductible", "network_details",
+    "exclusions", "waiting_periods"
+]
+
 class PolicyValidationAgent:
-    def __init__(self, groq_api_key: str, model: str = "mixtral-8x7b-32768"):
-        self.llm = ChatGroq(
-            groq_api_key=groq_api_key,
-            model_name=model,
-            temperature=0.2,
-            max_tokens=2048
-        )
+    def __init__(self,
+                 groq_api_key: Optional[str],
+                 model: str = "mixtral-8x7b-32768",
+                 use_cache: bool = True,
+                 prompt_token_budget: int = 2500,
+                 llm=None,
+                 use_rules: bool = os.getenv("POLICY_RULES", "1") == "1"):
+        self.model = model
+        self.temperature = 0.2
+        # Chat model from the configured backend unless one is injected
+        self.llm = llm or create_llm(groq_api_key, model, self.temperature, max_tokens=2048)
+        self.cache_model = cache_model_name(self.llm, model)
+        self.use_cache = use_cache
+        self.llm_cache = get_llm_cache()
+        self.prompt_token_budget = prompt_token_budget
+        self.last_prompt_report: Dict[str, int] = {}
         self.data_loader = DataLoader()
         self.policy_embedder = PolicyEmbedder()
         
+        # Clear-cut claims are decided by the policy rules without the LLM;
+        # count how many validations each path served
+        self.use_rules = use_rules
+        self.fast_path_hits = 0
+        self.fast_path_misses = 0
+        self._stats_lock = threading.Lock()
+        
         # Initialize embeddings and load policies
         self._initialize_data()
 
@@ -28,14 +59,21 @@ class PolicyValidationAgent:
         try:
             # Load policies from data loader
             self.policies_data = self.data_loader.load_all_policies()
+            self.policy_sections = PolicySections(self.policies_data)
+            self.policy_rules = PolicyRules(self.policies_data, self.policy_sections)
             
             # Initialize embeddings if we have policy data
             if self.policies_data:
                 if not self.policy_embedder.load_vector_store():
                     self.policy_embedder.create_vector_store(self.policies_data)
+                else:
+                    # Re-embed only policies edited since the index was built
+                    self.policy_embedder.sync_policies(self.policies_data)
         except Exception as e:
             logger.error(f"Error initializing policy data: {str(e)}")
             self.policies_data = {}
+            self.policy_sections = PolicySections({})
+            self.policy_rules = PolicyRules({}, self.policy_sections)
         
     def _load_policies(self) -> Dict:
         """Load policy documents from text files"""
@@ -55,16 +93,81 @@ class PolicyValidationAgent:
             logging.error(f"Error loading policies: {str(e)}")
         return policies
     
-    def _get_response(self, messages: List[dict]) -> str:
+    def _get_response(self, messages: List[dict], use_cache: Optional[bool] = None) -> str:
         try:
-            response = self.llm.invoke(messages)
+            use_cache = self.use_cache if use_cache is None else use_cache
+            key = cache_key(self.cache_model, self.temperature, messages)
+            if use_cache:
+                cached = self.llm_cache.get(key, namespace="policy_validation")
+                if cached is not None:
+                    return cached
+            
+            with span("llm_call"):
+                response = self.llm.invoke(messages)
+            if use_cache:
+                self.llm_cache.put(key, response.content)
             return response.content
         except Exception as e:
             logger.error(f"Error getting LLM response: {str(e)}")
             return f"Error: {str(e)}"
     
+    def _stream_response(self, messages: List[dict], use_cache: Optional[bool] = None) -> Iterator[str]:
+        """Stream the LLM response as text chunks, caching the full text once complete"""
+        try:
+            use_cache = self.use_cache if use_cache is None else use_cache
+            key = cache_key(self.cache_model, self.temperature, messages)
+            if use_cache:
+                cached = self.llm_cache.get(key, namespace="policy_validation")
+                if cached is not None:
+                    yield cached
+                    return
+            
+            chunks = []
+            start = time.perf_counter()
+            for chunk in self.llm.stream(messages):
+                if chunk.content:
+                    if not chunks:
+                        record("llm_first_token", time.perf_counter() - start)
+                    chunks.append(chunk.content)
+                    yield chunk.content
+            record("llm_call", time.perf_counter() - start)
+            if use_cache:
+                self.llm_cache.put(key, "".join(chunks))
+        except Exception as e:
+            logger.error(f"Error streaming LLM response: {str(e)}")
+            yield f"Error: {str(e)}"
+    
+    def get_cache_stats(self) -> Dict:
+        """Get this agent's LLM response cache hit and miss counts"""
+        return self.llm_cache.stats()["namespaces"].get("policy_validation", {"hits": 0, "misses": 0})
+    
+    def get_fast_path_stats(self) -> Dict:
+        """Validations decided by the policy rules (hits) versus sent to the LLM (misses)"""
+        with self._stats_lock:
+            hits, misses = self.fast_path_hits, self.fast_path_misses
+        total = hits + misses
+        return {"hits": hits, "misses": misses, "hit_rate": hits / total if total else 0.0}
+
+    def _select_policy_fields(self, policy_number: str, policy_data: Dict, claim_type: Optional[str]) -> Dict:
+        """Keep the core policy terms and only the sections relevant to the claim type"""
+        selected = {field: policy_data[field] for field in CORE_POLICY_FIELDS if field in policy_data}
+        
+        matched = self.policy_sections.matching(policy_number, claim_type)
+        selected["coverage_details"] = matched["coverage_details"] or policy_data.get("coverage_details", {})
+        for field in ("documentation_requirements", "additional_benefits"):
+            if matched[field]:
+                selected[field] = matched[field]
+        
+        return selected
+    
+    @traced
     def validate_policy(self, policy_number: str, claim_details: Dict) -> Dict:
-        """Validate if a claim is covered under the policy"""
+        """Validate if a claim is covered under the policy.
+        
+        A claim the policy rules settle carries their verdict and is only
+        valid if approved (denied and pended claims are not); claims sent
+        to the LLM are valid once validated, with the verdict in its text.
+        """
         try:
             policy_data = self.policies_data.get(policy_number)
             
@@ -75,22 +178,67 @@ class PolicyValidationAgent:
                     "details": None
                 }
             
-            # Get relevant policy sections using embeddings
-            policy_sections = self.policy_embedder.search_policies(
-                f"coverage details for {claim_details.get('claim_type')}"
+            # Clear-cut claims get a deterministic verdict; only ambiguous
+            # ones (decision "review") are sent to the LLM
+            verdict = None
+            if self.use_rules:
+                with span("rules"):
+                    verdict = self.policy_rules.evaluate(policy_number, claim_details)
+                with self._stats_lock:
+                    if verdict["decision"] == "review":
+                        self.fast_path_misses += 1
+                    else:
+                        self.fast_path_hits += 1
+                if verdict["decision"] != "review":
+                    return {
+                        "valid": verdict["decision"] == "approve",
+                        "policy_data": policy_data,
+                        "validation_details": format_verdict(verdict),
+                        "verdict": verdict,
+                        "fast_path": True
+                    }
+            
+            # The coverage (or benefit) sections for the claim type come from
+            # the section map; only claim types no section matches fall back
+            # to a vector search, and then only over this policy's chunks
+            claim_type = claim_details.get('claim_type')
+            matched = self.policy_sections.matching(policy_number, claim_type)
+            if matched["coverage_details"] or matched["additional_benefits"]:
+                policy_sections = []
+            else:
+                policy_sections = self.policy_embedder.search_policies(
+                    f"coverage details for {claim_type}", policy_number=policy_number
+                )
+            
+            # Compact, budgeted prompt: relevant policy terms first, then the
+            # top retrieved sections, then the claim itself
+            prompt_start = time.perf_counter()
+            prompt = PromptBuilder(self.prompt_token_budget)
+            prompt.add(
+                "policy",
+                self._select_policy_fields(policy_number, policy_data, claim_type),
+                max_tokens=self.prompt_token_budget // 2
             )
+            prompt.add("claim", claim_details, max_tokens=500)
+            prompt.add_items(
+                "policy_sections",
+                [content for content, metadata, score in policy_sections],
+                max_items=3
+            )
+            self.last_prompt_report = prompt.report()
+            logger.info(f"Validation prompt tokens by section: {self.last_prompt_report}")
             
             messages = [
                 SystemMessage(content=f"""You are a Policy Validation Oracle specialized in insurance policy verification.
                 
                 Policy Details:
-                {json.dumps(policy_data, indent=2)}
+                {prompt['policy']}
                 
                 Relevant Policy Sections:
-                {json.dumps(policy_sections, indent=2)}
+                {prompt['policy_sections']}
                 
                 Claim Details:
-                {json.dumps(claim_details, indent=2)}
+                {prompt['claim']}
                 
                 Analyze the claim against the policy terms and provide a structured response including:
                 1. Coverage Verification
@@ -100,13 +248,16 @@ class PolicyValidationAgent:
                 5. Documentation Requirements"""),
                 HumanMessage(content="Validate this claim against the policy terms.")
             ]
+            record("prompt_build", time.perf_counter() - prompt_start)
             
             validation_result = self._get_response(messages)
             
             return {
                 "valid": True,
                 "policy_data": policy_data,
-                "validation_details": validation_result
+                "validation_details": validation_result,
+                "verdict": verdict,
+                "fast_path": False
             }
             
         except Exception as e:
@@ -117,6 +268,7 @@ class PolicyValidationAgent:
                 "details": None
             }
     
+    @traced
     def check_policy_limits(self, policy_number: str, claim_amount: float) -> Dict:
         """Check if claim amount is within policy limits"""
         policy_data = self.policies_data.get(policy_number)
@@ -135,14 +287,27 @@ class PolicyValidationAgent:
             "within_limit": claim_amount <= remaining_coverage
         }
     
+    @traced
     def verify_documentation(self, policy_number: str, claim_type: str, provided_docs: List[str]) -> Dict:
-        """Verify documentation requirements using semantic search"""
+        """Verify documentation requirements against the policy's requirements for the claim type"""
         try:
-            # Search for documentation requirements
-            doc_requirements = self.policy_embedder.search_policies(
-                f"documentation requirements for {claim_type} claims in policy {policy_number}"
+            # The policy's requirement sections for the claim type, else all of
+            # its requirements; policies without any fall back to searching
+            # their own chunks
+            doc_requirements = (
+                self.policy_sections.matching(policy_number, claim_type)["documentation_requirements"]
+                or self.policies_data.get(policy_number, {}).get("documentation_requirements")
             )
+            if not doc_requirements:
+                doc_requirements = {
+                    "related_sections": [
+                        content for content, metadata, score in self.policy_embedder.search_policies(
+                            f"documentation requirements for {claim_type} claims", policy_number=policy_number
+                        )
+                    ]
+                }
             
+            prompt_start = time.perf_counter()
             messages = [
                 SystemMessage(content=f"""Verify documentation completeness.
                 
@@ -158,6 +323,7 @@ class PolicyValidationAgent:
                 3. Additional Requirements"""),
                 HumanMessage(content="Verify documentation completeness")
             ]
+            record("prompt_build", time.perf_counter() - prompt_start)
             
             verification_result = self._get_response(messages)
             
@@ -175,6 +341,25 @@ class PolicyValidationAgent:
                 "policy_requirements": None
             }
     
+    @timed("prompt_build")
+    def _policy_summary_messages(self, policy_data: Dict) -> List[dict]:
+        """Build the messages for a policy summary"""
+        return [
+            SystemMessage(content=f"""Create a clear, concise summary of this insurance policy.
+            
+            Policy Details:
+            {json.dumps(policy_data, indent=2)}
+            
+            Include:
+            1. Coverage Overview
+            2. Key Terms and Conditions
+            3. Important Exclusions
+            4. Claim Requirements
+            5. Coverage Limits"""),
+            HumanMessage(content="Generate a policy summary.")
+        ]
+    
+    @traced
     def get_policy_summary(self, policy_number: str) -> str:
         """Get a human-readable summary of policy terms"""
         try:
@@ -184,23 +369,18 @@ class PolicyValidationAgent:
             if not policy_data:
                 return f"Policy {policy_number} not found"
             
-            messages = [
-                SystemMessage(content=f"""Create a clear, concise summary of this insurance policy.
-                
-                Policy Details:
-                {json.dumps(policy_data, indent=2)}
-                
-                Include:
-                1. Coverage Overview
-                2. Key Terms and Conditions
-                3. Important Exclusions
-                4. Claim Requirements
-                5. Coverage Limits"""),
-                HumanMessage(content="Generate a policy summary.")
-            ]
-            
-            return self._get_response(messages)
+            return self._get_response(self._policy_summary_messages(policy_data))
             
         except Exception as e:
             logger.error(f"Error generating policy summary: {str(e)}")
             return f"Error summarizing policy: {str(e)}"
+    
+    @traced
+    def stream_policy_summary(self, policy_number: str) -> Iterator[str]:
+        """Streaming variant of get_policy_summary, yielding text chunks as they arrive"""
+        policy_data = self.policies_data.get(policy_number)
+        if not policy_data:
+            yield f"Policy {policy_number} not found"
+            return
+        
+        yield from self._stream_response(self._policy_summary_messages(policy_data))
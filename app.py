@@ -5,10 +5,12 @@ import pandas as pd
 import plotly.express as px
 from dotenv import load_dotenv
 import os
-from typing import Dict, List
-from agents.claims_analysis_agent import ClaimsAnalysisAgent
-from agents.policy_validation_agent import PolicyValidationAgent
+import queue
+import threading
+from concurrent.futures import Future, as_completed
+from typing import Callable, Dict, Iterator, List, Tuple
 from utils.data_loader import DataLoader
+from utils.metrics import REGISTRY, start_metrics_server, timed, traced
 import logging
 
 # Configure logging
@@ -65,50 +67,42 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-def initialize_agents():
-    """Initialize all required agents"""
-    if 'claims_agent' not in st.session_state:
-        with st.spinner("Initializing Claims Analysis System..."):
-            try:
-                claims_agent = ClaimsAnalysisAgent(groq_api_key)
-                
-                # Load initial data
-                claims_data = claims_agent.data_loader.load_claims_history()
-                if claims_data:
-                    st.session_state.claims_agent = claims_agent
-                    st.success("Claims Analysis System initialized successfully!")
-                else:
-                    st.error("No claims data found. Please check your data files.")
-                    return
-                    
-            except Exception as e:
-                st.error(f"Error initializing Claims Analysis System: {str(e)}")
-                return
-    
-    if 'policy_agent' not in st.session_state:
-        st.session_state.policy_agent = PolicyValidationAgent(groq_api_key)
+# Heavy resources are built once per server process and shared by every
+# session. The agent modules pull in langchain and the embedding stack, so
+# they are only imported when an agent is first needed.
+@st.cache_resource(show_spinner="Initializing Claims Analysis System...")
+def get_claims_agent():
+    """Get the process-wide claims analysis agent"""
+    from agents.claims_analysis_agent import ClaimsAnalysisAgent
+    return ClaimsAnalysisAgent(groq_api_key)
 
-    if 'claims_agent' not in st.session_state:
-        st.session_state.claims_agent = ClaimsAnalysisAgent(groq_api_key)
-    
-    if 'policy_agent' not in st.session_state:
-        st.session_state.policy_agent = PolicyValidationAgent(groq_api_key)
-    
-    if 'data_loader' not in st.session_state:
-        st.session_state.data_loader = DataLoader()
+@st.cache_resource(show_spinner="Initializing Policy Validation System...")
+def get_policy_agent():
+    """Get the process-wide policy validation agent"""
+    from agents.policy_validation_agent import PolicyValidationAgent
+    return PolicyValidationAgent(groq_api_key)
 
+@st.cache_resource
+def get_data_loader() -> DataLoader:
+    """Get the process-wide data loader"""
+    return DataLoader()
+
+@traced
 def render_historical_analysis():
     """Render historical claims analysis"""
     st.subheader("📊 Historical Claims Analysis")
     
-    # Get claims data using data loader
-    claims_data = st.session_state.data_loader.load_claims_history()
+    # Summary metrics and charts come from running aggregates, so their
+    # cost does not depend on the size of the claims history
+    data_loader = get_data_loader()
+    stats = data_loader.get_claim_statistics()
     
-    if not claims_data:
+    if not stats:
         st.info("No historical claims data available")
         return
     
-    df = pd.DataFrame(claims_data)
+    rollup = data_loader.get_claim_rollup()
+    this_year = data_loader.get_claim_rollup(month_from='2024-01')
     
     # Summary metrics
     col1, col2, col3, col4 = st.columns(4)
@@ -116,29 +110,26 @@ def render_historical_analysis():
     with col1:
         st.metric(
             "Total Claims",
-            len(df),
-            f"{len(df[df['date_filed'] > '2024-01-01'])} this year"
+            stats['total_claims'],
+            f"{this_year['total_claims']} this year"
         )
     
     with col2:
-        approval_rate = (len(df[df['status'] == 'Approved']) / len(df) * 100)
         st.metric(
             "Approval Rate",
-            f"{approval_rate:.1f}%"
+            f"{stats['approval_rate']:.1f}%"
         )
     
     with col3:
-        avg_amount = df['amount'].mean()
         st.metric(
             "Average Claim",
-            f"${avg_amount:,.2f}"
+            f"${stats['average_amount']:,.2f}"
         )
     
     with col4:
-        avg_processing = df['processing_time'].mean()
         st.metric(
             "Avg Processing Time",
-            f"{avg_processing:.1f} days"
+            f"{stats['average_processing_time']:.1f} days"
         )
     
     # Charts
@@ -146,58 +137,66 @@ def render_historical_analysis():
     
     with col1:
         st.subheader("Claims by Type")
-        fig_type = px.pie(df, names='claim_type', values='amount')
+        by_type = rollup['by_type']
+        fig_type = px.pie(
+            names=list(by_type.keys()),
+            values=[totals['amount'] for totals in by_type.values()]
+        )
         st.plotly_chart(fig_type)
     
     with col2:
         st.subheader("Claims Status")
-        status_counts = df['status'].value_counts()
+        status_counts = sorted(
+            rollup['by_status'].items(),
+            key=lambda item: item[1]['count'],
+            reverse=True
+        )
         fig_status = px.bar(
-            x=status_counts.index, 
-            y=status_counts.values,
+            x=[status for status, _ in status_counts], 
+            y=[totals['count'] for _, totals in status_counts],
             title="Claim Status Distribution"
         )
         st.plotly_chart(fig_status)
     
     # Filtering options
+    table = data_loader.claims_store.table()
     st.subheader("🔍 Filter Claims")
     col1, col2, col3 = st.columns(3)
     
     with col1:
         selected_policy = st.selectbox(
             "Filter by Policy",
-            ["All"] + list(df['policy_number'].unique())
+            ["All"] + [v for v in table.policies.values if v is not None]
         )
     
     with col2:
         selected_type = st.selectbox(
             "Filter by Type",
-            ["All"] + list(df['claim_type'].unique())
+            ["All"] + [v for v in table.claim_types.values if v is not None]
         )
     
     with col3:
         selected_status = st.selectbox(
             "Filter by Status",
-            ["All"] + list(df['status'].unique())
+            ["All"] + [v for v in table.statuses.values if v is not None]
         )
     
     # Apply filters
-    filtered_df = df.copy()
-    if selected_policy != "All":
-        filtered_df = filtered_df[filtered_df['policy_number'] == selected_policy]
-    if selected_type != "All":
-        filtered_df = filtered_df[filtered_df['claim_type'] == selected_type]
-    if selected_status != "All":
-        filtered_df = filtered_df[filtered_df['status'] == selected_status]
+    filtered_claims = data_loader.search_claims(
+        policy_number=None if selected_policy == "All" else selected_policy,
+        claim_type=None if selected_type == "All" else selected_type,
+        status=None if selected_status == "All" else selected_status
+    )
+    filtered_df = pd.DataFrame(list(filtered_claims))
     
     # Detailed claims table
     st.subheader("📋 Claims Details")
     st.dataframe(
-        filtered_df[[
+        filtered_df.reindex(columns=[
             'claim_id', 'policy_number', 'claim_type', 
             'amount', 'status', 'settlement_amount', 
             'processing_time', 'date_filed'
-        ]].sort_values('date_filed', ascending=False),
+        ]).sort_values('date_filed', ascending=False),
         use_container_width=True
     )
     
@@ -236,7 +235,7 @@ def render_claim_form():
         
         st.subheader("📎 Required Documents")
         if claim_type:
-            required_docs = st.session_state.claims_agent.get_required_documents(claim_type)
+            required_docs = get_claims_agent().get_required_documents(claim_type)
             doc_cols = st.columns(len(required_docs))
             provided_docs = []
             
@@ -264,87 +263,151 @@ def render_claim_form():
     
     return None
 
+@timed("render")
+def render_settlement(slot, claim_details: Dict, settlement):
+    """Render the suggested settlement panel"""
+    try:
+        suggested_settlement, explanation = settlement
+        
+        with slot.container():
+            st.info(f"""
+            💰 Suggested Settlement:
+            ${suggested_settlement:,.2f}
+            
+            Original Claim: ${claim_details['amount']:,.2f}
+            Settlement Ratio: {(suggested_settlement/claim_details['amount']*100):.1f}%
+            """)
+            
+            with st.expander("📝 Settlement Analysis"):
+                st.markdown(explanation)
+    
+    except Exception as e:
+        slot.error(f"Error calculating settlement: {str(e)}")
+
+@timed("render")
+def render_settlement_metrics(slot, metrics: Dict):
+    """Render the settlement metrics panel"""
+    if not metrics or metrics.get("error"):
+        slot.empty()
+        return
+    
+    with slot.container():
+        st.success("📊 Settlement Metrics")
+        
+        if metrics.get("average_processing_time"):
+            st.metric(
+                "Avg. Processing Time",
+                f"{metrics['average_processing_time']:.1f} days"
+            )
+        
+        if metrics.get("approval_rate"):
+            st.metric(
+                "Approval Rate",
+                f"{metrics['approval_rate']:.1f}%"
+            )
+        
+        if metrics.get("settlement_range"):
+            range_data = metrics["settlement_range"]
+            if all(v is not None for v in range_data.values()):
+                st.write("Settlement Range:")
+                st.write(f"Min: ${range_data['min']:,.2f}")
+                st.write(f"Avg: ${range_data['avg']:,.2f}")
+                st.write(f"Max: ${range_data['max']:,.2f}")
+        
+        if metrics.get("confidence_score"):
+            st.metric(
+                "Confidence Score",
+                f"{metrics['confidence_score']:.2f}"
+            )
+
+@timed("render")
+def render_fraud_indicators(slot, fraud_flags: List[str]):
+    """Render the fraud check panel"""
+    with slot.container():
+        if fraud_flags:
+            st.error("⚠️ Potential Risk Indicators:")
+            for flag in fraud_flags:
+                st.warning(f"• {flag}")
+        else:
+            st.success("✅ No risk indicators detected")
+
+def stream_panels(streams: List[Tuple[object, Iterator[str]]],
+                  section_futures: Dict[Future, str],
+                  render_section: Callable[[str, object], None]):
+    """Stream several narratives into their slots at once, rendering sections as they finish.
+    
+    Each stream is consumed on its own thread and its chunks are queued;
+    only this (the script) thread writes to Streamlit, between chunks it
+    renders whichever sections have completed.
+    """
+    chunks = queue.Queue()
+    
+    def produce(index: int, stream: Iterator[str]):
+        try:
+            for chunk in stream:
+                chunks.put((index, chunk))
+        except Exception as e:
+            chunks.put((index, f"Error generating response: {str(e)}"))
+        finally:
+            chunks.put((index, None))
+    
+    for index, (_, stream) in enumerate(streams):
+        threading.Thread(target=produce, args=(index, stream), daemon=True, name=f"panel-stream-{index}").start()
+    
+    texts = [""] * len(streams)
+    open_streams = len(streams)
+    pending = dict(section_futures)
+    while open_streams:
+        updated = set()
+        try:
+            item = chunks.get(timeout=0.05)
+            while True:
+                index, chunk = item
+                if chunk is None:
+                    open_streams -= 1
+                else:
+                    texts[index] += chunk
+                    updated.add(index)
+                item = chunks.get_nowait()
+        except queue.Empty:
+            pass
+        for index in updated:
+            streams[index][0].markdown(texts[index])
+        
+        for future in [future for future in pending if future.done()]:
+            render_section(pending.pop(future), future.result())
+    
+    for future in as_completed(pending):
+        render_section(pending[future], future.result())
+
+@traced
 def render_claim_analysis(claim_details: Dict):
     """Render claim analysis results"""
     col1, col2 = st.columns([2, 1])
     
+    # Lay out every panel up front, then fill each one as its section finishes
     with col1:
         with st.expander("🔍 Claim Analysis", expanded=True):
-            with st.spinner("Analyzing claim..."):
-                analysis = st.session_state.claims_agent.analyze_claim(claim_details)
-                st.markdown(analysis)
+            analysis_slot = st.empty()
+            analysis_slot.info("Analyzing claim...")
         
         with st.expander("📊 Similar Claims"):
-            with st.spinner("Finding similar claims..."):
-                similar_claims = st.session_state.claims_agent.get_similar_claims(claim_details)
-                st.markdown(similar_claims)
+            similar_slot = st.empty()
+            similar_slot.info("Finding similar claims...")
     
     with col2:
         st.subheader("⚡ Quick Actions")
         
-        # Fraud check
-        with st.spinner("Checking for fraud indicators..."):
-            fraud_flags = st.session_state.claims_agent.detect_fraud_indicators(claim_details)
-            if fraud_flags:
-                st.error("⚠️ Potential Risk Indicators:")
-                for flag in fraud_flags:
-                    st.warning(f"• {flag}")
-            else:
-                st.success("✅ No risk indicators detected")
+        fraud_slot = st.empty()
+        fraud_slot.info("Checking for fraud indicators...")
         
-        # Settlement suggestion
-        with st.spinner("Calculating suggested settlement..."):
-            try:
-                suggested_settlement, explanation = st.session_state.claims_agent.suggest_settlement_amount(claim_details)
-                
-                st.info(f"""
-                💰 Suggested Settlement:
-                ${suggested_settlement:,.2f}
-                
-                Original Claim: ${claim_details['amount']:,.2f}
-                Settlement Ratio: {(suggested_settlement/claim_details['amount']*100):.1f}%
-                """)
-                
-                with st.expander("📝 Settlement Analysis"):
-                    st.markdown(explanation)
-                
-                # Get additional metrics
-                metrics = st.session_state.claims_agent.get_settlement_metrics(claim_details)
-                
-                if metrics and not metrics.get("error"):
-                    st.success("📊 Settlement Metrics")
-                    
-                    if metrics.get("average_processing_time"):
-                        st.metric(
-                            "Avg. Processing Time",
-                            f"{metrics['average_processing_time']:.1f} days"
-                        )
-                    
-                    if metrics.get("approval_rate"):
-                        st.metric(
-                            "Approval Rate",
-                            f"{metrics['approval_rate']:.1f}%"
-                        )
-                    
-                    if metrics.get("settlement_range"):
-                        range_data = metrics["settlement_range"]
-                        if all(v is not None for v in range_data.values()):
-                            st.write("Settlement Range:")
-                            st.write(f"Min: ${range_data['min']:,.2f}")
-                            st.write(f"Avg: ${range_data['avg']:,.2f}")
-                            st.write(f"Max: ${range_data['max']:,.2f}")
-                    
-                    if metrics.get("confidence_score"):
-                        st.metric(
-                            "Confidence Score",
-                            f"{metrics['confidence_score']:.2f}"
-                        )
-                
-            except Exception as e:
-                st.error(f"Error calculating settlement: {str(e)}")
+        settlement_slot = st.empty()
+        settlement_slot.info("Calculating suggested settlement...")
+        
+        metrics_slot = st.empty()
         
         # Document check
-        required_docs = st.session_state.claims_agent.get_required_documents(claim_details['claim_type'])
+        required_docs = get_claims_agent().get_required_documents(claim_details['claim_type'])
         provided_docs = claim_details.get('documents_provided', [])
         missing_docs = set(required_docs) - set(provided_docs)
         
@@ -354,21 +417,97 @@ def render_claim_analysis(claim_details: Dict):
                 st.markdown(f"• {doc}")
         else:
             st.success("📎 All required documents provided")
+    
+    # Quick actions run in the background while the two LLM narratives
+    # stream into their panels token by token, all at the same time
+    agent = get_claims_agent()
+    section_futures = agent.submit_analysis_sections(
+        claim_details,
+        sections=["fraud_indicators", "settlement", "settlement_metrics"]
+    )
+    
+    def render_section(section: str, result):
+        if section == "fraud_indicators":
+            render_fraud_indicators(fraud_slot, result)
+        elif section == "settlement":
+            render_settlement(settlement_slot, claim_details, result)
+        elif section == "settlement_metrics":
+            render_settlement_metrics(metrics_slot, result)
+    
+    stream_panels(
+        [
+            (analysis_slot, agent.stream_analyze_claim(claim_details)),
+            (similar_slot, agent.stream_similar_claims(claim_details))
+        ],
+        section_futures,
+        render_section
+    )
+
+def render_metrics():
+    """Render per-stage latency metrics for debugging slow analyses"""
+    st.subheader("⏱️ Metrics")
+    
+    rows = REGISTRY.summary()
+    if not rows:
+        st.info("No timings recorded yet. Run a claim analysis first.")
+    else:
+        metrics_df = pd.DataFrame(rows)
+        st.dataframe(
+            metrics_df.style.format({
+                "mean_ms": "{:,.1f}",
+                "p50_ms": "{:,.1f}",
+                "p95_ms": "{:,.1f}",
+                "p99_ms": "{:,.1f}"
+            }),
+            hide_index=True
+        )
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**LLM response cache**")
+        st.json({
+            "claims_analysis": get_claims_agent().get_cache_stats(),
+            "policy_validation": get_policy_agent().get_cache_stats()
+        })
+        st.markdown("**Policy validation rules fast path**")
+        st.json(get_policy_agent().get_fast_path_stats())
+    with col2:
+        embedder = get_claims_agent().claims_embedder
+        st.markdown("**Similar-claims retrieval cache**")
+        st.json({"hits": embedder.retrieval_hits, "misses": embedder.retrieval_misses})
+    
+    with st.expander("Prometheus exposition"):
+        st.code(REGISTRY.render_prometheus(), language="text")
+    
+    if st.button("Reset metrics"):
+        REGISTRY.reset()
+        st.rerun()
 
 def main():
     st.title("🏥 Xtended Meridian")
     
-    # Initialize agents
-    initialize_agents()
+    # Prometheus endpoint, when METRICS_PORT is set
+    start_metrics_server()
     
     # Sidebar navigation
     st.sidebar.title("Navigation")
     page = st.sidebar.radio(
         "Select Page",
-        ["Claim Analysis", "Historical Analysis", "Policy Lookup"]
+        ["Claim Analysis", "Historical Analysis", "Policy Lookup", "Metrics"]
     )
     
     if page == "Claim Analysis":
+        # Running aggregates: O(1), unlike copying the whole history each rerun
+        if not get_data_loader().get_claim_statistics().get('total_claims'):
+            st.error("No claims data found. Please check your data files.")
+            return
+        
+        try:
+            get_claims_agent()
+        except Exception as e:
+            st.error(f"Error initializing Claims Analysis System: {str(e)}")
+            return
+        
         claim_details = render_claim_form()
         if claim_details:
             render_claim_analysis(claim_details)
@@ -382,14 +521,18 @@ def main():
         
         if st.button("Look Up Policy"):
             if policy_number:
-                policy_summary = st.session_state.policy_agent.get_policy_summary(policy_number)
-                st.markdown(policy_summary)
+                st.write_stream(get_policy_agent().stream_policy_summary(policy_number))
             else:
                 st.error("Please enter a policy number")
+    
+    elif page == "Metrics":
+        render_metrics()
 
 if __name__ == "__main__":
-    if not groq_api_key:
-        st.error("GROQ_API_KEY not found in environment variables. Please add it to your .env file.")
+    from utils.llm_backends import is_offline_backend
+    
+    if not groq_api_key and not is_offline_backend():
+        st.error("GROQ_API_KEY not found in environment variables. Please add it to your .env file, or set LLM_BACKEND=replay or LLM_BACKEND=synthetic to run offline.")
         st.stop()
     
     main()
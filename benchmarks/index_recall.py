@@ -0,0 +1,167 @@
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.run_benchmarks import measure
+from benchmarks.synthetic_data import generate_claims, sample_claims
+from benchmarks.hash_embeddings import HashEmbeddings
+from utils.faiss_index import build_index, factory_string, index_params, set_search_params
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EF_SEARCH_SWEEP = (16, 32, 64, 128, 256)
+NPROBE_SWEEP = (1, 4, 16, 64, 256)
+
+
+def gaussian_vectors(n: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """Normalized vectors drawn around random cluster centres, like embeddings of related claims"""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100000):
+        stop = min(n, start + 100000)
+        labels = rng.integers(clusters, size=stop - start)
+        vectors[start:stop] = centres[labels] + 0.5 * rng.standard_normal((stop - start, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def claim_vectors(n: int, queries: int, dim: int, seed: int):
+    """Hashed embeddings of synthetic claims (corpus) and of fresh query claims"""
+    embeddings = HashEmbeddings(dim)
+    n_policies = max(10, n // 100)
+
+    def embed(claims) -> np.ndarray:
+        return np.array([
+            embeddings.embed_query(
+                f"{claim['policy_number']} {claim['claim_type']} {claim['status']} {claim['description']}"
+            )
+            for claim in claims
+        ], dtype=np.float32)
+
+    return embed(generate_claims(n, n_policies, seed)), embed(sample_claims(queries, n_policies, seed + 1))
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    """Fraction of the exact k nearest neighbours the index returned"""
+    k = truth.shape[1]
+    hits = sum(len(set(row[row >= 0]) & set(exact)) for row, exact in zip(found, truth))
+    return hits / (k * len(truth))
+
+
+def evaluate(name: str, index: faiss.Index, build_seconds: float, queries: np.ndarray,
+             truth: np.ndarray, k: int, **search_params) -> Dict:
+    """Recall against the flat results and single-query latency of one search setting"""
+    set_search_params(index, **search_params)
+    _, found = index.search(queries, k)
+    # One query at a time, as find_similar_claims searches
+    latency = measure([lambda query=query: index.search(query[None, :], k) for query in queries])
+    return {
+        "index": name,
+        "params": ", ".join(f"{key}={value}" for key, value in search_params.items()) or "-",
+        "recall": recall_at_k(found, truth),
+        "p50_ms": latency["p50_ms"],
+        "p95_ms": latency["p95_ms"],
+        "qps": latency["throughput_per_s"],
+        "build_s": build_seconds,
+        "size_mb": faiss.serialize_index(index).nbytes / 2**20
+    }
+
+
+def timed_build(index_type: str, vectors: np.ndarray, params: Dict):
+    start = time.perf_counter()
+    index = build_index(index_type, vectors, params)
+    return index, time.perf_counter() - start
+
+
+def run_report(vectors: np.ndarray, queries: np.ndarray, k: int,
+               hnsw_params: Optional[Dict] = None, ivfpq_params: Optional[Dict] = None) -> List[Dict]:
+    """Recall@k and latency of HNSW and IVF-PQ search settings against the exact flat index"""
+    n, dim = vectors.shape
+    rows = []
+
+    flat, seconds = timed_build("flat", vectors, {})
+    _, truth = flat.search(queries, k)
+    rows.append(evaluate("Flat", flat, seconds, queries, truth, k))
+    del flat
+
+    params = index_params("hnsw", hnsw_params)
+    hnsw, seconds = timed_build("hnsw", vectors, params)
+    name = factory_string("hnsw", dim, n, params)
+    for ef_search in EF_SEARCH_SWEEP:
+        rows.append(evaluate(name, hnsw, seconds, queries, truth, k, ef_search=max(ef_search, k)))
+    del hnsw
+
+    params = index_params("ivfpq", ivfpq_params)
+    ivfpq, seconds = timed_build("ivfpq", vectors, params)
+    name = factory_string("ivfpq", dim, n, params)
+    nlist = faiss.extract_index_ivf(ivfpq).nlist
+    for nprobe in NPROBE_SWEEP:
+        if nprobe <= nlist:
+            rows.append(evaluate(name, ivfpq, seconds, queries, truth, k, nprobe=nprobe))
+    return rows
+
+
+def format_report(rows: List[Dict], k: int) -> str:
+    header = (f"{'index':<22}{'search':<16}{f'recall@{k}':>10}{'p50 ms':>10}{'p95 ms':>10}"
+              f"{'qps':>10}{'build s':>10}{'size MB':>10}")
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        lines.append(
+            f"{row['index']:<22}{row['params']:<16}{row['recall']:>10.3f}{row['p50_ms']:>10.3f}"
+            f"{row['p95_ms']:>10.3f}{row['qps']:>10.0f}{row['build_s']:>10.1f}{row['size_mb']:>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Recall versus latency of HNSW and IVF-PQ against a flat index")
+    parser.add_argument("--vectors", type=int, default=100000, help="corpus size")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5, help="neighbours per query (find_similar_claims default)")
+    parser.add_argument("--source", choices=["gaussian", "claims"], default="gaussian",
+                        help="gaussian: clustered random vectors; claims: hashed synthetic claims")
+    parser.add_argument("--dim", type=int, default=768, help="vector dimension")
+    parser.add_argument("--clusters", type=int, default=1000, help="gaussian source cluster count")
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--nlist", type=int, default=None, help="IVF lists (default about 4 * sqrt(n))")
+    parser.add_argument("--pq-m", type=int, default=None, help="PQ sub-quantizers (default dim / 8)")
+    parser.add_argument("--refine", action="store_true", help="re-rank IVF-PQ candidates with full vectors")
+    parser.add_argument("--k-factor", type=int, default=4, help="candidates re-ranked per result with --refine")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report rows as JSON here")
+    args = parser.parse_args(argv)
+
+    logger.info(f"Generating {args.vectors} {args.source} vectors of dimension {args.dim}")
+    if args.source == "claims":
+        vectors, queries = claim_vectors(args.vectors, args.queries, args.dim, args.seed)
+    else:
+        vectors = gaussian_vectors(args.vectors + args.queries, args.dim, args.clusters, args.seed)
+        vectors, queries = vectors[:args.vectors], vectors[args.vectors:]
+
+    rows = run_report(
+        vectors, queries, args.k,
+        hnsw_params={"M": args.hnsw_m, "ef_construction": args.ef_construction},
+        ivfpq_params={"nlist": args.nlist, "pq_m": args.pq_m, "refine": args.refine, "k_factor": args.k_factor}
+    )
+    print(format_report(rows, args.k))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,346 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import resource
+import tempfile
+import threading
+import logging
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic_data import CLAIM_TYPES, STATUSES, policy_number, sample_claims, write_dataset
+from benchmarks.hash_embeddings import HashEmbeddings
+from utils.faiss_index import INDEX_TYPES
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def _current_rss() -> int:
+    """Resident set size of this process in bytes"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is in KiB on Linux; the best available fallback
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class PeakRSS:
+    """Samples RSS on a background thread while a block runs"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = _current_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _current_rss())
+
+
+def measure(calls: List[Callable[[], object]], items_per_call: int = 1) -> Dict:
+    """Run each call once, reporting latency percentiles, throughput and peak RSS"""
+    latencies = []
+    with PeakRSS() as rss:
+        start = time.perf_counter()
+        for call in calls:
+            call_start = time.perf_counter()
+            call()
+            latencies.append(time.perf_counter() - call_start)
+        elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "samples": len(latencies),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "mean_ms": float(latencies_ms.mean()),
+        "throughput_per_s": len(calls) * items_per_call / elapsed if elapsed > 0 else 0.0,
+        "peak_rss_mb": rss.peak / 2**20
+    }
+
+
+def _random_filters(rng: random.Random, n_policies: int) -> Dict:
+    """A random mix of the filters the Historical Analysis page applies"""
+    filters = {}
+    if rng.random() < 0.6:
+        filters["policy_number"] = policy_number(rng.randrange(n_policies))
+    if rng.random() < 0.5:
+        filters["claim_type"] = rng.choice(list(CLAIM_TYPES))
+    if rng.random() < 0.4:
+        filters["status"] = rng.choice(STATUSES)
+    if rng.random() < 0.3:
+        filters["min_amount"] = rng.choice([100.0, 500.0, 1000.0])
+    if rng.random() < 0.3:
+        month = rng.randint(1, 12)
+        filters["date_from"] = f"2023-{month:02d}-01"
+        filters["date_to"] = f"2024-{month:02d}-28"
+    return filters
+
+
+def run_benchmarks(n_claims: int,
+                   n_policies: int,
+                   queries: int = 200,
+                   embedder: str = "hash",
+                   index_claims: Optional[int] = None,
+                   build_repeats: int = 3,
+                   seed: int = 0,
+                   workspace: Optional[str] = None,
+                   index_type: str = "flat") -> Dict[str, Dict]:
+    """Run every benchmark against a fresh synthetic dataset in workspace"""
+    from utils.data_loader import DataLoader
+    from utils.claims_embedder import ClaimsEmbedder
+    from utils.policy_embedder import PolicyEmbedder
+    from utils.policy_rules import PolicyRules
+    from utils.policy_sections import PolicySections
+
+    # The embedders keep their stores under a relative vector_stores/ path
+    os.chdir(workspace)
+    data_dir = os.path.join(workspace, "data")
+    write_dataset(data_dir, n_claims, n_policies, seed)
+    rng = random.Random(seed)
+    results = {}
+
+    loader = DataLoader(data_dir)
+    claims = []
+    results["load_claims_history"] = measure(
+        [lambda: claims.append(loader.load_claims_history())], items_per_call=n_claims
+    )
+    claims = claims[0]
+    logger.info(f"Loaded {len(claims)} claims")
+
+    results["search_claims"] = measure([
+        lambda filters=_random_filters(rng, n_policies): loader.search_claims(**filters)
+        for _ in range(queries)
+    ])
+
+    results["get_claim_statistics"] = measure([
+        lambda policy=(policy_number(rng.randrange(n_policies)) if rng.random() < 0.9 else None):
+            loader.get_claim_statistics(policy)
+        for _ in range(queries)
+    ])
+
+    claims_embedder = ClaimsEmbedder(index_type=index_type)
+    policy_embedder = PolicyEmbedder()
+    if embedder == "hash":
+        claims_embedder.embeddings = policy_embedder.embeddings = HashEmbeddings()
+        claims_embedder.embed_workers = policy_embedder.embed_workers = 1
+
+    indexed = claims if index_claims is None else claims[:index_claims]
+    results["create_claims_vector_store"] = measure(
+        [lambda: claims_embedder.create_vector_store(indexed)] * build_repeats, items_per_call=len(indexed)
+    )
+
+    results["find_similar_claims"] = measure([
+        lambda claim=claim: claims_embedder.find_similar_claims(claim)
+        for claim in sample_claims(queries, n_policies, seed)
+    ])
+
+    results["find_similar_claims_by_type"] = measure([
+        lambda claim=claim: claims_embedder.find_similar_claims(claim, claim_type=claim["claim_type"])
+        for claim in sample_claims(queries, n_policies, seed + 2)
+    ])
+
+    results["find_similar_claims_by_policy"] = measure([
+        lambda claim=claim: claims_embedder.find_similar_claims(claim, policy_number=claim["policy_number"])
+        for claim in sample_claims(queries, n_policies, seed + 3)
+    ])
+
+    policies = loader.load_all_policies()
+    results["create_policy_vector_store"] = measure(
+        [lambda: policy_embedder.create_vector_store(policies)] * build_repeats, items_per_call=len(policies)
+    )
+
+    results["search_policies"] = measure([
+        lambda claim=claim: policy_embedder.search_policies(
+            f"{claim['claim_type']} {claim['description']}"
+        )
+        for claim in sample_claims(queries, n_policies, seed + 1)
+    ])
+
+    results["search_policies_by_policy"] = measure([
+        lambda claim=claim: policy_embedder.search_policies(
+            f"coverage details for {claim['claim_type']}", policy_number=claim["policy_number"]
+        )
+        for claim in sample_claims(queries, n_policies, seed + 4)
+    ])
+
+    sections = PolicySections(policies)
+    results["policy_section_lookup"] = measure([
+        lambda claim=claim: sections.matching(claim["policy_number"], claim["claim_type"])
+        for claim in sample_claims(queries, n_policies, seed + 5)
+    ])
+
+    rules = PolicyRules(policies, sections)
+    verdicts = []
+    results["policy_rules_evaluate"] = measure([
+        lambda claim=claim: verdicts.append(rules.evaluate(claim["policy_number"], claim))
+        for claim in sample_claims(queries, n_policies, seed + 6)
+    ])
+    decided = sum(verdict["decision"] != "review" for verdict in verdicts)
+    logger.info(f"Policy rules decided {decided} of {len(verdicts)} claims without the LLM "
+                f"({decided / max(1, len(verdicts)):.0%} fast-path hit rate)")
+
+    return results
+
+
+def config_key(n_claims: int, n_policies: int, embedder: str, index_type: str = "flat") -> str:
+    key = f"{n_claims}_claims/{n_policies}_policies/{embedder}"
+    return key if index_type == "flat" else f"{key}/{index_type}"
+
+
+def compare(results: Dict[str, Dict],
+            baseline: Dict[str, Dict],
+            tolerance: float,
+            min_delta_ms: float = 1.0) -> List[str]:
+    """Regressions versus a baseline: median latency up or throughput down by more than tolerance.
+
+    Changes smaller than min_delta_ms of latency are treated as timer noise.
+    """
+    regressions = []
+    for operation, metrics in results.items():
+        reference = baseline.get(operation)
+        if not reference:
+            continue
+        if metrics["mean_ms"] - reference["mean_ms"] < min_delta_ms and \
+                metrics["p50_ms"] - reference["p50_ms"] < min_delta_ms:
+            continue
+        if metrics["p50_ms"] > reference["p50_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{operation}: p50 {metrics['p50_ms']:.2f}ms vs baseline {reference['p50_ms']:.2f}ms"
+            )
+        if metrics["throughput_per_s"] < reference["throughput_per_s"] * (1 - tolerance):
+            regressions.append(
+                f"{operation}: throughput {metrics['throughput_per_s']:.1f}/s "
+                f"vs baseline {reference['throughput_per_s']:.1f}/s"
+            )
+    return regressions
+
+
+def format_table(results: Dict[str, Dict]) -> str:
+    header = f"{'operation':<30}{'n':>6}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'items/s':>13}{'peak MB':>10}"
+    lines = [header, "-" * len(header)]
+    for operation, m in results.items():
+        lines.append(
+            f"{operation:<30}{m['samples']:>6}{m['p50_ms']:>11.2f}{m['p95_ms']:>11.2f}"
+            f"{m['p99_ms']:>11.2f}{m['throughput_per_s']:>13.1f}{m['peak_rss_mb']:>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+def format_deltas(results: Dict[str, Dict], baseline: Dict[str, Dict]) -> str:
+    header = f"{'operation':<30}{'base p50':>11}{'p50 ms':>11}{'delta':>9}{'base items/s':>15}{'items/s':>13}{'delta':>9}"
+    lines = [header, "-" * len(header)]
+    for operation, m in results.items():
+        reference = baseline.get(operation)
+        if not reference:
+            continue
+        p50_delta = (m["p50_ms"] / reference["p50_ms"] - 1) if reference["p50_ms"] else 0.0
+        throughput_delta = (m["throughput_per_s"] / reference["throughput_per_s"] - 1) \
+            if reference["throughput_per_s"] else 0.0
+        lines.append(
+            f"{operation:<30}{reference['p50_ms']:>11.2f}{m['p50_ms']:>11.2f}{p50_delta:>+9.0%}"
+            f"{reference['throughput_per_s']:>15.1f}{m['throughput_per_s']:>13.1f}{throughput_delta:>+9.0%}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the claims data and retrieval paths on synthetic data")
+    parser.add_argument("--claims", type=int, default=10000, help="synthetic claims to generate (1k to 1M)")
+    parser.add_argument("--policies", type=int, default=100, help="synthetic policies to generate (10 to 100k)")
+    parser.add_argument("--queries", type=int, default=200, help="calls per query benchmark")
+    parser.add_argument("--embedder", choices=["hash", "model"], default="hash",
+                        help="hash: fast deterministic stand-in; model: the real sentence-transformer")
+    parser.add_argument("--index-claims", type=int, default=None, help="index only the first N claims")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="flat", help="FAISS index for claims")
+    parser.add_argument("--build-repeats", type=int, default=3, help="runs of each vector store build")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="ignore latency changes smaller than this")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--keep-workspace", action="store_true")
+    args = parser.parse_args(argv)
+
+    # Per-call INFO logging from the code under test would dominate the timings
+    logging.getLogger().setLevel(logging.WARNING)
+    logger.setLevel(logging.INFO)
+
+    workspace = tempfile.mkdtemp(prefix="claims-bench-")
+    cwd = os.getcwd()
+    try:
+        results = run_benchmarks(
+            args.claims, args.policies, args.queries, args.embedder, args.index_claims,
+            args.build_repeats, args.seed, workspace, args.index_type
+        )
+    finally:
+        os.chdir(cwd)
+        if args.keep_workspace:
+            logger.info(f"Benchmark workspace kept at {workspace}")
+        else:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    print(format_table(results))
+    print(f"process peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    key = config_key(args.claims, args.policies, args.embedder, args.index_type)
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+
+    if args.save_baseline:
+        baselines[key] = results
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Saved baseline for {key} to {args.baseline}")
+        return 0
+
+    if key not in baselines:
+        print(f"No baseline for {key}; run with --save-baseline to record one")
+        return 0
+
+    print(f"Versus baseline for {key}:")
+    print(format_deltas(results, baselines[key]))
+    regressions = compare(results, baselines[key], args.tolerance, args.min_delta_ms)
+    if regressions:
+        print(f"Regressions versus baseline ({args.tolerance:.0%} tolerance):")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print(f"No regressions versus baseline ({args.tolerance:.0%} tolerance)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
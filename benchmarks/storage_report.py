@@ -0,0 +1,162 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import logging
+import multiprocessing
+from typing import Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.run_benchmarks import measure
+from benchmarks.synthetic_data import generate_claims, sample_claims
+from benchmarks.hash_embeddings import HashEmbeddings
+from utils.faiss_index import INDEX_TYPES, STORAGE_TYPES
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _rss_mb() -> Dict[str, float]:
+    """Private (anonymous) and file-backed resident memory of this process in MB"""
+    rss = {"private": 0.0, "shared": 0.0}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("RssAnon:"):
+                rss["private"] = int(line.split()[1]) / 1024
+            elif line.startswith("RssFile:"):
+                rss["shared"] = int(line.split()[1]) / 1024
+    return rss
+
+
+def _embedder(workspace: str, index_type: str, storage: str, mmap: bool, dim: int):
+    from utils.claims_embedder import ClaimsEmbedder
+
+    os.chdir(workspace)
+    embedder = ClaimsEmbedder(index_type=index_type, vector_storage=storage, mmap_index=mmap, embed_workers=1)
+    embedder.embeddings = HashEmbeddings(dim)
+    embedder.model_name = embedder.embeddings.model_name
+    return embedder
+
+
+def _measure_mode(workspace: str, index_type: str, storage: str, mmap: bool, dim: int,
+                  queries: np.ndarray, truth: np.ndarray, k: int) -> Dict:
+    """Load one store in this (fresh) process and measure its memory and search latency"""
+    logging.getLogger().setLevel(logging.WARNING)
+    embedder = _embedder(workspace, index_type, storage, mmap, dim)
+
+    before = _rss_mb()
+    if not embedder.load_vector_store():
+        raise RuntimeError(f"Could not load the {storage} store in {workspace}")
+    loaded = _rss_mb()
+
+    index = embedder.vector_store.index
+    _, found = index.search(queries, k)
+    latency = measure([lambda query=query: index.search(query[None, :], k) for query in queries])
+    searched = _rss_mb()
+
+    hits = sum(len(set(row) & set(exact)) for row, exact in zip(found, truth))
+    return {
+        "storage": storage,
+        "load": "mmap" if mmap else "memory",
+        "index_mb": os.path.getsize(os.path.join(embedder.vector_store_path, "index.faiss")) / 2**20,
+        "private_load_mb": loaded["private"] - before["private"],
+        "private_mb": searched["private"] - before["private"],
+        "shared_mb": searched["shared"] - before["shared"],
+        "recall": hits / truth.size,
+        "p50_ms": latency["p50_ms"],
+        "p95_ms": latency["p95_ms"]
+    }
+
+
+def run_report(n_claims: int, queries: int, k: int, index_type: str, dim: int,
+               storages: List[str], seed: int, workspace: str) -> List[Dict]:
+    """Build a store per storage mode, then load each in memory and memory-mapped in fresh processes"""
+    claims = list(generate_claims(n_claims, max(10, n_claims // 100), seed))
+    embeddings = HashEmbeddings(dim)
+    query_vectors = np.array(
+        embeddings.embed_documents([
+            f"{claim['claim_type']} {claim['description']}"
+            for claim in sample_claims(queries, max(10, n_claims // 100), seed + 1)
+        ]),
+        dtype=np.float32
+    )
+
+    context = multiprocessing.get_context("spawn")
+    truth = None
+    rows = []
+    for storage in storages:
+        store_dir = os.path.join(workspace, storage)
+        os.makedirs(store_dir, exist_ok=True)
+        logger.info(f"Building {index_type} store with {storage} vectors")
+        _embedder(store_dir, index_type, storage, False, dim).create_vector_store(claims)
+
+        if truth is None:
+            # Exact neighbours over the full-precision vectors of the first store
+            import faiss
+            from utils.vector_store_io import load_vector_store
+            exact = faiss.IndexFlatL2(dim)
+            store = load_vector_store(os.path.join(store_dir, "vector_stores", "claims_vectors"), embeddings)
+            exact.add(store.index.reconstruct_n(0, store.index.ntotal))
+            _, truth = exact.search(query_vectors, k)
+            del store, exact
+
+        for mmap in (False, True):
+            with context.Pool(1) as pool:
+                rows.append(pool.apply(
+                    _measure_mode, (store_dir, index_type, storage, mmap, dim, query_vectors, truth, k)
+                ))
+    return rows
+
+
+def format_report(rows: List[Dict], k: int) -> str:
+    header = (f"{'storage':<10}{'load':<8}{'file MB':>9}{'private MB':>12}{'shared MB':>11}"
+              f"{f'recall@{k}':>10}{'p50 ms':>9}{'p95 ms':>9}")
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        lines.append(
+            f"{row['storage']:<10}{row['load']:<8}{row['index_mb']:>9.1f}{row['private_mb']:>12.1f}"
+            f"{row['shared_mb']:>11.1f}{row['recall']:>10.3f}{row['p50_ms']:>9.3f}{row['p95_ms']:>9.3f}"
+        )
+    lines.append("private MB is per process; shared MB is page cache that every worker mapping the index reuses")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="RSS and search latency of each vector storage and load mode")
+    parser.add_argument("--claims", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="flat")
+    parser.add_argument("--dim", type=int, default=768, help="hashed embedding dimension")
+    parser.add_argument("--storage", nargs="+", choices=STORAGE_TYPES, default=list(STORAGE_TYPES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report rows as JSON here")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logger.setLevel(logging.INFO)
+
+    workspace = tempfile.mkdtemp(prefix="claims-storage-")
+    cwd = os.getcwd()
+    try:
+        rows = run_report(
+            args.claims, args.queries, args.k, args.index_type, args.dim, args.storage, args.seed, workspace
+        )
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    print(format_report(rows, args.k))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
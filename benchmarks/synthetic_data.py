@@ -0,0 +1,180 @@
+import os
+import json
+import random
+import logging
+from datetime import date, timedelta
+from typing import Dict, Iterator, List
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Value pools mirroring data/claims_data/claims_history.txt and
+# data/policies_data/policies.txt
+CLAIM_TYPES = {
+    "Emergency Care": (
+        ["Emergency room visit for acute appendicitis", "Emergency treatment for fractured wrist",
+         "ER visit for severe allergic reaction", "Emergency care for chest pain evaluation"],
+        ["Hospital Report", "Medical Bills", "Treatment Records", "Emergency Room Documentation"]
+    ),
+    "Prescription": (
+        ["Monthly prescription refill for blood pressure medication", "Antibiotics for sinus infection",
+         "Insulin prescription refill", "Prescription for asthma inhaler"],
+        ["Prescription", "Pharmacy Bill", "Doctor's Note"]
+    ),
+    "Specialist Visit": (
+        ["Cardiology consultation for irregular heartbeat", "Dermatology visit for skin lesion",
+         "Orthopedic evaluation for knee pain", "Neurology consultation for migraines"],
+        ["Referral Letter", "Specialist Report", "Medical Bills", "Treatment Plan"]
+    ),
+    "Preventive Care": (
+        ["Annual physical examination", "Routine vaccination", "Screening mammogram",
+         "Preventive colonoscopy"],
+        ["Provider Report", "Medical Bills", "Preventive Care Schedule"]
+    )
+}
+AMOUNT_RANGES = {
+    "Emergency Care": (800.0, 12000.0),
+    "Prescription": (20.0, 600.0),
+    "Specialist Visit": (150.0, 2500.0),
+    "Preventive Care": (100.0, 900.0)
+}
+STATUSES = ["Approved", "Approved", "Approved", "Denied", "Pending"]
+POLICY_TYPES = ["Premium Health Insurance", "Standard Health Insurance", "Basic Health Insurance"]
+FIRST_NAMES = ["John", "Maria", "David", "Sarah", "James", "Linda", "Robert", "Emily"]
+LAST_NAMES = ["Smith", "Garcia", "Johnson", "Lee", "Brown", "Davis", "Miller", "Wilson"]
+START_DATE = date(2023, 1, 1)
+DATE_SPAN_DAYS = 730
+
+
+def policy_number(index: int) -> str:
+    return f"POL{index + 1:03d}"
+
+
+def generate_policy(index: int, rng: random.Random) -> Dict:
+    """One policy with the same schema as policies.txt"""
+    coverage_limit = rng.choice([50000.0, 100000.0, 250000.0])
+    deductible = rng.choice([500.0, 1000.0, 2500.0])
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return {
+        "policy_number": policy_number(index),
+        "policy_type": rng.choice(POLICY_TYPES),
+        "policyholder": {
+            "name": f"{first} {last}",
+            "age": rng.randint(18, 80),
+            "occupation": "Synthetic",
+            "address": f"{rng.randint(1, 9999)} Main St, Austin, TX 78701",
+            "contact": f"512-555-{rng.randint(0, 9999):04d}",
+            "email": f"{first.lower()}.{last.lower()}{index}@example.com"
+        },
+        "status": rng.choice(["Active", "Active", "Active", "Inactive"]),
+        "effective_date": "2024-01-01",
+        "expiration_date": "2024-12-31",
+        "coverage_limit": coverage_limit,
+        "remaining_coverage": round(coverage_limit * rng.uniform(0.2, 1.0), 2),
+        "deductible": deductible,
+        "monthly_premium": rng.choice([250.0, 450.0, 650.0]),
+        "coverage_details": {
+            "emergency_care": {"covered": True, "coverage_percentage": rng.choice([80, 90]),
+                               "deductible_applies": True, "prior_authorization": False,
+                               "coverage_limit": coverage_limit / 2},
+            "preventive_care": {"covered": True, "coverage_percentage": 100,
+                                "deductible_applies": False, "prior_authorization": False,
+                                "annual_limit": 2000.0},
+            "prescription_drugs": {"covered": True, "coverage_percentage": rng.choice([70, 80]),
+                                   "deductible_applies": True, "formulary_type": "Tier 3",
+                                   "monthly_limit": 500.0},
+            "specialist_visits": {"covered": rng.random() > 0.1, "coverage_percentage": 80,
+                                  "deductible_applies": True, "prior_authorization": True,
+                                  "annual_limit": 5000.0}
+        },
+        "network_details": {
+            "network_type": rng.choice(["PPO", "HMO"]),
+            "in_network_deductible": deductible,
+            "out_network_deductible": deductible * 2,
+            "in_network_coverage": "80%",
+            "out_network_coverage": "60%"
+        },
+        "exclusions": ["Cosmetic procedures", "Experimental treatments", "Non-medical services"],
+        "waiting_periods": {"elective_surgery": 60, "maternity": 270, "dental": 90},
+        "documentation_requirements": {
+            "emergency_claims": ["Hospital admission report", "Medical bills", "Treatment records"],
+            "prescription_claims": ["Prescription copy", "Pharmacy receipt"],
+            "specialist_claims": ["Referral letter", "Specialist report", "Medical bills"],
+            "preventive_care_claims": ["Provider report", "Medical bills"]
+        }
+    }
+
+
+def generate_policies(n_policies: int, seed: int = 0) -> Dict[str, Dict]:
+    """Policies keyed by policy number, as stored in policies.txt"""
+    rng = random.Random(seed)
+    return {policy_number(i): generate_policy(i, rng) for i in range(n_policies)}
+
+
+def generate_claim(index: int, n_policies: int, rng: random.Random) -> Dict:
+    """One claim with the same schema as claims_history.txt"""
+    claim_type = rng.choice(list(CLAIM_TYPES))
+    descriptions, documents = CLAIM_TYPES[claim_type]
+    low, high = AMOUNT_RANGES[claim_type]
+    amount = round(rng.uniform(low, high), 2)
+    status = rng.choice(STATUSES)
+    filed = START_DATE + timedelta(days=rng.randrange(DATE_SPAN_DAYS))
+    # Half the claims go to a heavy-tailed head of policies, the rest uniformly
+    if rng.random() < 0.5:
+        policy_index = min(int(rng.paretovariate(1.2)) - 1, n_policies - 1)
+    else:
+        policy_index = rng.randrange(n_policies)
+    return {
+        "claim_id": f"CLM{filed.strftime('%Y%m%d')}{index:07d}",
+        "policy_number": policy_number(policy_index),
+        "claim_type": claim_type,
+        "amount": amount,
+        "date_filed": filed.isoformat(),
+        "status": status,
+        "description": rng.choice(descriptions),
+        "settlement_amount": round(amount * rng.uniform(0.6, 1.0), 2) if status == "Approved" else None,
+        "processing_time": rng.randint(1, 30) if status != "Pending" else None,
+        "documents_provided": rng.sample(documents, rng.randint(1, len(documents))),
+        "red_flags": None
+    }
+
+
+def generate_claims(n_claims: int, n_policies: int, seed: int = 0) -> Iterator[Dict]:
+    """Stream synthetic claims"""
+    rng = random.Random(seed + 1)
+    for i in range(n_claims):
+        yield generate_claim(i, n_policies, rng)
+
+
+def write_dataset(data_dir: str, n_claims: int, n_policies: int, seed: int = 0) -> Dict[str, str]:
+    """Write claims_history.txt and policies.txt under data_dir.
+
+    Claims are streamed to disk so a million-claim history does not need to
+    be held in memory while it is generated.
+    """
+    claims_dir = os.path.join(data_dir, "claims_data")
+    policies_dir = os.path.join(data_dir, "policies_data")
+    os.makedirs(claims_dir, exist_ok=True)
+    os.makedirs(policies_dir, exist_ok=True)
+
+    claims_file = os.path.join(claims_dir, "claims_history.txt")
+    with open(claims_file, "w") as f:
+        f.write("[\n")
+        for i, claim in enumerate(generate_claims(n_claims, n_policies, seed)):
+            if i:
+                f.write(",\n")
+            f.write(json.dumps(claim))
+        f.write("\n]\n")
+
+    policies_file = os.path.join(policies_dir, "policies.txt")
+    with open(policies_file, "w") as f:
+        json.dump(generate_policies(n_policies, seed), f)
+
+    logger.info(f"Wrote {n_claims} synthetic claims and {n_policies} policies to {data_dir}")
+    return {"claims": claims_file, "policies": policies_file}
+
+
+def sample_claims(n: int, n_policies: int, seed: int = 0) -> List[Dict]:
+    """Fresh claims (not in the history) to use as similarity queries"""
+    rng = random.Random(seed + 2)
+    return [generate_claim(10**7 + i, n_policies, rng) for i in range(n)]
@@ -0,0 +1,103 @@
+import json
+import multiprocessing
+import os
+import shutil
+
+import pytest
+
+from utils.claims_store import LEGACY_FILE, LOG_FILE, SNAPSHOT_FILE, ClaimsStore
+
+try:
+    import fcntl
+except ImportError:  # Windows: no inter-process locking
+    fcntl = None
+
+
+def _claim(claim_id, **fields):
+    return dict({"claim_id": claim_id, "policy_number": "POL001", "claim_type": "Prescription", "amount": 100.0}, **fields)
+
+
+def _write_legacy(claims_dir, claims):
+    with open(os.path.join(claims_dir, LEGACY_FILE), "w") as f:
+        json.dump(claims, f)
+
+
+def _claim_ids(claims_dir):
+    """Claim ids as a freshly started process reads them"""
+    store = ClaimsStore(str(claims_dir))
+    try:
+        return [claim["claim_id"] for claim in store.claims()]
+    finally:
+        store.close()
+
+
+def test_migrate_append_compact_reimport(tmp_path):
+    _write_legacy(tmp_path, [_claim("L1"), _claim("L2"), _claim("L3")])
+    store = ClaimsStore(str(tmp_path), compact_threshold=1000)
+
+    # Migrate: the legacy file becomes the snapshot
+    assert [claim["claim_id"] for claim in store.claims()] == ["L1", "L2", "L3"]
+    assert os.path.exists(tmp_path / SNAPSHOT_FILE)
+
+    # Append: claims go to the log and are replayed by other processes
+    store.append(_claim("N1"))
+    store.append(_claim("N2"))
+    store.sync()
+    assert _claim_ids(tmp_path) == ["L1", "L2", "L3", "N1", "N2"]
+
+    # Compact: the log is folded into the snapshot without duplicating claims
+    stale_log = tmp_path / "stale_log.jsonl"
+    shutil.copy(tmp_path / LOG_FILE, stale_log)
+    store.compact()
+    assert _claim_ids(tmp_path) == ["L1", "L2", "L3", "N1", "N2"]
+
+    # A log left by a compaction that stopped after writing the snapshot is skipped
+    shutil.copy(stale_log, tmp_path / LOG_FILE)
+    assert _claim_ids(tmp_path) == ["L1", "L2", "L3", "N1", "N2"]
+    store.close()
+
+    # Re-import: the legacy rows are replaced and the appended claims kept
+    _write_legacy(tmp_path, [_claim("L1", amount=250.0), _claim("L2"), _claim("L3"), _claim("L4")])
+    store = ClaimsStore(str(tmp_path), compact_threshold=1000)
+    claims = store.claims()
+    assert [claim["claim_id"] for claim in claims] == ["L1", "L2", "L3", "L4", "N1", "N2"]
+    assert claims[0]["amount"] == 250.0
+
+    # Appends after a re-import land after the kept claims
+    store.append(_claim("N3"))
+    store.close()
+    assert _claim_ids(tmp_path) == ["L1", "L2", "L3", "L4", "N1", "N2", "N3"]
+
+
+def _append_claims(claims_dir, worker, count):
+    store = ClaimsStore(claims_dir, compact_threshold=20)
+    for i in range(count):
+        store.append(_claim(f"W{worker}-{i}"))
+    store.close()
+
+
+@pytest.mark.skipif(fcntl is None, reason="inter-process locking needs fcntl")
+def test_concurrent_appends_from_processes(tmp_path):
+    _write_legacy(tmp_path, [_claim("L1")])
+    ClaimsStore(str(tmp_path)).close()
+
+    # Small compaction threshold so processes compact while others append
+    workers, count = 4, 50
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=_append_claims, args=(str(tmp_path), worker, count))
+        for worker in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=120)
+        assert process.exitcode == 0
+
+    claim_ids = _claim_ids(tmp_path)
+    expected = ["L1"] + [f"W{worker}-{i}" for worker in range(workers) for i in range(count)]
+    assert sorted(claim_ids) == sorted(expected)
+    for worker in range(workers):
+        # Each process's claims keep their order
+        own = [claim_id for claim_id in claim_ids if claim_id.startswith(f"W{worker}-")]
+        assert own == [f"W{worker}-{i}" for i in range(count)]
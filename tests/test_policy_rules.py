@@ -0,0 +1,56 @@
+from utils.policy_rules import PolicyRules, format_verdict
+
+POLICY = {
+    "policy_number": "POL001",
+    "status": "Active",
+    "effective_date": "2024-01-01",
+    "expiration_date": "2024-12-31",
+    "coverage_limit": 100000.0,
+    "remaining_coverage": 95000.0,
+    "deductible": 1000.0,
+    "coverage_details": {
+        "emergency_care": {
+            "covered": True,
+            "coverage_percentage": 90,
+            "deductible_applies": True,
+            "prior_authorization": False,
+            "coverage_limit": 50000.0
+        },
+        "dental_care": {
+            "covered": False
+        }
+    }
+}
+
+
+def _claim(claim_type, **fields):
+    claim = {
+        "claim_type": claim_type,
+        "amount": 5000.0,
+        "date_filed": "2024-03-15",
+        "description": "Treatment after a fall",
+        "documents_provided": [
+            "Hospital Report", "Medical Bills", "Treatment Records", "Emergency Room Documentation"
+        ]
+    }
+    claim.update(fields)
+    return claim
+
+
+def test_uncovered_section_without_percentage_is_denied_and_formatted():
+    verdict = PolicyRules({"POL001": POLICY}).evaluate("POL001", _claim("Dental Care"))
+
+    assert verdict["decision"] == "deny"
+    assert verdict["coverage_section"] == "dental_care"
+    assert verdict["coverage_percentage"] is None
+    text = format_verdict(verdict)
+    assert "Coverage section: dental_care\n" in text
+    assert "dental_care is not covered by the policy" in text
+
+
+def test_covered_claim_is_approved_with_estimated_payment():
+    verdict = PolicyRules({"POL001": POLICY}).evaluate("POL001", _claim("Emergency Care"))
+
+    assert verdict["decision"] == "approve"
+    assert verdict["estimated_payment"] == 3600.0
+    assert "Coverage section: emergency_care (90%)" in format_verdict(verdict)
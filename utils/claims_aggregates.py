@@ -0,0 +1,116 @@
+import logging
+from typing import Dict, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _number(value) -> float:
+    """Read a numeric claim field, treating missing or invalid values as 0"""
+    try:
+        return float(value or 0)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+class ClaimAggregates:
+    """Running totals over a set of claims"""
+
+    def __init__(self):
+        self.total_claims = 0
+        self.approved_claims = 0
+        self.total_amount = 0.0
+        self.settled_amount = 0.0
+        self.total_processing_time = 0.0
+        self.claim_types: Dict[str, int] = {}
+
+    def add(self, claim: Dict):
+        """Fold one claim into the totals"""
+        self.total_claims += 1
+        if claim.get('status') == 'Approved':
+            self.approved_claims += 1
+        self.total_amount += _number(claim.get('amount'))
+        self.settled_amount += _number(claim.get('settlement_amount'))
+        self.total_processing_time += _number(claim.get('processing_time'))
+        claim_type = claim.get('claim_type')
+        self.claim_types[claim_type] = self.claim_types.get(claim_type, 0) + 1
+
+    def statistics(self) -> Dict:
+        """Get the statistics in the shape returned by get_claim_statistics"""
+        if not self.total_claims:
+            return {}
+
+        return {
+            'total_claims': self.total_claims,
+            'approved_claims': self.approved_claims,
+            'approval_rate': self.approved_claims / self.total_claims * 100,
+            'total_amount': self.total_amount,
+            'settled_amount': self.settled_amount,
+            'average_amount': self.total_amount / self.total_claims,
+            'average_processing_time': self.total_processing_time / self.total_claims,
+            'claim_types': dict(self.claim_types)
+        }
+
+
+class ClaimsAggregator:
+    """Incrementally maintained claim aggregates.
+
+    Keeps global and per-policy totals plus monthly rollups of claim count
+    and amount by (claim_type, status), so summary reads cost O(1) (or
+    O(months) for rollups) regardless of the size of the history.
+    """
+
+    def __init__(self):
+        self.overall = ClaimAggregates()
+        self.by_policy: Dict[str, ClaimAggregates] = {}
+        # 'YYYY-MM' -> (claim_type, status) -> [count, amount]
+        self.monthly: Dict[str, Dict[Tuple[str, str], list]] = {}
+
+    def add(self, claim: Dict):
+        """Fold one claim into every aggregate"""
+        self.overall.add(claim)
+
+        policy_number = claim.get('policy_number')
+        if policy_number not in self.by_policy:
+            self.by_policy[policy_number] = ClaimAggregates()
+        self.by_policy[policy_number].add(claim)
+
+        month = str(claim.get('date_filed') or '')[:7]
+        bucket = self.monthly.setdefault(month, {})
+        totals = bucket.setdefault((claim.get('claim_type'), claim.get('status')), [0, 0.0])
+        totals[0] += 1
+        totals[1] += _number(claim.get('amount'))
+
+    def statistics(self, policy_number: Optional[str] = None) -> Dict:
+        """Get global statistics, or statistics for one policy"""
+        if policy_number:
+            aggregates = self.by_policy.get(policy_number)
+            return aggregates.statistics() if aggregates else {}
+        return self.overall.statistics()
+
+    def rollup(self, month_from: Optional[str] = None, month_to: Optional[str] = None) -> Dict:
+        """Sum monthly rollups over an inclusive 'YYYY-MM' range.
+
+        Returns claim counts and amounts by claim type and by status.
+        """
+        by_type: Dict[str, Dict[str, float]] = {}
+        by_status: Dict[str, Dict[str, float]] = {}
+        total_claims = 0
+
+        for month, bucket in self.monthly.items():
+            if month_from and month < month_from:
+                continue
+            if month_to and month > month_to:
+                continue
+            for (claim_type, status), (count, amount) in bucket.items():
+                total_claims += count
+                for key, target in ((claim_type, by_type), (status, by_status)):
+                    entry = target.setdefault(key, {'count': 0, 'amount': 0.0})
+                    entry['count'] += count
+                    entry['amount'] += amount
+
+        return {
+            'total_claims': total_claims,
+            'by_type': by_type,
+            'by_status': by_status
+        }
@@ -1,19 +1,98 @@
 import os
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.vectorstores import FAISS
-from typing import List, Dict
+from typing import Iterable, Iterator, List, Dict, Optional, Sequence, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import json
 import logging
+import threading
+import numpy as np
+from utils.embedding_registry import DEFAULT_MODEL_NAME, get_embeddings
+from utils.embedding_pipeline import EmbeddingPipeline
+from utils.faiss_index import (
+    index_params, index_type_of, read_index, remove_ids, search_subset, set_search_params, upgrade_vector_store,
+    writable_index
+)
+import faiss
+from utils.vector_store_io import IndexPersister, load_vector_store
+from utils.vector_store_manifest import (
+    EMPTY_DIGEST, INDEX_FILE, build_manifest, check_manifest, diff_records, load_manifest, record_hash,
+    records_digest, update_digest
+)
+from utils.metrics import span, timed
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class ClaimsEmbedder:
-    def __init__(self, model_name: str = "sentence-transformers/all-mpnet-base-v2"):
-        self.embeddings = HuggingFaceEmbeddings(model_name=model_name)
+    def __init__(self,
+                 model_name: str = DEFAULT_MODEL_NAME,
+                 retrieval_k: int = 10,
+                 retrieval_cache_size: int = 256,
+                 embed_batch_size: int = 256,
+                 embed_workers: int = int(os.getenv("EMBED_WORKERS", "1")),
+                 index_type: str = os.getenv("CLAIMS_INDEX_TYPE", "flat"),
+                 index_build_params: Optional[Dict] = None,
+                 nprobe: int = int(os.getenv("FAISS_NPROBE", "16")),
+                 ef_search: int = int(os.getenv("FAISS_EF_SEARCH", "64")),
+                 vector_storage: str = os.getenv("VECTOR_STORAGE", "float32"),
+                 mmap_index: bool = os.getenv("FAISS_MMAP", "0") == "1",
+                 persist_interval: float = float(os.getenv("VECTOR_PERSIST_INTERVAL", "2"))):
+        self.model_name = model_name
+        self.embeddings = get_embeddings(model_name)
+        self.embed_batch_size = embed_batch_size
+        self.embed_workers = embed_workers
+        # FAISS index family (flat, hnsw or ivfpq), vector storage (float32,
+        # float16 or int8) and build/search parameters
+        self.index_type = index_type
+        self.vector_storage = vector_storage
+        self.index_build_params = index_params(index_type, {"storage": vector_storage, **(index_build_params or {})})
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        # Memory-map the saved index so worker processes share its pages
+        self.mmap_index = mmap_index
+        self._index_mapped = False
         self.vector_store = None
         self.base_path = "vector_stores"
         self.vector_store_path = os.path.join(self.base_path, "claims_vectors")
+        # Digest of the indexed claims' record hashes (each claim's hash is
+        # kept in its docstore row), and the claims history position the
+        # store is known to be up to date with (None if unknown)
+        self._digest = EMPTY_DIGEST
+        self._source: Optional[Dict] = None
+        self._lock = threading.RLock()
+        
+        # Documents are written to the docstore as claims are indexed; the
+        # index and manifest are written at most every persist_interval
+        # seconds. _changes counts index changes, _persisted those on disk.
+        self._changes = 0
+        self._persisted = 0
+        self._persister = IndexPersister(
+            self.vector_store_path, self._persist_snapshot, self._on_persisted, persist_interval
+        )
+        
+        # Filter partitions: index positions by claim type and by policy
+        # number, plus the filing date at every position. Built on the first
+        # filtered search (so loading reads no documents) and extended as
+        # claims are appended; _partitioned positions are covered so far.
+        self._partitions: Dict[str, Dict[str, List[int]]] = {"claim_type": {}, "policy_number": {}}
+        self._partition_arrays: Dict[Tuple[str, str], np.ndarray] = {}
+        self._filed_dates = np.empty(0, dtype="datetime64[D]")
+        self._partitioned = 0
+        
+        # Background indexing of newly saved claims
+        self._pending_claims: List[Dict] = []
+        self._index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="claims-indexer")
+        self._drain_scheduled = False
+        
+        # Retrieval memoization: normalized query text -> (k searched, results).
+        # One search at retrieval_k serves every smaller k by slicing.
+        self.retrieval_k = retrieval_k
+        self.retrieval_cache_size = retrieval_cache_size
+        self._retrieval_cache: OrderedDict = OrderedDict()
+        self._retrieval_inflight: Dict[str, threading.Event] = {}
+        self._index_version = 0
+        self.retrieval_hits = 0
+        self.retrieval_misses = 0
         
         # Ensure vector store directory exists
         os.makedirs(self.base_path, exist_ok=True)
@@ -35,64 +114,496 @@ class ClaimsEmbedder:
             logger.error(f"Error preparing claim text: {str(e)}")
             return ""
         
-    def create_vector_store(self, claims_data: List[Dict]):
-        """Create vector store from claims"""
+    @staticmethod
+    def _optional_float(value) -> Optional[float]:
+        """Convert a numeric claim field to float, None if missing"""
         try:
-            logger.info(f"Creating vector store from {len(claims_data)} claims")
+            return float(value) if value is not None else None
+        except (ValueError, TypeError):
+            return None
+    
+    def _claim_metadata(self, claim: Dict) -> Dict:
+        """Typed claim fields stored alongside each claim vector"""
+        return {
+            "claim_id": claim["claim_id"],
+            "policy_number": claim.get("policy_number", "N/A"),
+            "claim_type": claim.get("claim_type", "N/A"),
+            "amount": self._optional_float(claim.get("amount")) or 0.0,
+            "settlement_amount": self._optional_float(claim.get("settlement_amount")),
+            "processing_time": self._optional_float(claim.get("processing_time")),
+            "status": claim.get("status", "Pending"),
+            "date_filed": claim.get("date_filed"),
+            "description": claim.get("description"),
+            "documents_provided": list(claim.get("documents_provided") or [])
+        }
+    
+    def _iter_documents(self, claims_data: Sequence[Dict]) -> Iterator[Tuple[str, str, Dict]]:
+        """Yield (claim id, text, metadata) for claims with a claim_id.
+        
+        A claim id saved more than once is indexed with its latest version.
+        """
+        latest = {claim.get('claim_id'): i for i, claim in enumerate(claims_data)}
+        for i, claim in enumerate(claims_data):
+            claim_id = claim.get('claim_id')
+            if not claim_id or latest[claim_id] != i:
+                continue
+            claim_text = self._prepare_claim_text(claim)
+            if claim_text.strip():  # Only add non-empty texts
+                yield claim_id, claim_text, self._claim_metadata(claim)
+    
+    def _manifest(self) -> Dict:
+        return build_manifest(
+            self.model_name,
+            self.vector_store.index.d,
+            self.vector_store.index.ntotal,
+            self._digest,
+            index_type_of(self.vector_store.index),
+            self.vector_storage,
+            self.vector_store.docstore.version,
+            self._source
+        )
+    
+    def _map_saved_index(self):
+        """Swap the in-memory index for a memory-mapping of the copy just saved"""
+        if self.mmap_index:
+            self.vector_store.index = read_index(os.path.join(self.vector_store_path, INDEX_FILE), mmap=True)
+            self._index_mapped = True
+        set_search_params(self.vector_store.index, self.nprobe, self.ef_search)
+    
+    def _ensure_writable(self):
+        """Copy a memory-mapped index into memory before changing it"""
+        if self._index_mapped:
+            self.vector_store.index = writable_index(self.vector_store.index)
+            self._index_mapped = False
+    
+    def _persist_snapshot(self):
+        """(change count, serialized index, manifest) to write, None if the saved copy is current"""
+        with self._lock:
+            if self.vector_store is None or self._changes == self._persisted:
+                return None
+            return self._changes, faiss.serialize_index(self.vector_store.index), self._manifest()
+    
+    def _on_persisted(self, changes: int):
+        """Note what is on disk, and map the saved index if nothing changed since it was written"""
+        with self._lock:
+            self._persisted = max(self._persisted, changes)
+            if self.mmap_index and not self._index_mapped and changes == self._changes:
+                self._map_saved_index()
+    
+    @staticmethod
+    def _parse_date(value) -> np.datetime64:
+        """Filing date as a day, NaT if missing or malformed"""
+        try:
+            return np.datetime64(str(value)[:10], "D")
+        except ValueError:
+            return np.datetime64("NaT", "D")
+    
+    def _reset_partitions(self):
+        """Forget the filter partitions once positions are renumbered or the store replaced"""
+        with self._lock:
+            self._partitions = {field: {} for field in self._partitions}
+            self._partition_arrays.clear()
+            self._filed_dates = np.empty(0, dtype="datetime64[D]")
+            self._partitioned = 0
+    
+    def _partition_rows(self, start: int) -> Iterator[Tuple]:
+        """(position, claim_type, policy_number, date_filed) for every position from start"""
+        store = self.vector_store
+        fields = ("claim_type", "policy_number", "date_filed")
+        if hasattr(store.docstore, "metadata_fields"):
+            return store.docstore.metadata_fields(fields, start)
+        return (
+            (position, *(store.docstore.search(store.index_to_docstore_id[position]).metadata.get(field)
+                         for field in fields))
+            for position in range(start, store.index.ntotal)
+        )
+    
+    def _update_partitions(self):
+        """Add positions indexed since the last filtered search to the filter partitions"""
+        with self._lock:
+            start = self._partitioned
+            if start >= self.vector_store.index.ntotal:
+                return
             
-            # Filter out any claims with invalid data
-            valid_claims = [claim for claim in claims_data if claim.get('claim_id')]
+            dates = []
+            for position, claim_type, policy_number, date_filed in self._partition_rows(start):
+                self._partitions["claim_type"].setdefault(str(claim_type), []).append(position)
+                self._partitions["policy_number"].setdefault(str(policy_number), []).append(position)
+                dates.append(self._parse_date(date_filed))
             
-            texts = []
-            metadatas = []
+            self._filed_dates = np.concatenate([self._filed_dates, np.array(dates, dtype="datetime64[D]")])
+            self._partition_arrays.clear()
+            self._partitioned = self.vector_store.index.ntotal
+    
+    def _partition(self, field: str, value: str) -> np.ndarray:
+        """Sorted index positions of the claims whose field equals value"""
+        key = (field, str(value))
+        positions = self._partition_arrays.get(key)
+        if positions is None:
+            positions = np.array(self._partitions[field].get(key[1], []), dtype=np.int64)
+            self._partition_arrays[key] = positions
+        return positions
+    
+    def _candidate_positions(self,
+                             claim_type: Optional[str] = None,
+                             policy_number: Optional[str] = None,
+                             date_from: Optional[str] = None,
+                             date_to: Optional[str] = None) -> np.ndarray:
+        """Index positions of the claims matching every given filter"""
+        self._update_partitions()
+        candidates = None
+        for field, value in (("claim_type", claim_type), ("policy_number", policy_number)):
+            if value is not None:
+                positions = self._partition(field, value)
+                candidates = positions if candidates is None else np.intersect1d(
+                    candidates, positions, assume_unique=True
+                )
+        
+        if date_from or date_to:
+            dates = self._filed_dates if candidates is None else self._filed_dates[candidates]
+            mask = ~np.isnat(dates)
+            if date_from:
+                mask &= dates >= self._parse_date(date_from)
+            if date_to:
+                mask &= dates <= self._parse_date(date_to)
+            candidates = np.flatnonzero(mask) if candidates is None else candidates[mask]
+        
+        return candidates if candidates is not None else np.arange(self.vector_store.index.ntotal)
+    
+    def _invalidate_retrieval_cache(self):
+        """Drop memoized search results after the index changes"""
+        with self._lock:
+            self._index_version += 1
+            self._retrieval_cache.clear()
+    
+    def create_vector_store(self, claims_data: List[Dict], source: Optional[Dict] = None):
+        """Create vector store from claims (read from the claims history up to source, if given)"""
+        try:
+            logger.info(f"Creating vector store from {len(claims_data)} claims")
             
-            for claim in valid_claims:
-                claim_text = self._prepare_claim_text(claim)
-                if claim_text.strip():  # Only add non-empty texts
-                    texts.append(claim_text)
-                    metadatas.append({
-                        "claim_id": claim["claim_id"],
-                        "policy_number": claim.get("policy_number", "N/A"),
-                        "claim_type": claim.get("claim_type", "N/A")
-                    })
+            pipeline = EmbeddingPipeline(
+                self.embeddings,
+                batch_size=self.embed_batch_size,
+                workers=self.embed_workers
+            )
+            vector_store = pipeline.build_vector_store(
+                self._iter_documents(claims_data),
+                self.vector_store_path,
+                index_type=self.index_type,
+                index_params=self.index_build_params,
+                source=source
+            )
             
-            if not texts:
+            if vector_store is None:
                 logger.warning("No valid claims to create vector store")
                 return
             
-            self.vector_store = FAISS.from_texts(
-                texts=texts,
-                embedding=self.embeddings,
-                metadatas=metadatas
-            )
-            
-            # Save vector store
-            os.makedirs(self.vector_store_path, exist_ok=True)
-            self.vector_store.save_local(self.vector_store_path)
-            logger.info(f"Successfully created vector store with {len(texts)} claims")
+            with self._lock:
+                self.vector_store = vector_store
+                self._index_mapped = False
+                self._changes = self._persisted = 0
+                self._map_saved_index()
+                self._digest = pipeline.last_manifest["digest"]
+                self._source = source
+                self._reset_partitions()
+                self._invalidate_retrieval_cache()
+            logger.info(f"Successfully created vector store with {pipeline.last_stats['texts']} claims")
             
         except Exception as e:
             logger.error(f"Error creating vector store: {str(e)}")
             raise
         
     def load_vector_store(self) -> bool:
-        """Load existing vector store"""
+        """Load the existing vector store if its manifest matches the current model"""
         try:
-            if os.path.exists(self.vector_store_path):
-                logger.info("Loading existing vector store")
-                self.vector_store = FAISS.load_local(
-                    self.vector_store_path,
-                    self.embeddings
+            manifest = load_manifest(self.vector_store_path)
+            reason = check_manifest(
+                manifest, self.model_name, index_type=self.index_type, storage=self.vector_storage
+            )
+            if reason:
+                logger.info(f"Not loading claims vector store: {reason}")
+                return False
+            
+            logger.info("Loading existing vector store")
+            # Only stores written (with a manifest) by this class are loaded
+            vector_store = load_vector_store(self.vector_store_path, self.embeddings, self.mmap_index, writable=True)
+            reason = check_manifest(manifest, self.model_name, vector_store, self.index_type, self.vector_storage)
+            if reason:
+                logger.info(f"Not loading claims vector store: {reason}")
+                vector_store.docstore.close()
+                return False
+            
+            set_search_params(vector_store.index, self.nprobe, self.ef_search)
+            with self._lock:
+                self.vector_store = vector_store
+                self._index_mapped = self.mmap_index
+                self._changes = self._persisted = 0
+                # Version 1 manifests have no digest or source position
+                self._digest = manifest.get("digest") or records_digest(
+                    vector_store.docstore.record_hashes().values()
                 )
-                return True
-            logger.info("No existing vector store found")
-            return False
+                self._source = manifest.get("source")
+                self._reset_partitions()
+                self._invalidate_retrieval_cache()
+            return True
         except Exception as e:
             logger.error(f"Error loading vector store: {str(e)}")
             return False
     
-    def find_similar_claims(self, query_claim: Dict, k: int = 5) -> List[Dict]:
-        """Find similar claims using semantic search"""
+    def _apply_changes(self,
+                       documents: List[Tuple[str, str, Dict]],
+                       removed_ids: List[str],
+                       source: Optional[Dict] = None) -> int:
+        """Re-embed new or changed claims, drop removed ones and persist the store.
+        
+        Documents are written to the live docstore in one transaction while
+        the index is changed under the search lock. Appends are persisted
+        with later changes (see persist_interval); a removal renumbers the
+        docstore positions, so the index is written as soon as the lock is
+        released. source, if given, is recorded as the claims history
+        position the store is now up to date with.
+        """
+        # Embed outside the lock so searches are not blocked by the model
+        vectors = self.embeddings.embed_documents([text for _, text, _ in documents]) if documents else []
+        
+        with self._lock:
+            indexed = self.vector_store.docstore.record_hashes(
+                [claim_id for claim_id, _, _ in documents] + list(removed_ids)
+            )
+            hashes = [record_hash(text, metadata) for _, text, metadata in documents]
+            updates = [
+                (document, vector, digest)
+                for document, vector, digest in zip(documents, vectors, hashes)
+                if indexed.get(document[0]) != digest
+            ]
+            stale_ids = [
+                claim_id for claim_id in removed_ids if claim_id in indexed
+            ] + [
+                document[0] for document, _, _ in updates if document[0] in indexed
+            ]
+            if not updates and not stale_ids:
+                if source is not None and source != self._source:
+                    self._source = source
+                    self._changes += 1
+                    self._persister.schedule()
+                return 0
+            
+            self._ensure_writable()
+            try:
+                if stale_ids:
+                    remove_ids(self.vector_store, stale_ids)
+                    # Deletes renumber positions; pure additions are appended and
+                    # picked up by the next filtered search
+                    self._reset_partitions()
+                if updates:
+                    self.vector_store.add_embeddings(
+                        text_embeddings=[(text, vector) for (_, text, _), vector, _ in updates],
+                        metadatas=[metadata for (_, _, metadata), _, _ in updates],
+                        ids=[claim_id for (claim_id, _, _), _, _ in updates]
+                    )
+                    # A store configured for IVF-PQ stays flat until it can be trained
+                    upgrade_vector_store(self.vector_store, self.index_type, self.index_build_params)
+                self.vector_store.docstore.commit()
+            except Exception:
+                self.vector_store.docstore.rollback()
+                raise
+            
+            self._digest = update_digest(
+                self._digest,
+                added=[digest for _, _, digest in updates],
+                removed=[indexed[claim_id] for claim_id in stale_ids]
+            )
+            if source is not None:
+                self._source = source
+            self._changes += 1
+            self._invalidate_retrieval_cache()
+            set_search_params(self.vector_store.index, self.nprobe, self.ef_search)
+        
+        if stale_ids:
+            self._persister.flush()
+        else:
+            self._persister.schedule()
+        logger.info(f"Re-embedded {len(updates)} claims and removed {len(removed_ids)} from vector store")
+        return len(updates) + len(removed_ids)
+    
+    def flush(self):
+        """Write any index changes not yet on disk"""
+        self._persister.flush()
+    
+    def add_claims(self, claims_data: List[Dict], source: Optional[Dict] = None) -> int:
+        """Embed only claims that are new or changed since they were indexed"""
+        try:
+            with self._lock:
+                if not self.vector_store:
+                    self.create_vector_store(claims_data, source)
+                    return self.vector_store.index.ntotal if self.vector_store else 0
+                
+                documents = list(self._iter_documents(claims_data))
+                indexed = self.vector_store.docstore.record_hashes([claim_id for claim_id, _, _ in documents])
+                documents = [
+                    (claim_id, text, metadata)
+                    for claim_id, text, metadata in documents
+                    if indexed.get(claim_id) != record_hash(text, metadata)
+                ]
+            
+            return self._apply_changes(documents, [], source)
+            
+        except Exception as e:
+            logger.error(f"Error adding claims to vector store: {str(e)}")
+            return 0
+    
+    def sync_claims(self, claims_data: List[Dict], source: Optional[Dict] = None) -> int:
+        """Bring the loaded store in line with the claims history.
+        
+        source is the history position claims_data was read up to (see
+        ClaimsStore.claims_with_position). If the store was saved at that
+        position nothing is read; if the history only grew since, only the
+        claims after the saved position are checked. Otherwise every claim
+        is hashed and the digest compared with the manifest's, and only on
+        a mismatch are the indexed hashes read from the docstore to
+        re-embed the added and changed claims and delete the removed ones.
+        """
+        try:
+            with self._lock:
+                saved = self._source
+            if source is not None and source == saved:
+                logger.info("Claims vector store is up to date")
+                return 0
+            if (source is not None and saved is not None and source["origin"] == saved["origin"]
+                    and source["rows"] >= saved["rows"]):
+                logger.info(f"Checking {source['rows'] - saved['rows']} claims saved since the vector store")
+                return self.add_claims(claims_data[saved["rows"]:], source)
+            
+            documents = {
+                claim_id: (claim_id, text, metadata)
+                for claim_id, text, metadata in self._iter_documents(claims_data)
+            }
+            current = {
+                claim_id: record_hash(text, metadata)
+                for claim_id, text, metadata in documents.values()
+            }
+            
+            with self._lock:
+                if (records_digest(current.values()) == self._digest
+                        and len(current) == self.vector_store.index.ntotal):
+                    logger.info("Claims vector store is up to date")
+                    return self._apply_changes([], [], source)
+                added, changed, removed = diff_records(self.vector_store.docstore.record_hashes(), current)
+            
+            logger.info(
+                f"Claims vector store is stale: {len(added)} added, "
+                f"{len(changed)} changed, {len(removed)} removed claims"
+            )
+            return self._apply_changes([documents[claim_id] for claim_id in added + changed], removed, source)
+            
+        except Exception as e:
+            logger.error(f"Error syncing claims vector store: {str(e)}")
+            return 0
+    
+    def enqueue_claims(self, claims_data: List[Dict]):
+        """Index claims in the background, batching claims saved in quick succession"""
+        with self._lock:
+            self._pending_claims.extend(claims_data)
+            if self._drain_scheduled:
+                return
+            self._drain_scheduled = True
+        self._index_executor.submit(self._drain_pending_claims)
+    
+    def _drain_pending_claims(self):
+        """Embed every claim queued since the last drain"""
+        with self._lock:
+            pending, self._pending_claims = self._pending_claims, []
+            self._drain_scheduled = False
+        if pending:
+            self.add_claims(pending)
+    
+    @staticmethod
+    def _normalize_query(query_text: str) -> str:
+        """Normalize claim text so equivalent queries share a cache entry"""
+        return "\n".join(line.strip() for line in query_text.strip().splitlines())
+    
+    def _search(self, query_text: str, k: int, filters: Optional[Dict] = None) -> List[Dict]:
+        """Embed the query and run one FAISS search, restricted to the claims matching filters"""
+        with span("retrieval.embed"):
+            query_vector = self.embeddings.embed_query(query_text)
+        with span("retrieval.search"), self._lock:
+            if filters:
+                store = self.vector_store
+                distances, positions = search_subset(
+                    store.index,
+                    np.asarray(query_vector, dtype=np.float32),
+                    k,
+                    self._candidate_positions(**filters)
+                )
+                results = [
+                    (store.docstore.search(store.index_to_docstore_id[int(position)]), distance)
+                    for distance, position in zip(distances, positions)
+                ]
+            else:
+                results = self.vector_store.similarity_search_with_score_by_vector(query_vector, k=k)
+        
+        # Typed claim fields come straight from the stored metadata
+        return [
+            {
+                'content': dict(doc.metadata),
+                'metadata': doc.metadata,
+                'similarity_score': float(score)
+            }
+            for doc, score in results
+        ]
+    
+    def _cached_search(self, query_text: str, k: int, filters: Optional[Dict] = None) -> List[Dict]:
+        """Serve a search from the LRU cache, running at most one search per query and filters"""
+        key = self._normalize_query(query_text)
+        if filters:
+            key += "\n" + json.dumps(filters, sort_keys=True)
+        
+        while True:
+            with self._lock:
+                entry = self._retrieval_cache.get(key)
+                if entry is not None and entry[0] >= k:
+                    self._retrieval_cache.move_to_end(key)
+                    self.retrieval_hits += 1
+                    return entry[1][:k]
+                
+                inflight = self._retrieval_inflight.get(key)
+                if inflight is None:
+                    # This thread runs the search; concurrent callers wait for it
+                    inflight = threading.Event()
+                    self._retrieval_inflight[key] = inflight
+                    version = self._index_version
+                    self.retrieval_misses += 1
+                    break
+            inflight.wait()
+        
+        try:
+            search_k = max(k, self.retrieval_k)
+            results = self._search(query_text, search_k, filters)
+            with self._lock:
+                if version == self._index_version:
+                    self._retrieval_cache[key] = (search_k, results)
+                    self._retrieval_cache.move_to_end(key)
+                    while len(self._retrieval_cache) > self.retrieval_cache_size:
+                        self._retrieval_cache.popitem(last=False)
+            return results[:k]
+        finally:
+            with self._lock:
+                self._retrieval_inflight.pop(key, None)
+            inflight.set()
+    
+    @timed("retrieval")
+    def find_similar_claims(self,
+                            query_claim: Dict,
+                            k: int = 5,
+                            claim_type: Optional[str] = None,
+                            policy_number: Optional[str] = None,
+                            date_from: Optional[str] = None,
+                            date_to: Optional[str] = None) -> List[Dict]:
+        """Find similar claims using semantic search.
+        
+        Optional filters (claim type, policy number, filing date range as
+        YYYY-MM-DD, inclusive) restrict the candidates before scoring.
+        """
         try:
             if not self.vector_store:
                 logger.warning("Vector store not initialized")
@@ -103,28 +614,16 @@ class ClaimsEmbedder:
                 logger.warning("Invalid query claim")
                 return []
             
-            results = self.vector_store.similarity_search_with_score(query_text, k=k)
-            
-            # Format results
-            formatted_results = []
-            for doc, score in results:
-                # Parse the document content
-                content_lines = doc.page_content.strip().split('\n')
-                claim_data = {}
-                for line in content_lines:
-                    line = line.strip()
-                    if ':' in line:
-                        key, value = line.split(':', 1)
-                        claim_data[key.strip()] = value.strip()
-                
-                formatted_results.append({
-                    'content': claim_data,
-                    'metadata': doc.metadata,
-                    'similarity_score': score
-                })
-            
-            return formatted_results
+            filters = {
+                name: value for name, value in (
+                    ("claim_type", claim_type),
+                    ("policy_number", policy_number),
+                    ("date_from", date_from),
+                    ("date_to", date_to)
+                ) if value is not None
+            }
+            return [dict(result) for result in self._cached_search(query_text, k, filters)]
             
         except Exception as e:
             logger.error(f"Error finding similar claims: {str(e)}")
-            return []
\ No newline at end of file
+            return []
@@ -0,0 +1,425 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+import weakref
+import logging
+from contextlib import contextmanager
+from typing import Callable, List, Dict, Optional, Tuple
+from utils.claims_table import ClaimsTable, ClaimRows
+
+try:
+    import fcntl
+except ImportError:  # Windows: no inter-process locking
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LEGACY_FILE = "claims_history.txt"
+SNAPSHOT_FILE = "claims_history.jsonl"
+LOG_FILE = "claims_log.jsonl"
+LOCK_FILE = "claims.lock"
+
+# First line of the snapshot and of the log. Compaction bumps the log
+# generation: the snapshot holds every claim of earlier generations, and a
+# log is only replayed if its generation matches the snapshot's.
+SNAPSHOT_HEADER = "__snapshot__"
+LOG_HEADER = "__log__"
+
+# Process-wide registry of claims stores, keyed by the absolute path of the
+# claims directory so every loader in the process shares one snapshot
+_stores: Dict[str, "ClaimsStore"] = {}
+_stores_lock = threading.Lock()
+
+
+def get_claims_store(claims_dir: str) -> "ClaimsStore":
+    """Return the shared claims store for a claims directory"""
+    key = os.path.abspath(claims_dir)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = ClaimsStore(key)
+            _stores[key] = store
+        return store
+
+
+@atexit.register
+def _close_stores():
+    """Flush pending log writes of every store on interpreter exit"""
+    with _stores_lock:
+        for store in _stores.values():
+            store.close()
+
+
+class ClaimsStore:
+    """Parsed, in-memory snapshot of the claims history.
+
+    Claims are persisted as a JSON Lines snapshot plus an append-only JSON
+    Lines log. New claims are appended to the log with group-committed
+    fsyncs, and the log is periodically compacted into the snapshot. Readers
+    see the snapshot plus the log tail; the files are only re-read when
+    their mtime, size or inode changes, and a grown log is read
+    incrementally. Appends, compaction and reloads hold an flock on
+    claims.lock, so processes sharing the directory do not lose or
+    duplicate claims. The legacy claims_history.txt JSON array is migrated
+    on first use and re-imported whenever that file changes.
+    """
+
+    def __init__(self,
+                 claims_dir: str,
+                 fsync_batch_size: int = 32,
+                 fsync_interval: float = 0.05,
+                 compact_threshold: int = 10000):
+        self.claims_dir = claims_dir
+        self.legacy_file = os.path.join(claims_dir, LEGACY_FILE)
+        self.snapshot_file = os.path.join(claims_dir, SNAPSHOT_FILE)
+        self.log_file = os.path.join(claims_dir, LOG_FILE)
+        self.lock_file = os.path.join(claims_dir, LOCK_FILE)
+        self.fsync_batch_size = fsync_batch_size
+        self.fsync_interval = fsync_interval
+        self.compact_threshold = compact_threshold
+
+        self._lock = threading.RLock()
+        self._table = ClaimsTable()
+        self._snapshot_stamp: Optional[Tuple[int, int]] = None
+        self._log_stamp: Optional[Tuple[int, int]] = None
+        self._log_offset = 0
+        self._log_rows = 0
+        self._loaded = False
+        # Log generation the snapshot expects, and that of the log on disk
+        # (None if there is no log)
+        self._generation = 0
+        self._log_generation: Optional[int] = None
+        self._snapshot_header: Dict = {}
+        self._legacy_stamp: Optional[Tuple[int, int, int]] = None
+
+        self._lock_handle = None
+        self._flock_depth = 0
+
+        self._log_handle = None
+        self._pending_syncs = 0
+        self._last_sync = time.monotonic()
+        self._sync_timer: Optional[threading.Timer] = None
+        self._listeners: List[Callable[[], Optional[Callable[[Dict], None]]]] = []
+
+    @staticmethod
+    def _file_stamp(path: str) -> Optional[Tuple[int, int, int]]:
+        """Get the (mtime, size, inode) used to detect changes on disk"""
+        try:
+            stat = os.stat(path)
+            return stat.st_mtime_ns, stat.st_size, stat.st_ino
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _write_atomic(path: str, claims: List[Dict], header: Optional[Dict] = None):
+        """Write claims as JSON Lines (after a header line) to a temp file and rename it into place"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            if header is not None:
+                f.write(json.dumps(header) + "\n")
+            for claim in claims:
+                f.write(json.dumps(claim) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @contextmanager
+    def _file_lock(self):
+        """Hold the claims directory's inter-process lock (re-entrant within this store)"""
+        with self._lock:
+            if self._flock_depth == 0 and fcntl is not None:
+                if self._lock_handle is None:
+                    os.makedirs(self.claims_dir, exist_ok=True)
+                    self._lock_handle = open(self.lock_file, 'a')
+                fcntl.flock(self._lock_handle.fileno(), fcntl.LOCK_EX)
+            self._flock_depth += 1
+            try:
+                yield
+            finally:
+                self._flock_depth -= 1
+                if self._flock_depth == 0 and fcntl is not None:
+                    fcntl.flock(self._lock_handle.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def _split_header(lines: List[bytes], key: str) -> Tuple[Dict, List[Dict]]:
+        """Parse JSON lines into (header, claims); files written before headers existed have none"""
+        records = [json.loads(line) for line in lines if line.strip()]
+        if records and isinstance(records[0], dict) and list(records[0]) == [key]:
+            return records[0][key], records[1:]
+        return {}, records
+
+    def _migrate_legacy(self):
+        """Import claims_history.txt into the JSONL snapshot, and again whenever it changes.
+
+        The snapshot header records the file's hash and how many leading
+        snapshot rows came from it, so a re-import (e.g. after a git pull)
+        replaces exactly those rows and keeps every claim appended since.
+        """
+        legacy_stamp = self._file_stamp(self.legacy_file)
+        if legacy_stamp is None or legacy_stamp == self._legacy_stamp:
+            self._legacy_stamp = legacy_stamp
+            return
+
+        with open(self.legacy_file, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        header, claims_data = ({}, [])
+        if os.path.exists(self.snapshot_file):
+            header, claims_data = self._read_snapshot()
+
+        if header.get("legacy_sha256") != digest:
+            legacy_claims = json.loads(raw)
+            if os.path.exists(self.snapshot_file) and "legacy_sha256" not in header:
+                # Migrated before the header existed: the snapshot begins with
+                # this file's claims, so only record them
+                kept = claims_data[len(legacy_claims):]
+                logger.info(f"Recording {LEGACY_FILE} as the source of the first {len(legacy_claims)} claims")
+            else:
+                kept = claims_data[header.get("legacy_rows", 0):]
+                logger.info(f"Migrated {len(legacy_claims)} claims from {LEGACY_FILE} to {SNAPSHOT_FILE}")
+            header = dict(header, legacy_sha256=digest, legacy_rows=len(legacy_claims))
+            self._write_atomic(self.snapshot_file, legacy_claims + kept, {SNAPSHOT_HEADER: header})
+        self._legacy_stamp = legacy_stamp
+
+    def _read_snapshot(self) -> Tuple[Dict, List[Dict]]:
+        """Read the snapshot's header and claims"""
+        with open(self.snapshot_file, 'rb') as f:
+            return self._split_header(f.read().splitlines(), SNAPSHOT_HEADER)
+
+    def _read_log(self, offset: int) -> Tuple[List[Dict], int]:
+        """Read complete log lines from a byte offset, returning the new offset.
+
+        Reading from the start also sets the log's generation from its header.
+        """
+        with open(self.log_file, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+
+        # Ignore a trailing partial line; it is picked up once complete
+        end = data.rfind(b"\n") + 1
+        lines = data[:end].splitlines()
+        if offset > 0:
+            return [json.loads(line) for line in lines if line.strip()], offset + end
+
+        header, claims_data = self._split_header(lines, LOG_HEADER)
+        self._log_generation = header.get("generation", 0)
+        return claims_data, end
+
+    def _start_log(self, generation: int):
+        """Replace the log with an empty one of the given generation"""
+        if self._log_handle is not None:
+            self._log_handle.close()
+            self._log_handle = None
+        self._pending_syncs = 0
+        self._write_atomic(self.log_file, [], {LOG_HEADER: {"generation": generation}})
+        self._log_generation = generation
+        self._log_offset = os.path.getsize(self.log_file)
+        self._log_rows = 0
+        self._log_stamp = self._file_stamp(self.log_file)
+
+    def _refresh(self):
+        """Reload the snapshot and log tail if they changed on disk"""
+        snapshot_stamp = self._file_stamp(self.snapshot_file)
+        log_stamp = self._file_stamp(self.log_file)
+        legacy_stamp = self._file_stamp(self.legacy_file)
+        if (self._loaded and snapshot_stamp == self._snapshot_stamp and log_stamp == self._log_stamp
+                and legacy_stamp == self._legacy_stamp):
+            return
+
+        with self._file_lock():
+            snapshot_stamp = self._file_stamp(self.snapshot_file)
+            log_stamp = self._file_stamp(self.log_file)
+            if (self._loaded and snapshot_stamp == self._snapshot_stamp and log_stamp and self._log_stamp
+                    and log_stamp[2] == self._log_stamp[2] and log_stamp[1] >= self._log_offset
+                    and self._file_stamp(self.legacy_file) == self._legacy_stamp):
+                # Only the log grew (another process appended): read the tail
+                if self._log_generation == self._generation:
+                    tail, self._log_offset = self._read_log(self._log_offset)
+                    self._table.extend(tail)
+                    self._log_rows += len(tail)
+                self._log_stamp = log_stamp
+                return
+
+            self._migrate_legacy()
+            snapshot_stamp = self._file_stamp(self.snapshot_file)
+
+            claims_data = []
+            self._snapshot_header = {}
+            if snapshot_stamp is not None:
+                self._snapshot_header, claims_data = self._read_snapshot()
+            else:
+                logger.warning("No claims history file found")
+            self._generation = self._snapshot_header.get("log_generation", 0)
+
+            log_claims = []
+            self._log_offset = 0
+            self._log_generation = None
+            if log_stamp is not None:
+                log_claims, self._log_offset = self._read_log(0)
+                if self._log_generation != self._generation:
+                    # Left by a compaction that stopped after writing the
+                    # snapshot: its claims are already in the snapshot
+                    logger.info(f"Skipping claims log of compacted generation {self._log_generation}")
+                    log_claims = []
+
+            self._table = ClaimsTable(claims_data + log_claims)
+            self._log_rows = len(log_claims)
+            self._snapshot_stamp = snapshot_stamp
+            self._log_stamp = log_stamp
+            self._loaded = True
+            logger.info(f"Loaded {len(self._table)} claims from history ({len(log_claims)} from log)")
+
+    def claims(self) -> List[Dict]:
+        """Get all claims in the current snapshot"""
+        with self._lock:
+            self._refresh()
+            return list(self._table.rows)
+
+    def claims_with_position(self) -> Tuple[List[Dict], Dict]:
+        """Get all claims and their position in the history.
+
+        The position is the claim count plus the origin (hash of the legacy
+        file the leading claims came from). Claims are only ever appended
+        after a position unless its origin changes, so a consumer that
+        processed the history up to a position only needs the rows after it.
+        """
+        with self._lock:
+            self._refresh()
+            position = {"origin": self._snapshot_header.get("legacy_sha256", ""), "rows": len(self._table)}
+            return list(self._table.rows), position
+
+    def table(self) -> ClaimsTable:
+        """Get the columnar table for the current snapshot"""
+        with self._lock:
+            self._refresh()
+            return self._table
+
+    def search(self, **filters) -> ClaimRows:
+        """Search claims with vectorized column filters"""
+        with self._lock:
+            self._refresh()
+            return self._table.search(**filters)
+
+    def statistics(self, policy_number: Optional[str] = None) -> Dict:
+        """Get running claim statistics, globally or for one policy"""
+        with self._lock:
+            self._refresh()
+            return self._table.aggregates.statistics(policy_number)
+
+    def rollup(self, month_from: Optional[str] = None, month_to: Optional[str] = None) -> Dict:
+        """Get claim counts and amounts by type and status over a month range"""
+        with self._lock:
+            self._refresh()
+            return self._table.aggregates.rollup(month_from, month_to)
+
+    def add_listener(self, callback: Callable[[Dict], None]):
+        """Register a callback run with each newly appended claim.
+
+        Bound methods are held weakly so listeners do not keep their owner
+        (e.g. an agent from a finished session) alive.
+        """
+        if hasattr(callback, '__self__'):
+            ref = weakref.WeakMethod(callback)
+        else:
+            ref = lambda: callback
+        with self._lock:
+            self._listeners.append(ref)
+
+    def _notify(self, claim_data: Dict):
+        """Run the registered listeners for a new claim"""
+        with self._lock:
+            self._listeners = [ref for ref in self._listeners if ref() is not None]
+            callbacks = [ref() for ref in self._listeners]
+
+        for callback in callbacks:
+            if callback is None:
+                continue
+            try:
+                callback(claim_data)
+            except Exception as e:
+                logger.error(f"Error in claim listener: {str(e)}")
+
+    def append(self, claim_data: Dict):
+        """Append a new claim to the log and add it to the snapshot in place"""
+        with self._lock, self._file_lock():
+            self._refresh()
+
+            if self._log_generation != self._generation:
+                self._start_log(self._generation)
+            elif self._log_handle is not None and os.fstat(self._log_handle.fileno()).st_ino != self._log_stamp[2]:
+                # Another process replaced the log; append to the new file
+                self._log_handle.close()
+                self._log_handle = None
+
+            line = (json.dumps(claim_data) + "\n").encode()
+            if self._log_handle is None:
+                self._log_handle = open(self.log_file, 'ab')
+            self._log_handle.write(line)
+            self._log_handle.flush()
+            self._schedule_sync()
+
+            self._table.append(claim_data)
+            self._log_offset += len(line)
+            self._log_rows += 1
+            self._log_stamp = self._file_stamp(self.log_file)
+
+            if self._log_rows >= self.compact_threshold:
+                self.compact()
+
+        self._notify(claim_data)
+
+    def _schedule_sync(self):
+        """Group commit: fsync once per batch of appends or per interval"""
+        self._pending_syncs += 1
+        if (self._pending_syncs >= self.fsync_batch_size or
+                time.monotonic() - self._last_sync >= self.fsync_interval):
+            self.sync()
+        elif self._sync_timer is None:
+            self._sync_timer = threading.Timer(self.fsync_interval, self.sync)
+            self._sync_timer.daemon = True
+            self._sync_timer.start()
+
+    def sync(self):
+        """Fsync any appended claims that are not yet durable"""
+        with self._lock:
+            if self._sync_timer is not None:
+                self._sync_timer.cancel()
+                self._sync_timer = None
+            if self._log_handle is not None and self._pending_syncs:
+                os.fsync(self._log_handle.fileno())
+            self._pending_syncs = 0
+            self._last_sync = time.monotonic()
+
+    def compact(self):
+        """Fold the log into a new snapshot and start a log of the next generation.
+
+        The snapshot is written first with the next generation in its header,
+        so a crash before the log is replaced leaves a log that replay skips
+        rather than duplicates.
+        """
+        with self._lock, self._file_lock():
+            self._refresh()
+            self.sync()
+            compacted = self._log_rows
+            generation = self._generation + 1
+            self._snapshot_header = dict(self._snapshot_header, log_generation=generation)
+            self._write_atomic(self.snapshot_file, self._table.rows, {SNAPSHOT_HEADER: self._snapshot_header})
+            self._generation = generation
+            self._snapshot_stamp = self._file_stamp(self.snapshot_file)
+            self._start_log(generation)
+            logger.info(f"Compacted {compacted} logged claims into snapshot")
+
+    def close(self):
+        """Flush pending writes and release the log and lock file handles"""
+        with self._lock:
+            self.sync()
+            if self._log_handle is not None:
+                self._log_handle.close()
+                self._log_handle = None
+            if self._lock_handle is not None and self._flock_depth == 0:
+                self._lock_handle.close()
+                self._lock_handle = None
@@ -0,0 +1,275 @@
+import bisect
+import logging
+from collections.abc import Sequence
+from typing import List, Dict, Optional, Iterator, Tuple
+
+import numpy as np
+
+from utils.claims_aggregates import ClaimsAggregator
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_INITIAL_CAPACITY = 1024
+_NAT = np.datetime64('NaT', 'D')
+
+
+def _parse_date(value) -> np.datetime64:
+    """Convert a date string to datetime64[D], NaT if it cannot be parsed"""
+    try:
+        return np.datetime64(str(value)[:10], 'D')
+    except (ValueError, TypeError):
+        return _NAT
+
+
+def _to_float(value) -> float:
+    """Convert a numeric field to float, NaN if missing or invalid"""
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return np.nan
+
+
+class _Categories:
+    """Dictionary encoding of a string column"""
+
+    def __init__(self):
+        self.values: List = []
+        self._codes: Dict = {}
+
+    def encode(self, value) -> int:
+        """Get the code for a value, assigning a new one if needed"""
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self._codes[value] = code
+            self.values.append(value)
+        return code
+
+    def lookup(self, value) -> int:
+        """Get the code for a value, -1 if it has never been seen"""
+        return self._codes.get(value, -1)
+
+
+class ClaimRows(Sequence):
+    """Lazy view over selected claim rows.
+
+    Rows are only materialized as dicts when they are accessed.
+    """
+
+    def __init__(self, rows: List[Dict], row_ids: np.ndarray):
+        self._rows = rows
+        self.row_ids = row_ids
+
+    def __len__(self) -> int:
+        return len(self.row_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ClaimRows(self._rows, self.row_ids[index])
+        return dict(self._rows[self.row_ids[index]])
+
+    def __iter__(self) -> Iterator[Dict]:
+        for row_id in self.row_ids:
+            yield dict(self._rows[row_id])
+
+    def __repr__(self) -> str:
+        return f"ClaimRows({len(self)} claims)"
+
+
+class ClaimsTable:
+    """Columnar, NumPy-backed representation of the claims history.
+
+    Numeric fields and dates are stored as typed arrays and the string
+    fields used for filtering are dictionary encoded, so search filters
+    compile into vectorized boolean masks. A hash index from policy to row
+    ids and a sorted per-policy date index (queried with bisect) make
+    policy-scoped lookups O(log n + k) instead of a full scan. Summary
+    aggregates are maintained as rows are appended.
+    """
+
+    def __init__(self, claims: Optional[List[Dict]] = None):
+        self.rows: List[Dict] = []
+        self.policies = _Categories()
+        self.claim_types = _Categories()
+        self.statuses = _Categories()
+        self._size = 0
+        # policy code -> row ids, in insertion order
+        self._policy_rows: Dict[int, List[int]] = {}
+        # policy code -> (sorted filing days, row ids in the same order)
+        self._policy_dates: Dict[int, Tuple[List[int], List[int]]] = {}
+        self.aggregates = ClaimsAggregator()
+        self._allocate(max(_INITIAL_CAPACITY, len(claims or [])))
+        if claims:
+            self.extend(claims)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _allocate(self, capacity: int):
+        """Allocate (or grow) the column arrays to the given capacity"""
+        def grow(old: Optional[np.ndarray], dtype, fill) -> np.ndarray:
+            new = np.full(capacity, fill, dtype=dtype)
+            if old is not None:
+                new[:self._size] = old[:self._size]
+            return new
+
+        self._amount = grow(getattr(self, '_amount', None), np.float64, np.nan)
+        self._settlement_amount = grow(getattr(self, '_settlement_amount', None), np.float64, np.nan)
+        self._processing_time = grow(getattr(self, '_processing_time', None), np.float64, np.nan)
+        self._date_filed = grow(getattr(self, '_date_filed', None), 'datetime64[D]', np.datetime64('NaT'))
+        self._policy_code = grow(getattr(self, '_policy_code', None), np.int32, -1)
+        self._type_code = grow(getattr(self, '_type_code', None), np.int32, -1)
+        self._status_code = grow(getattr(self, '_status_code', None), np.int32, -1)
+        self._capacity = capacity
+
+    def extend(self, claims: List[Dict]):
+        """Append claims to the table"""
+        needed = self._size + len(claims)
+        if needed > self._capacity:
+            self._allocate(max(needed, self._capacity * 2))
+
+        start = self._size
+        for offset, claim in enumerate(claims):
+            i = start + offset
+            self._amount[i] = _to_float(claim.get('amount'))
+            self._settlement_amount[i] = _to_float(claim.get('settlement_amount'))
+            self._processing_time[i] = _to_float(claim.get('processing_time'))
+            date_filed = _parse_date(claim.get('date_filed'))
+            policy_code = self.policies.encode(claim.get('policy_number'))
+            self._date_filed[i] = date_filed
+            self._policy_code[i] = policy_code
+            self._type_code[i] = self.claim_types.encode(claim.get('claim_type'))
+            self._status_code[i] = self.statuses.encode(claim.get('status'))
+            self._index_row(i, policy_code, date_filed)
+            self.aggregates.add(claim)
+
+        self.rows.extend(claims)
+        self._size = needed
+
+    def _index_row(self, row_id: int, policy_code: int, date_filed: np.datetime64):
+        """Add a row to the policy and per-policy date indexes"""
+        self._policy_rows.setdefault(policy_code, []).append(row_id)
+        if np.isnat(date_filed):
+            return
+
+        day = int(date_filed.astype(np.int64))
+        days, row_ids = self._policy_dates.setdefault(policy_code, ([], []))
+        if not days or day >= days[-1]:
+            days.append(day)
+            row_ids.append(row_id)
+        else:
+            pos = bisect.bisect_right(days, day)
+            days.insert(pos, day)
+            row_ids.insert(pos, row_id)
+
+    def append(self, claim: Dict):
+        """Append a single claim to the table"""
+        self.extend([claim])
+
+    @property
+    def amount(self) -> np.ndarray:
+        return self._amount[:self._size]
+
+    @property
+    def settlement_amount(self) -> np.ndarray:
+        return self._settlement_amount[:self._size]
+
+    @property
+    def processing_time(self) -> np.ndarray:
+        return self._processing_time[:self._size]
+
+    @property
+    def date_filed(self) -> np.ndarray:
+        return self._date_filed[:self._size]
+
+    @property
+    def policy_code(self) -> np.ndarray:
+        return self._policy_code[:self._size]
+
+    @property
+    def type_code(self) -> np.ndarray:
+        return self._type_code[:self._size]
+
+    @property
+    def status_code(self) -> np.ndarray:
+        return self._status_code[:self._size]
+
+    def _policy_candidates(self,
+                           policy_number: str,
+                           date_from: Optional[str],
+                           date_to: Optional[str]) -> np.ndarray:
+        """Get row ids for a policy, narrowed by date range via bisect"""
+        policy_code = self.policies.lookup(policy_number)
+        if not (date_from or date_to):
+            return np.asarray(self._policy_rows.get(policy_code, []), dtype=np.int64)
+
+        days, row_ids = self._policy_dates.get(policy_code, ([], []))
+        lo, hi = 0, len(days)
+        if date_from:
+            start = _parse_date(date_from)
+            if np.isnat(start):
+                return np.empty(0, dtype=np.int64)
+            lo = bisect.bisect_left(days, int(start.astype(np.int64)))
+        if date_to:
+            end = _parse_date(date_to)
+            if np.isnat(end):
+                return np.empty(0, dtype=np.int64)
+            hi = bisect.bisect_right(days, int(end.astype(np.int64)))
+        return np.sort(np.asarray(row_ids[lo:hi], dtype=np.int64))
+
+    def _filter(self,
+                row_ids: Optional[np.ndarray],
+                claim_type: Optional[str] = None,
+                min_amount: Optional[float] = None,
+                max_amount: Optional[float] = None,
+                status: Optional[str] = None,
+                date_from: Optional[str] = None,
+                date_to: Optional[str] = None) -> np.ndarray:
+        """Compile filters into a boolean mask over the given rows (all rows if None)"""
+        def column(values: np.ndarray) -> np.ndarray:
+            return values if row_ids is None else values[row_ids]
+
+        mask = np.ones(self._size if row_ids is None else len(row_ids), dtype=bool)
+
+        if claim_type:
+            mask &= column(self.type_code) == self.claim_types.lookup(claim_type)
+
+        if min_amount is not None:
+            mask &= column(self.amount) >= min_amount
+
+        if max_amount is not None:
+            mask &= column(self.amount) <= max_amount
+
+        if status:
+            mask &= column(self.status_code) == self.statuses.lookup(status)
+
+        if date_from:
+            mask &= column(self.date_filed) >= _parse_date(date_from)
+
+        if date_to:
+            mask &= column(self.date_filed) <= _parse_date(date_to)
+
+        return mask
+
+    def mask(self, policy_number: Optional[str] = None, **filters) -> np.ndarray:
+        """Compile search filters into a boolean mask over all rows"""
+        mask = self._filter(None, **filters)
+        if policy_number:
+            mask &= self.policy_code == self.policies.lookup(policy_number)
+        return mask
+
+    def search(self,
+               policy_number: Optional[str] = None,
+               date_from: Optional[str] = None,
+               date_to: Optional[str] = None,
+               **filters) -> ClaimRows:
+        """Get a lazy view of the rows matching the filters"""
+        if policy_number:
+            # Index lookup, then vectorized filters over the k candidates only
+            row_ids = self._policy_candidates(policy_number, date_from, date_to)
+            mask = self._filter(row_ids, **filters)
+            return ClaimRows(self.rows, row_ids[mask])
+
+        mask = self._filter(None, date_from=date_from, date_to=date_to, **filters)
+        return ClaimRows(self.rows, np.flatnonzero(mask))
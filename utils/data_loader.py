@@ -1,8 +1,10 @@
 import json
 import os
 import logging
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Sequence, Tuple
 from datetime import datetime
+from utils.claims_store import get_claims_store
+from utils.metrics import timed
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -13,37 +15,35 @@ class DataLoader:
         self.claims_dir = os.path.join(data_dir, "claims_data")
         self.policies_dir = os.path.join(data_dir, "policies_data")
         self._ensure_directories()
+        self.claims_store = get_claims_store(self.claims_dir)
     
     def _ensure_directories(self):
         """Ensure all required directories exist"""
         os.makedirs(self.claims_dir, exist_ok=True)
         os.makedirs(self.policies_dir, exist_ok=True)
     
+    @timed("data_load")
     def load_claims_history(self) -> List[Dict]:
-        """Load claims history from file"""
+        """Load claims history from the shared in-memory snapshot"""
         try:
-            claims_file = os.path.join(self.claims_dir, "claims_history.txt")
-            if os.path.exists(claims_file):
-                with open(claims_file, 'r') as f:
-                    claims_data = json.loads(f.read())
-                logger.info(f"Loaded {len(claims_data)} claims from history")
-                return claims_data
-            else:
-                logger.warning("No claims history file found")
-                return []
+            return self.claims_store.claims()
         except Exception as e:
             logger.error(f"Error loading claims history: {str(e)}")
             return []
     
+    @timed("data_load")
+    def load_claims_history_with_position(self) -> Tuple[List[Dict], Optional[Dict]]:
+        """Load claims history and its position (see ClaimsStore.claims_with_position)"""
+        try:
+            return self.claims_store.claims_with_position()
+        except Exception as e:
+            logger.error(f"Error loading claims history: {str(e)}")
+            return [], None
+    
     def save_claim(self, claim_data: Dict) -> bool:
         """Save a new claim to history"""
         try:
-            claims_data = self.load_claims_history()
-            claims_data.append(claim_data)
-            
-            claims_file = os.path.join(self.claims_dir, "claims_history.txt")
-            with open(claims_file, 'w') as f:
-                json.dump(claims_data, f, indent=4)
+            self.claims_store.append(claim_data)
             
             logger.info(f"Saved claim {claim_data.get('claim_id')} to history")
             return True
@@ -51,6 +51,11 @@ class DataLoader:
             logger.error(f"Error saving claim: {str(e)}")
             return False
     
+    def add_save_listener(self, callback: Callable[[Dict], None]):
+        """Run a callback with every claim saved in this process"""
+        self.claims_store.add_listener(callback)
+    
+    @timed("data_load")
     def load_policy(self, policy_number: str) -> Optional[Dict]:
         """Load specific policy data"""
         try:
@@ -66,6 +71,7 @@ class DataLoader:
             logger.error(f"Error loading policy: {str(e)}")
             return None
     
+    @timed("data_load")
     def load_all_policies(self) -> Dict:
         """Load all policies"""
         try:
@@ -98,35 +104,17 @@ class DataLoader:
             logger.error(f"Error updating policy: {str(e)}")
             return False
     
+    @timed("data_load")
     def get_claim_statistics(self, policy_number: Optional[str] = None) -> Dict:
         """Get statistics about claims"""
-        claims_data = self.load_claims_history()
-        
-        if policy_number:
-            claims_data = [c for c in claims_data if c['policy_number'] == policy_number]
-        
-        if not claims_data:
-            return {}
-        
-        total_claims = len(claims_data)
-        approved_claims = len([c for c in claims_data if c['status'] == 'Approved'])
-        total_amount = sum(c['amount'] for c in claims_data)
-        settled_amount = sum(c['settlement_amount'] for c in claims_data)
-        
-        return {
-            'total_claims': total_claims,
-            'approved_claims': approved_claims,
-            'approval_rate': (approved_claims / total_claims * 100) if total_claims > 0 else 0,
-            'total_amount': total_amount,
-            'settled_amount': settled_amount,
-            'average_amount': total_amount / total_claims if total_claims > 0 else 0,
-            'average_processing_time': sum(c['processing_time'] for c in claims_data) / total_claims if total_claims > 0 else 0,
-            'claim_types': {
-                claim_type: len([c for c in claims_data if c['claim_type'] == claim_type])
-                for claim_type in set(c['claim_type'] for c in claims_data)
-            }
-        }
+        return self.claims_store.statistics(policy_number)
+    
+    @timed("data_load")
+    def get_claim_rollup(self, month_from: Optional[str] = None, month_to: Optional[str] = None) -> Dict:
+        """Get claim counts and amounts by type and status for a month range"""
+        return self.claims_store.rollup(month_from, month_to)
     
+    @timed("data_load")
     def search_claims(self, 
                      policy_number: Optional[str] = None,
                      claim_type: Optional[str] = None,
@@ -134,30 +122,14 @@ class DataLoader:
                      max_amount: Optional[float] = None,
                      status: Optional[str] = None,
                      date_from: Optional[str] = None,
-                     date_to: Optional[str] = None) -> List[Dict]:
+                     date_to: Optional[str] = None) -> Sequence[Dict]:
         """Search claims with filters"""
-        claims_data = self.load_claims_history()
-        filtered_claims = claims_data
-        
-        if policy_number:
-            filtered_claims = [c for c in filtered_claims if c['policy_number'] == policy_number]
-        
-        if claim_type:
-            filtered_claims = [c for c in filtered_claims if c['claim_type'] == claim_type]
-        
-        if min_amount is not None:
-            filtered_claims = [c for c in filtered_claims if c['amount'] >= min_amount]
-        
-        if max_amount is not None:
-            filtered_claims = [c for c in filtered_claims if c['amount'] <= max_amount]
-        
-        if status:
-            filtered_claims = [c for c in filtered_claims if c['status'] == status]
-        
-        if date_from:
-            filtered_claims = [c for c in filtered_claims if c['date_filed'] >= date_from]
-        
-        if date_to:
-            filtered_claims = [c for c in filtered_claims if c['date_filed'] <= date_to]
-        
-        return filtered_claims
\ No newline at end of file
+        return self.claims_store.search(
+            policy_number=policy_number,
+            claim_type=claim_type,
+            min_amount=min_amount,
+            max_amount=max_amount,
+            status=status,
+            date_from=date_from,
+            date_to=date_to
+        )
@@ -0,0 +1,192 @@
+import os
+import time
+import shutil
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain.vectorstores import FAISS
+
+from utils.embedding_registry import SharedEmbeddings
+from utils.faiss_index import add_vectors, effective_index_type, index_type_of, new_index, upgrade_vector_store
+from utils.sqlite_docstore import DOCSTORE_FILE, SQLiteDocstore
+from utils.vector_store_io import save_vector_store_atomic
+from utils.vector_store_manifest import EMPTY_DIGEST, build_manifest, update_digest
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Encoder loaded once per worker process by _init_worker
+_worker_model = None
+
+
+def _init_worker(model_name: str, threads_per_worker: int):
+    """Load a CPU encoder in a pool worker"""
+    global _worker_model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(threads_per_worker)
+    _worker_model = SentenceTransformer(model_name, device="cpu")
+
+
+def _encode_batch(texts: List[str]) -> np.ndarray:
+    """Encode one batch in a pool worker"""
+    # Same preprocessing as HuggingFaceEmbeddings.embed_documents
+    texts = [text.replace("\n", " ") for text in texts]
+    return _worker_model.encode(texts, batch_size=len(texts), convert_to_numpy=True).astype(np.float32)
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[List]:
+    """Split an iterable into lists of at most size items"""
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class EmbeddingPipeline:
+    """Batched, optionally multi-process embedding of large text collections.
+
+    Texts are streamed in batches of batch_size. With workers > 1 batches are
+    fanned out over a process pool of CPU encoders (each worker loads its own
+    copy of the model); otherwise the process-wide shared model is used.
+    Vector stores are built shard by shard so only one shard of texts and
+    vectors is in memory at a time.
+    """
+
+    def __init__(self,
+                 embeddings: SharedEmbeddings,
+                 batch_size: int = 256,
+                 workers: int = 1,
+                 shard_size: int = 100000):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.workers = max(1, workers)
+        self.shard_size = shard_size
+        self.last_stats: Dict = {}
+        self.last_manifest: Optional[Dict] = None
+
+    def _executor(self) -> Optional[ProcessPoolExecutor]:
+        """Create the encoder pool, or None to encode in-process"""
+        if self.workers <= 1:
+            return None
+        threads_per_worker = max(1, (os.cpu_count() or 1) // self.workers)
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.embeddings.model_name, threads_per_worker)
+        )
+
+    def _embed_with(self, executor: Optional[ProcessPoolExecutor], texts: List[str]) -> Iterator[np.ndarray]:
+        """Embed texts batch by batch, yielding vectors in input order"""
+        batches = _chunks(texts, self.batch_size)
+
+        if executor is None:
+            for batch in batches:
+                yield np.asarray(self.embeddings.embed_documents(batch), dtype=np.float32)
+            return
+
+        # Keep a bounded number of batches in flight
+        in_flight = deque()
+        for batch in batches:
+            in_flight.append(executor.submit(_encode_batch, batch))
+            if len(in_flight) >= self.workers * 2:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+    def build_vector_store(self,
+                           documents: Iterable[Tuple[str, str, Dict]],
+                           path: str,
+                           index_type: str = "flat",
+                           index_params: Optional[Dict] = None,
+                           source: Optional[Dict] = None) -> Optional[FAISS]:
+        """Embed (id, text, metadata) records into a FAISS store persisted at path.
+
+        Shards are streamed as they are embedded: their vectors go straight
+        into the target index (of index_type and the vector storage in
+        index_params, see utils.faiss_index; trained on the first shard if it
+        needs training) and their documents into a SQLite docstore, so only
+        one shard is held in memory. The store is then saved atomically at
+        path with a manifest of its records' digest and the source position
+        they were read up to, if given (kept on last_manifest).
+        """
+        build_path = f"{os.path.normpath(path)}.build"
+        shutil.rmtree(build_path, ignore_errors=True)
+        os.makedirs(build_path)
+        docstore = SQLiteDocstore(os.path.join(build_path, DOCSTORE_FILE), writable=True)
+
+        index = None
+        digest = EMPTY_DIGEST
+        total = 0
+        index_seconds = 0.0
+        start = time.perf_counter()
+        executor = self._executor()
+        try:
+            for shard_number, shard in enumerate(_chunks(documents, self.shard_size)):
+                shard_start = time.perf_counter()
+                vectors = np.concatenate(list(self._embed_with(executor, [text for _, text, _ in shard])))
+
+                index_start = time.perf_counter()
+                if index is None:
+                    # A first shard smaller than shard_size is the whole corpus
+                    built_type = effective_index_type(index_type, len(vectors))
+                    index = new_index(built_type, vectors.shape[1], len(vectors), index_params, vectors)
+                add_vectors(index, vectors)
+                index_seconds += time.perf_counter() - index_start
+
+                digest = update_digest(digest, docstore.add_records(shard, total))
+                docstore.commit()
+
+                total += len(shard)
+                shard_time = time.perf_counter() - shard_start
+                logger.info(
+                    f"Embedded shard {shard_number} ({len(shard)} texts) "
+                    f"at {len(shard) / shard_time:.1f} texts/sec"
+                )
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        elapsed = time.perf_counter() - start
+        self.last_stats = {
+            "texts": total,
+            "seconds": elapsed,
+            "texts_per_second": total / elapsed if elapsed > 0 else 0.0,
+            "batch_size": self.batch_size,
+            "workers": self.workers
+        }
+
+        if index is None:
+            docstore.close()
+            shutil.rmtree(build_path, ignore_errors=True)
+            return None
+
+        vector_store = FAISS(self.embeddings, index, docstore, docstore.positions)
+        # Shards smaller than IVFPQ_MIN_VECTORS build flat until the corpus is known
+        upgrade_vector_store(vector_store, index_type, index_params)
+        built_type = index_type_of(vector_store.index)
+        storage = (index_params or {}).get("storage", "float32")
+        self.last_stats["index_seconds"] = index_seconds
+        self.last_stats["index_type"] = built_type
+        logger.info(f"Built {built_type} index ({storage} vectors), {index_seconds:.1f}s spent indexing")
+
+        self.last_manifest = build_manifest(
+            self.embeddings.model_name, vector_store.index.d, total, digest, built_type, storage, source=source
+        )
+        # Moves the docstore into place and serves documents from the saved copy
+        save_vector_store_atomic(vector_store, path, self.last_manifest)
+        shutil.rmtree(build_path, ignore_errors=True)
+        logger.info(
+            f"Built vector store with {total} texts in {elapsed:.1f}s "
+            f"({self.last_stats['texts_per_second']:.1f} texts/sec)"
+        )
+        return vector_store
@@ -0,0 +1,111 @@
+import os
+import time
+import threading
+import logging
+from typing import List, Dict, Optional
+
+from langchain_core.embeddings import Embeddings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
+
+_registry: Dict[str, "SharedEmbeddings"] = {}
+_registry_lock = threading.Lock()
+
+
+def _current_rss() -> Optional[int]:
+    """Resident set size of this process in bytes, if it can be read"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class SharedEmbeddings(Embeddings):
+    """Lazily loaded, thread-safe embedding model shared by every embedder.
+
+    The underlying HuggingFace model is only loaded on the first embed call,
+    and encodes are serialized so one model instance can serve all threads.
+    """
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._encode_lock = threading.Lock()
+        self.load_time: Optional[float] = None
+        self.rss_delta: Optional[int] = None
+        self.parameter_bytes: Optional[int] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def _get_model(self):
+        """Load the model on first use"""
+        if self._model is not None:
+            return self._model
+
+        with self._load_lock:
+            if self._model is None:
+                from langchain.embeddings import HuggingFaceEmbeddings
+
+                logger.info(f"Loading embedding model {self.model_name}")
+                rss_before = _current_rss()
+                start = time.perf_counter()
+                model = HuggingFaceEmbeddings(model_name=self.model_name)
+                self.load_time = time.perf_counter() - start
+
+                rss_after = _current_rss()
+                if rss_before is not None and rss_after is not None:
+                    self.rss_delta = rss_after - rss_before
+                try:
+                    self.parameter_bytes = sum(
+                        p.numel() * p.element_size() for p in model.client.parameters()
+                    )
+                except Exception:
+                    self.parameter_bytes = None
+
+                self._model = model
+                logger.info(f"Loaded embedding model {self.model_name} in {self.load_time:.2f}s")
+        return self._model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        model = self._get_model()
+        with self._encode_lock:
+            return model.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        model = self._get_model()
+        with self._encode_lock:
+            return model.embed_query(text)
+
+    def stats(self) -> Dict:
+        """Load time and memory footprint of the shared model"""
+        return {
+            "model_name": self.model_name,
+            "loaded": self.loaded,
+            "load_time_seconds": self.load_time,
+            "rss_delta_bytes": self.rss_delta,
+            "parameter_bytes": self.parameter_bytes
+        }
+
+
+def get_embeddings(model_name: str = DEFAULT_MODEL_NAME) -> SharedEmbeddings:
+    """Get the process-wide shared embeddings for a model name"""
+    with _registry_lock:
+        embeddings = _registry.get(model_name)
+        if embeddings is None:
+            embeddings = SharedEmbeddings(model_name)
+            _registry[model_name] = embeddings
+        return embeddings
+
+
+def registry_stats() -> List[Dict]:
+    """Stats for every model in the registry"""
+    with _registry_lock:
+        return [embeddings.stats() for embeddings in _registry.values()]
@@ -0,0 +1,312 @@
+import math
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+
+# How full-precision vectors are stored (flat and HNSW storage, IVF-PQ refine
+# vectors): as-is, or scalar-quantized to 2 or 1 bytes per dimension
+STORAGE_TYPES = ("float32", "float16", "int8")
+_SCALAR_QUANTIZERS = {"float16": "SQfp16", "int8": "SQ8"}
+
+# IVF-PQ needs enough vectors to train its coarse and product quantizers;
+# below this an exact flat scan is fast anyway
+IVFPQ_MIN_VECTORS = 10000
+
+DEFAULT_INDEX_PARAMS = {
+    "flat": {},
+    "hnsw": {"M": 32, "ef_construction": 200},
+    # refine re-ranks the PQ candidates against full vectors (k_factor * k of
+    # them), trading back memory for recall
+    "ivfpq": {"nlist": None, "pq_m": None, "nbits": 8, "train_size": 100000, "refine": False, "k_factor": 4}
+}
+
+ADD_BATCH_SIZE = 65536
+
+# Filtered searches over at most this many candidates compute exact distances
+# to the candidates' stored vectors instead of searching with an id selector
+# (gathering more vectors than this costs more than the selector search)
+BRUTE_FORCE_MAX_CANDIDATES = 1024
+
+
+def default_nlist(n_vectors: int) -> int:
+    """IVF list count: about 4 * sqrt(n) rounded to a power of two, with >= 39 training points per list"""
+    nlist = 2 ** round(math.log2(max(1.0, 4 * math.sqrt(n_vectors))))
+    return max(1, min(nlist, n_vectors // 39))
+
+
+def default_pq_m(dimension: int) -> int:
+    """PQ sub-quantizer count: about 8 dimensions each, dividing the dimension evenly"""
+    m = max(1, dimension // 8)
+    while dimension % m:
+        m -= 1
+    return m
+
+
+def index_params(index_type: str, overrides: Optional[Dict] = None) -> Dict:
+    """Build parameters for an index type, defaults overridden by overrides"""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}, expected one of {', '.join(INDEX_TYPES)}")
+    params = {"storage": "float32"}
+    params.update(DEFAULT_INDEX_PARAMS[index_type])
+    params.update(overrides or {})
+    if params["storage"] not in STORAGE_TYPES:
+        raise ValueError(f"Unknown vector storage {params['storage']!r}, expected one of {', '.join(STORAGE_TYPES)}")
+    return params
+
+
+def factory_string(index_type: str, dimension: int, n_vectors: int, params: Optional[Dict] = None) -> str:
+    """faiss.index_factory description of the configured index"""
+    params = index_params(index_type, params)
+    quantizer = _SCALAR_QUANTIZERS.get(params["storage"])
+    if index_type == "hnsw":
+        return f"HNSW{params['M']}" + (f",{quantizer}" if quantizer else "")
+    if index_type == "ivfpq":
+        nlist = params["nlist"] or default_nlist(n_vectors)
+        pq_m = params["pq_m"] or default_pq_m(dimension)
+        description = f"IVF{nlist},PQ{pq_m}x{params['nbits']}"
+        if params["refine"]:
+            description += f",Refine({quantizer})" if quantizer else ",RFlat"
+        return description
+    return quantizer or "Flat"
+
+
+def new_index(index_type: str,
+              dimension: int,
+              n_vectors: int,
+              params: Optional[Dict] = None,
+              sample: Optional[np.ndarray] = None,
+              seed: int = 0) -> faiss.Index:
+    """Empty L2 index of index_type sized for n_vectors, trained on a random subset of sample if it needs training"""
+    params = index_params(index_type, params)
+    description = factory_string(index_type, dimension, n_vectors, params)
+    index = faiss.index_factory(dimension, description, faiss.METRIC_L2)
+
+    if index_type == "hnsw":
+        index.hnsw.efConstruction = params["ef_construction"]
+    if hasattr(index, "k_factor"):
+        index.k_factor = params["k_factor"]
+
+    if not index.is_trained:
+        train_size = min(len(sample), params.get("train_size") or len(sample))
+        chosen = np.random.default_rng(seed).choice(len(sample), train_size, replace=False)
+        logger.info(f"Training {description} index on {train_size} of {len(sample)} vectors")
+        index.train(np.ascontiguousarray(sample[np.sort(chosen)]))
+    return index
+
+
+def add_vectors(index: faiss.Index, vectors: np.ndarray):
+    """Add vectors to an index in batches of ADD_BATCH_SIZE"""
+    for start in range(0, len(vectors), ADD_BATCH_SIZE):
+        index.add(np.ascontiguousarray(vectors[start:start + ADD_BATCH_SIZE], dtype=np.float32))
+
+
+def build_index(index_type: str, vectors: np.ndarray, params: Optional[Dict] = None, seed: int = 0) -> faiss.Index:
+    """Build an L2 index of index_type over vectors, training it on a random sample if needed"""
+    n_vectors, dimension = vectors.shape
+    index = new_index(index_type, dimension, n_vectors, params, vectors, seed)
+    add_vectors(index, vectors)
+    return index
+
+
+def effective_index_type(index_type: str, n_vectors: int) -> str:
+    """The index type actually built for n_vectors (IVF-PQ falls back to flat on small corpora)"""
+    if index_type == "ivfpq" and n_vectors < IVFPQ_MIN_VECTORS:
+        return "flat"
+    return index_type
+
+
+def accepts_index_type(built_type: str, index_type: str, n_vectors: int) -> bool:
+    """Whether an index built as built_type serves a store configured as index_type with n_vectors.
+
+    A small IVF-PQ store is built flat; an IVF-PQ index keeps serving after
+    deletes take the corpus below IVFPQ_MIN_VECTORS.
+    """
+    return built_type in (index_type, effective_index_type(index_type, n_vectors))
+
+
+def index_type_of(index: faiss.Index) -> str:
+    """Which of INDEX_TYPES a (loaded) index is"""
+    if hasattr(index, "hnsw"):
+        return "hnsw"
+    if faiss.try_extract_index_ivf(index) is not None:
+        return "ivfpq"
+    return "flat"
+
+
+def set_search_params(index: faiss.Index,
+                      nprobe: Optional[int] = None,
+                      ef_search: Optional[int] = None,
+                      k_factor: Optional[int] = None):
+    """Apply search-time parameters to the index types that use them"""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and nprobe:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+    if hasattr(index, "hnsw") and ef_search:
+        index.hnsw.efSearch = ef_search
+    if hasattr(index, "k_factor") and k_factor:
+        index.k_factor = k_factor
+
+
+def convert_vector_store(vector_store, index_type: str, params: Optional[Dict] = None) -> str:
+    """Replace a flat store's index with one of index_type over the same vectors.
+
+    Positions (and so the docstore mapping) are unchanged. Returns the index
+    type actually built.
+    """
+    n_vectors = vector_store.index.ntotal
+    built_type = effective_index_type(index_type, n_vectors)
+    if built_type != index_type:
+        logger.info(f"Keeping a flat index: {n_vectors} vectors are too few to train {index_type}")
+    if factory_string(built_type, vector_store.index.d, n_vectors, params) == "Flat":
+        return built_type
+
+    vectors = vector_store.index.reconstruct_n(0, n_vectors)
+    vector_store.index = build_index(built_type, vectors, params)
+    return built_type
+
+
+def upgrade_vector_store(vector_store, index_type: str, params: Optional[Dict] = None) -> bool:
+    """Convert a store's flat index to index_type once the corpus is large enough to train it.
+
+    Returns whether the index was replaced.
+    """
+    n_vectors = vector_store.index.ntotal
+    target = effective_index_type(index_type, n_vectors)
+    if target == "flat" or index_type_of(vector_store.index) == target:
+        return False
+    logger.info(f"Converting the flat index to {target} now that it holds {n_vectors} vectors")
+    convert_vector_store(vector_store, index_type, params)
+    return True
+
+
+def read_index(path: str, mmap: bool = False) -> faiss.Index:
+    """Read an index file, memory-mapping its vectors and codes if mmap is set.
+
+    A mapped index is read-only: processes opening the same file share it
+    through the page cache instead of each holding a private copy. Falls
+    back to an ordinary read where this FAISS build cannot map the index.
+    """
+    if mmap:
+        for flag in ("IO_FLAG_MMAP_IFC", "IO_FLAG_MMAP"):
+            if not hasattr(faiss, flag):
+                continue
+            try:
+                return faiss.read_index(path, getattr(faiss, flag) | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError as e:
+                logger.warning(f"Could not memory-map {path} with {flag}: {str(e)}")
+        logger.warning(f"Reading {path} into memory")
+    return faiss.read_index(path)
+
+
+def writable_index(index: faiss.Index) -> faiss.Index:
+    """In-memory copy of a (memory-mapped) index that vectors can be added to or removed from"""
+    return faiss.deserialize_index(faiss.serialize_index(index))
+
+
+def _reconstruct_all(index: faiss.Index) -> np.ndarray:
+    """Every stored vector, in position order (decoded, for compressed indexes)"""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and not hasattr(index, "refine_index"):
+        ivf.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def remove_ids(vector_store, ids: List[str]):
+    """Delete documents from a store, whatever its index type.
+
+    A flat index renumbers the remaining positions itself. Other indexes are
+    refilled instead: the kept vectors go into a reset copy of the index, so
+    its training (IVF centroids, PQ codebooks) and build parameters carry
+    over. The id mapping is then compacted to match, in place for a
+    SQLite docstore's positions.
+    """
+    index = vector_store.index
+    id_map = vector_store.index_to_docstore_id
+    if hasattr(id_map, "positions_of"):
+        positions = id_map.positions_of(ids)
+    else:
+        positions = {doc_id: position for position, doc_id in id_map.items()}
+    missing = [doc_id for doc_id in ids if doc_id not in positions]
+    if missing:
+        raise ValueError(f"Some specified ids do not exist in the current store. Ids not found: {missing}")
+
+    dropped = sorted({positions[doc_id] for doc_id in ids})
+    if index_type_of(index) == "flat":
+        index.remove_ids(np.array(dropped, dtype=np.int64))
+    else:
+        dropped_set = set(dropped)
+        keep = [position for position in range(index.ntotal) if position not in dropped_set]
+        logger.info(f"Refilling {index_type_of(index)} index without {len(dropped)} vectors ({len(keep)} kept)")
+
+        vectors = _reconstruct_all(index)[keep]
+        rebuilt = faiss.clone_index(index)
+        rebuilt.reset()
+        add_vectors(rebuilt, vectors)
+        vector_store.index = rebuilt
+
+    vector_store.docstore.delete(ids)
+    if hasattr(id_map, "compact"):
+        id_map.compact(dropped)
+    else:
+        kept_ids = [doc_id for position, doc_id in sorted(id_map.items()) if position not in set(dropped)]
+        vector_store.index_to_docstore_id = dict(enumerate(kept_ids))
+
+
+def stored_vectors(index: faiss.Index) -> Optional[np.ndarray]:
+    """Zero-copy view of the full-precision vectors an index keeps, None if it only keeps codes"""
+    if hasattr(index, "refine_index"):
+        flat = faiss.downcast_index(index.refine_index)
+    elif hasattr(index, "storage"):
+        flat = faiss.downcast_index(index.storage)
+    else:
+        flat = index
+    if not isinstance(flat, faiss.IndexFlat) or flat.ntotal == 0:
+        return None
+    return faiss.rev_swig_ptr(flat.get_xb(), flat.ntotal * flat.d).reshape(flat.ntotal, flat.d)
+
+
+def search_subset(index: faiss.Index,
+                  query: np.ndarray,
+                  k: int,
+                  positions: np.ndarray,
+                  brute_force_max: int = BRUTE_FORCE_MAX_CANDIDATES) -> Tuple[np.ndarray, np.ndarray]:
+    """Nearest neighbours of query among the given positions only: (distances, positions), closest first.
+
+    Small candidate sets are scored exactly against their stored vectors, so
+    the cost follows the candidate count. Larger ones (or indexes that only
+    keep compressed codes) are searched with an id selector and the index's
+    configured nprobe / efSearch.
+    """
+    k = min(k, len(positions))
+    if k == 0:
+        return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+
+    query = np.ascontiguousarray(query[None, :])
+    vectors = stored_vectors(index) if len(positions) <= brute_force_max else None
+    if vectors is not None:
+        distances, best = faiss.knn(query, vectors[positions], k)
+        return distances[0], positions[best[0]]
+
+    # The parameter objects do not own the selector, so keep it referenced here
+    selector = faiss.IDSelectorBatch(np.ascontiguousarray(positions, dtype=np.int64))
+    ivf = faiss.try_extract_index_ivf(index)
+    if hasattr(index, "hnsw"):
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    elif ivf is not None:
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    if hasattr(index, "refine_index"):
+        base_params = params
+        params = faiss.IndexRefineSearchParameters(k_factor=index.k_factor, base_index_params=base_params)
+
+    distances, found = index.search(query, k, params=params)
+    keep = found[0] >= 0
+    return distances[0][keep], found[0][keep]
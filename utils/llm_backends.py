@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import random
+import threading
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from utils.llm_cache import message_fingerprint
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Backend selection: groq (default), record, replay or synthetic
+BACKENDS = ("groq", "record", "replay", "synthetic")
+DEFAULT_RECORDINGS_PATH = os.path.join("cache", "llm_recordings.jsonl")
+
+_SYNTHETIC_WORDS = (
+    "claim policy coverage amount settlement documentation review approved "
+    "pending history similar average provider treatment deductible limit "
+    "recommend risk assessment processing timeline verify eligible"
+).split()
+
+
+def _chunk_text(text: str) -> List[str]:
+    """Split text into word-sized chunks, keeping the separating whitespace"""
+    words = text.split(" ")
+    return [word + " " for word in words[:-1]] + [words[-1]]
+
+
+class OfflineLLM(ABC):
+    """Base class for local stand-ins for a LangChain chat model.
+
+    Subclasses implement _generate(messages) returning the response text and
+    the (time to first token, seconds per token) latency to simulate.
+    invoke() and stream() then behave like ChatGroq, including latency.
+    """
+
+    # Kept apart from real model responses in the LLM response cache
+    cache_tag = "offline"
+
+    @abstractmethod
+    def _generate(self, messages: List) -> Tuple[str, float, float]:
+        """Response text, time to first token and seconds per token for messages"""
+
+    def invoke(self, messages: List) -> AIMessage:
+        text, ttft, per_token = self._generate(messages)
+        time.sleep(ttft + per_token * len(_chunk_text(text)))
+        return AIMessage(content=text)
+
+    def stream(self, messages: List) -> Iterator[AIMessageChunk]:
+        text, ttft, per_token = self._generate(messages)
+        time.sleep(ttft)
+        for chunk in _chunk_text(text):
+            time.sleep(per_token)
+            yield AIMessageChunk(content=chunk)
+
+
+class SyntheticLLM(OfflineLLM):
+    """Deterministic synthetic responses with configurable latency.
+
+    The response text and its latency are derived from the prompt hash, so
+    the same prompt always gets the same answer and timing. Time to first
+    token is lognormally distributed around ttft_median; decoding runs at
+    tokens_per_second (words are treated as tokens).
+    """
+
+    def __init__(self,
+                 ttft_median: float = 0.3,
+                 ttft_sigma: float = 0.5,
+                 tokens_per_second: float = 250.0,
+                 response_tokens: int = 200,
+                 seed: int = 0):
+        self.ttft_median = ttft_median
+        self.ttft_sigma = ttft_sigma
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.seed = seed
+        self.cache_tag = f"synthetic-{seed}"
+
+    def _generate(self, messages: List):
+        fingerprint = message_fingerprint(messages)
+        rng = random.Random(f"{self.seed}:{fingerprint}")
+
+        length = max(1, int(rng.gauss(self.response_tokens, self.response_tokens * 0.2)))
+        text = f"[synthetic {fingerprint[:8]}] " + " ".join(
+            rng.choice(_SYNTHETIC_WORDS) for _ in range(length)
+        )
+        ttft = self.ttft_median * rng.lognormvariate(0, self.ttft_sigma) if self.ttft_median > 0 else 0.0
+        per_token = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        return text, ttft, per_token
+
+
+def _load_recordings(path: str) -> Dict[str, Dict]:
+    """Read recordings from a JSONL file, keyed by prompt hash"""
+    recordings = {}
+    if not os.path.exists(path):
+        return recordings
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                recordings[record["key"]] = {
+                    "response": record["response"],
+                    "ttft": record.get("ttft", 0.0),
+                    "per_token": record.get("per_token", 0.0)
+                }
+            except (json.JSONDecodeError, KeyError):
+                logger.warning(f"Skipping malformed recording on line {line_number} of {path}")
+    return recordings
+
+
+class ReplayLLM(OfflineLLM):
+    """Replays responses recorded by RecordingLLM, keyed by prompt hash.
+
+    Recorded responses are replayed with their recorded latency. Prompts
+    without a recording are answered by the fallback model if one is given,
+    otherwise a KeyError is raised.
+    """
+
+    def __init__(self, path: str = DEFAULT_RECORDINGS_PATH, fallback: Optional[OfflineLLM] = None):
+        self.path = path
+        self.fallback = fallback
+        self.recordings = _load_recordings(path)
+        self.cache_tag = "replay"
+        logger.info(f"Loaded {len(self.recordings)} recorded LLM responses from {path}")
+
+    def _generate(self, messages: List):
+        key = message_fingerprint(messages)
+        record = self.recordings.get(key)
+        if record is None:
+            if self.fallback is None:
+                raise KeyError(f"No recorded response for prompt {key[:12]}")
+            logger.debug(f"No recording for prompt {key[:12]}, using fallback")
+            return self.fallback._generate(messages)
+        return record["response"], record["ttft"], record["per_token"]
+
+
+class RecordingLLM:
+    """Wraps a real chat model and appends every response to a recordings file"""
+
+    def __init__(self, llm, path: str = DEFAULT_RECORDINGS_PATH):
+        self.llm = llm
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def _record(self, messages: List, response: str, ttft: float, total: float, chunks: int):
+        per_token = (total - ttft) / chunks if chunks else 0.0
+        record = {
+            "key": message_fingerprint(messages),
+            "response": response,
+            "ttft": round(ttft, 4),
+            "per_token": round(per_token, 6)
+        }
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def invoke(self, messages: List):
+        start = time.perf_counter()
+        response = self.llm.invoke(messages)
+        elapsed = time.perf_counter() - start
+        self._record(messages, response.content, elapsed, elapsed, 0)
+        return response
+
+    def stream(self, messages: List):
+        start = time.perf_counter()
+        ttft = None
+        chunks = []
+        for chunk in self.llm.stream(messages):
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            chunks.append(chunk.content)
+            yield chunk
+        self._record(messages, "".join(chunks), ttft or 0.0, time.perf_counter() - start, len(chunks))
+
+
+def create_llm(groq_api_key: Optional[str],
+               model: str,
+               temperature: float,
+               max_tokens: int = 2048,
+               backend: Optional[str] = None):
+    """Create the chat model for an agent.
+
+    The backend defaults to the LLM_BACKEND environment variable:
+    groq calls the Groq API, record does the same and records every response
+    to LLM_RECORDINGS_PATH, replay serves those recordings (falling back to
+    synthetic responses for unrecorded prompts) and synthetic generates
+    deterministic responses with latency set by LLM_TTFT_SECONDS and
+    LLM_TOKENS_PER_SECOND.
+    """
+    backend = (backend or os.getenv("LLM_BACKEND", "groq")).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{backend}', expected one of {', '.join(BACKENDS)}")
+
+    recordings_path = os.getenv("LLM_RECORDINGS_PATH", DEFAULT_RECORDINGS_PATH)
+    synthetic = SyntheticLLM(
+        ttft_median=float(os.getenv("LLM_TTFT_SECONDS", "0.3")),
+        tokens_per_second=float(os.getenv("LLM_TOKENS_PER_SECOND", "250"))
+    )
+
+    logger.info(f"Using {backend} LLM backend")
+    if backend == "synthetic":
+        return synthetic
+    if backend == "replay":
+        return ReplayLLM(recordings_path, fallback=synthetic)
+
+    from langchain_groq import ChatGroq
+
+    llm = ChatGroq(
+        groq_api_key=groq_api_key,
+        model_name=model,
+        temperature=temperature,
+        max_tokens=max_tokens
+    )
+    if backend == "record":
+        return RecordingLLM(llm, recordings_path)
+    return llm
+
+
+def is_offline_backend(backend: Optional[str] = None) -> bool:
+    """Whether the configured backend runs without the Groq API"""
+    return (backend or os.getenv("LLM_BACKEND", "groq")).lower() in ("replay", "synthetic")
+
+
+def cache_model_name(llm, model: str) -> str:
+    """Model name to use in LLM response cache keys for this chat model"""
+    tag = getattr(llm, "cache_tag", None)
+    return f"{model}@{tag}" if tag else model
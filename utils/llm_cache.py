@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import logging
+from typing import Dict, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join("cache", "llm_cache.sqlite")
+
+# Hits record their access time in memory; the times are written to the
+# database on the next put (before eviction) or once this many are queued
+ACCESS_FLUSH_SIZE = 256
+
+_caches: Dict[str, "LLMResponseCache"] = {}
+_caches_lock = threading.Lock()
+
+
+def message_fingerprint(messages: List) -> str:
+    """Stable hash of a message list (role and content of each message)"""
+    payload = [
+        [getattr(message, "type", type(message).__name__), getattr(message, "content", str(message))]
+        for message in messages
+    ]
+    return hashlib.sha256(
+        json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode()
+    ).hexdigest()
+
+
+def cache_key(model: str, temperature: float, messages: List) -> str:
+    """Cache key for one LLM call"""
+    return hashlib.sha256(
+        f"{model}|{temperature}|{message_fingerprint(messages)}".encode()
+    ).hexdigest()
+
+
+def get_llm_cache(path: Optional[str] = None) -> "LLMResponseCache":
+    """Get the process-wide response cache for a database path"""
+    path = os.path.abspath(path or os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH))
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = LLMResponseCache(path)
+            _caches[path] = cache
+        return cache
+
+
+class LLMResponseCache:
+    """SQLite-backed cache of LLM responses keyed by prompt hash.
+
+    Entries expire after ttl_seconds. When the cache grows past max_entries
+    the least recently used entries are evicted. Access times of hits are
+    batched rather than written per hit. Hits and misses are counted per
+    namespace (one namespace per agent).
+    """
+
+    def __init__(self,
+                 path: str = DEFAULT_CACHE_PATH,
+                 ttl_seconds: float = 7 * 24 * 3600,
+                 max_entries: int = 10000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+        # key -> last access time not yet written to the database
+        self._accessed: Dict[str, float] = {}
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._conn.commit()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def _count(self, namespace: str, outcome: str):
+        counters = self._counters.setdefault(namespace, {"hits": 0, "misses": 0})
+        counters[outcome] += 1
+
+    def _flush_access_times(self):
+        """Write queued access times (the caller commits)"""
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE responses SET last_access = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._accessed.items()]
+            )
+            self._accessed.clear()
+
+    def get(self, key: str, namespace: str = "default") -> Optional[str]:
+        """Get a cached response, or None on a miss or expired entry"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self._count(namespace, "misses")
+                return None
+
+            response, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._accessed.pop(key, None)
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self._entries -= 1
+                self._count(namespace, "misses")
+                return None
+
+            self._accessed[key] = now
+            if len(self._accessed) >= ACCESS_FLUSH_SIZE:
+                self._flush_access_times()
+                self._conn.commit()
+            self._count(namespace, "hits")
+            return response
+
+    def put(self, key: str, response: str):
+        """Store a response, evicting least recently used entries if over the cap"""
+        now = time.time()
+        with self._lock:
+            self._accessed.pop(key, None)
+            cursor = self._conn.execute(
+                "UPDATE responses SET response = ?, created_at = ?, last_access = ? WHERE key = ?",
+                (response, now, now, key)
+            )
+            if cursor.rowcount == 0:
+                self._conn.execute(
+                    "INSERT INTO responses (key, response, created_at, last_access) VALUES (?, ?, ?, ?)",
+                    (key, response, now, now)
+                )
+                self._entries += 1
+
+            if self._entries > self.max_entries:
+                # Evict by up-to-date access times
+                self._flush_access_times()
+                # Evict down to 90% of the cap so eviction is amortized
+                excess = self._entries - int(self.max_entries * 0.9)
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                    (excess,)
+                )
+                self._entries -= excess
+                logger.info(f"Evicted {excess} LLM cache entries")
+            self._conn.commit()
+
+    def clear(self):
+        """Remove every cached response"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._entries = 0
+            self._accessed.clear()
+
+    def stats(self) -> Dict:
+        """Entry count and per-namespace hit/miss counters"""
+        with self._lock:
+            return {
+                "entries": self._entries,
+                "max_entries": self.max_entries,
+                "namespaces": {name: dict(counters) for name, counters in self._counters.items()}
+            }
@@ -0,0 +1,239 @@
+import os
+import time
+import bisect
+import inspect
+import threading
+import functools
+import logging
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+METRIC_NAME = "claims_stage_duration_seconds"
+
+# Histogram bucket upper bounds in seconds, from cache hits to long completions
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# The entry point (agent method or page) each thread is currently serving
+_context = threading.local()
+
+
+class Histogram:
+    """Cumulative latency histogram plus a window of recent samples for exact percentiles"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, window: int = 2048):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent: Deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+
+
+class MetricsRegistry:
+    """Latency histograms keyed by (stage, operation)"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, operation: str, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get((stage, operation))
+            if histogram is None:
+                histogram = Histogram(self.buckets)
+                self._histograms[(stage, operation)] = histogram
+            histogram.observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def summary(self) -> List[Dict]:
+        """Count, mean and recent p50/p95/p99 (in milliseconds) per stage and operation"""
+        with self._lock:
+            items = [(key, histogram.count, histogram.sum, list(histogram.recent))
+                     for key, histogram in self._histograms.items()]
+
+        rows = []
+        for (stage, operation), count, total, recent in sorted(items):
+            p50, p95, p99 = np.percentile(recent, [50, 95, 99]) * 1000
+            rows.append({
+                "operation": operation,
+                "stage": stage,
+                "count": count,
+                "mean_ms": total / count * 1000,
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99)
+            })
+        return rows
+
+    def render_prometheus(self) -> str:
+        """All histograms in the Prometheus text exposition format"""
+        lines = [
+            f"# HELP {METRIC_NAME} Time spent in each stage of claim analysis and policy validation.",
+            f"# TYPE {METRIC_NAME} histogram"
+        ]
+        with self._lock:
+            for (stage, operation), histogram in sorted(self._histograms.items()):
+                labels = f'stage="{stage}",operation="{operation}"'
+                cumulative = 0
+                for bound, count in zip(self.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{METRIC_NAME}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{METRIC_NAME}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"{METRIC_NAME}_sum{{{labels}}} {histogram.sum:.6f}")
+                lines.append(f"{METRIC_NAME}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def current_operation() -> Optional[str]:
+    """The entry point this thread is serving, if any"""
+    return getattr(_context, "operation", None)
+
+
+@contextmanager
+def _serving(operation: str):
+    """Attribute stages run on this thread to operation, unless already inside one"""
+    if current_operation() is not None:
+        yield False
+        return
+    _context.operation = operation
+    try:
+        yield True
+    finally:
+        _context.operation = None
+
+
+def record(stage: str, seconds: float, operation: Optional[str] = None):
+    """Record a measured duration as one stage of the current operation"""
+    REGISTRY.observe(stage, operation or current_operation() or "unattributed", seconds)
+
+
+@contextmanager
+def span(stage: str, operation: Optional[str] = None):
+    """Time a block as one stage of the current operation"""
+    operation = operation or current_operation()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start, operation)
+
+
+def _wrap(func: Callable, name: str, report: Callable[[str, float], None]) -> Callable:
+    """Wrap a function or generator function, passing (operation, duration) to report"""
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            generator = func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                while True:
+                    # Generators are resumed on whatever thread consumes them,
+                    # so the operation is re-established on every step
+                    with _serving(name) as root:
+                        operation = name if root else current_operation()
+                        try:
+                            item = next(generator)
+                        except StopIteration:
+                            return
+                    yield item
+            finally:
+                report(operation, time.perf_counter() - start)
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _serving(name) as root:
+            operation = name if root else current_operation()
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                report(operation, time.perf_counter() - start)
+    return wrapper
+
+
+def traced(func: Callable) -> Callable:
+    """Mark an entry point: its stages are attributed to it and its total time recorded.
+
+    Entry points called from inside another entry point count towards the
+    outer one instead.
+    """
+    name = func.__name__
+
+    def report(operation: str, seconds: float):
+        if operation == name:
+            REGISTRY.observe("total", name, seconds)
+
+    return _wrap(func, name, report)
+
+
+def timed(stage: str) -> Callable:
+    """Decorator timing every call of a function as a stage of the current operation"""
+    def decorator(func: Callable) -> Callable:
+        return _wrap(func, func.__name__, lambda operation, seconds: REGISTRY.observe(stage, operation, seconds))
+    return decorator
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: Optional[int] = None) -> Optional[int]:
+    """Serve /metrics on a background thread (once per process).
+
+    The port defaults to the METRICS_PORT environment variable; without one
+    no server is started. Returns the port being served.
+    """
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server.server_address[1]
+
+        port = port if port is not None else os.getenv("METRICS_PORT")
+        if port is None:
+            return None
+
+        try:
+            _server = ThreadingHTTPServer(("0.0.0.0", int(port)), _MetricsHandler)
+        except OSError as e:
+            logger.error(f"Could not start metrics server on port {port}: {str(e)}")
+            return None
+
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        logger.info(f"Serving Prometheus metrics on port {_server.server_address[1]}/metrics")
+        return _server.server_address[1]
@@ -1,14 +1,44 @@
 import os
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.vectorstores import FAISS
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 import json
 import logging
-from typing import List, Dict
+import faiss
+import numpy as np
+from utils.embedding_registry import DEFAULT_MODEL_NAME, get_embeddings
+from utils.embedding_pipeline import EmbeddingPipeline
+from utils.faiss_index import (
+    index_params, index_type_of, read_index, remove_ids, search_subset, set_search_params, upgrade_vector_store,
+    writable_index
+)
+from utils.metrics import timed
+from utils.vector_store_io import load_vector_store, write_index_files
+from utils.vector_store_manifest import (
+    INDEX_FILE, build_manifest, check_manifest, diff_records, load_manifest, record_hash, records_digest
+)
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
 
 class PolicyEmbedder:
-    def __init__(self, model_name: str = "sentence-transformers/all-mpnet-base-v2"):
-        self.embeddings = HuggingFaceEmbeddings(model_name=model_name)
+    def __init__(self,
+                 model_name: str = DEFAULT_MODEL_NAME,
+                 embed_batch_size: int = 256,
+                 embed_workers: int = int(os.getenv("EMBED_WORKERS", "1")),
+                 index_type: str = os.getenv("POLICY_INDEX_TYPE", "flat"),
+                 index_build_params: Optional[Dict] = None,
+                 nprobe: int = int(os.getenv("FAISS_NPROBE", "16")),
+                 ef_search: int = int(os.getenv("FAISS_EF_SEARCH", "64")),
+                 vector_storage: str = os.getenv("VECTOR_STORAGE", "float32"),
+                 mmap_index: bool = os.getenv("FAISS_MMAP", "0") == "1"):
+        self.model_name = model_name
+        self.embeddings = get_embeddings(model_name)
+        self.embed_batch_size = embed_batch_size
+        self.embed_workers = embed_workers
+        self.index_type = index_type
+        self.vector_storage = vector_storage
+        self.index_build_params = index_params(index_type, {"storage": vector_storage, **(index_build_params or {})})
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.mmap_index = mmap_index
+        self._index_mapped = False
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
             chunk_overlap=200,
@@ -17,8 +47,11 @@ class PolicyEmbedder:
         self.vector_store = None
         self.vector_store_path = os.path.join("vector_stores", "policy_vectors")
         
-        # Ensure vector store directory exists
-        os.makedirs(self.vector_store_path, exist_ok=True)
+        # Digest of the indexed chunks' record hashes (each chunk's hash is
+        # kept in its docstore row, by chunk id "<policy number>:<chunk>")
+        self._digest = ""
+        # Chunk ids of every policy, for searches scoped to one policy
+        self._policy_chunks: Dict[str, List[str]] = {}
         
     def _prepare_policy_text(self, policy: Dict) -> List[str]:
         """Convert policy dictionary to searchable text chunks"""
@@ -42,51 +75,175 @@ class PolicyEmbedder:
         # Split into chunks
         return self.text_splitter.split_text(policy_text)
         
+    def _iter_documents(self, policies_data: Dict[str, Dict]) -> Iterator[Tuple[str, str, Dict]]:
+        """Yield (chunk id, chunk text, metadata) for every policy chunk"""
+        for policy_number, policy in policies_data.items():
+            for i, chunk in enumerate(self._prepare_policy_text(policy)):
+                yield f"{policy_number}:{i}", chunk, {"policy_number": policy_number}
+        
+    def _set_chunks(self, doc_ids: Iterable[str]):
+        """Track the indexed chunk ids, grouped by policy number"""
+        self._policy_chunks = {}
+        for doc_id in doc_ids:
+            self._policy_chunks.setdefault(doc_id.rsplit(":", 1)[0], []).append(doc_id)
+        
+    def _map_saved_index(self):
+        """Swap the in-memory index for a memory-mapping of the copy just saved"""
+        if self.mmap_index:
+            self.vector_store.index = read_index(os.path.join(self.vector_store_path, INDEX_FILE), mmap=True)
+            self._index_mapped = True
+        set_search_params(self.vector_store.index, self.nprobe, self.ef_search)
+        
     def create_vector_store(self, policies_data: Dict[str, Dict]):
         """Create vector store from policies"""
         try:
-            all_texts = []
-            metadatas = []
-            
-            for policy_number, policy in policies_data.items():
-                policy_chunks = self._prepare_policy_text(policy)
-                all_texts.extend(policy_chunks)
-                metadatas.extend([{"policy_number": policy_number}] * len(policy_chunks))
-            
-            self.vector_store = FAISS.from_texts(
-                texts=all_texts,
-                embedding=self.embeddings,
-                metadatas=metadatas
+            pipeline = EmbeddingPipeline(
+                self.embeddings,
+                batch_size=self.embed_batch_size,
+                workers=self.embed_workers
             )
-            
-            self.vector_store.save_local(self.vector_store_path)
-            logging.info(f"Created vector store with {len(all_texts)} policy chunks")
+            self.vector_store = pipeline.build_vector_store(
+                self._iter_documents(policies_data),
+                self.vector_store_path,
+                index_type=self.index_type,
+                index_params=self.index_build_params
+            )
+            self._index_mapped = False
+            if pipeline.last_manifest:
+                self._digest = pipeline.last_manifest["digest"]
+                self._set_chunks(self.vector_store.docstore.record_hashes())
+                self._map_saved_index()
+            logging.info(f"Created vector store with {pipeline.last_stats['texts']} policy chunks")
         except Exception as e:
             logging.error(f"Error creating vector store: {str(e)}")
             raise
         
     def load_vector_store(self) -> bool:
-        """Load existing vector store"""
+        """Load the existing vector store if its manifest matches the current model"""
         try:
-            if os.path.exists(self.vector_store_path):
-                self.vector_store = FAISS.load_local(
-                    self.vector_store_path,
-                    self.embeddings
-                )
-                logging.info("Loaded existing vector store")
-                return True
-            return False
+            manifest = load_manifest(self.vector_store_path)
+            reason = check_manifest(
+                manifest, self.model_name, index_type=self.index_type, storage=self.vector_storage
+            )
+            if reason:
+                logging.info(f"Not loading policy vector store: {reason}")
+                return False
+            
+            # Only stores written (with a manifest) by this class are loaded
+            vector_store = load_vector_store(self.vector_store_path, self.embeddings, self.mmap_index, writable=True)
+            reason = check_manifest(manifest, self.model_name, vector_store, self.index_type, self.vector_storage)
+            if reason:
+                logging.info(f"Not loading policy vector store: {reason}")
+                vector_store.docstore.close()
+                return False
+            
+            set_search_params(vector_store.index, self.nprobe, self.ef_search)
+            self.vector_store = vector_store
+            self._index_mapped = self.mmap_index
+            hashes = vector_store.docstore.record_hashes()
+            # Version 1 manifests have no digest
+            self._digest = manifest.get("digest") or records_digest(hashes.values())
+            self._set_chunks(hashes)
+            logging.info("Loaded existing vector store")
+            return True
         except Exception as e:
             logging.error(f"Error loading vector store: {str(e)}")
             return False
     
-    def search_policies(self, query: str, k: int = 3) -> List[Dict]:
-        """Search policies using semantic similarity"""
+    def sync_policies(self, policies_data: Dict[str, Dict]) -> int:
+        """Re-embed only the policy chunks added or changed since the store was built"""
+        try:
+            documents = {doc_id: (text, metadata) for doc_id, text, metadata in self._iter_documents(policies_data)}
+            current = {doc_id: record_hash(text, metadata) for doc_id, (text, metadata) in documents.items()}
+            if records_digest(current.values()) == self._digest and len(current) == self.vector_store.index.ntotal:
+                logging.info("Policy vector store is up to date")
+                return 0
+            
+            added, changed, removed = diff_records(self.vector_store.docstore.record_hashes(), current)
+            logging.info(
+                f"Policy vector store is stale: {len(added)} added, "
+                f"{len(changed)} changed, {len(removed)} removed chunks"
+            )
+            
+            # A memory-mapped index is read-only; change an in-memory copy.
+            # Documents are changed in the live docstore in one transaction.
+            if self._index_mapped:
+                self.vector_store.index = writable_index(self.vector_store.index)
+                self._index_mapped = False
+            
+            updated_ids = added + changed
+            texts = [documents[doc_id][0] for doc_id in updated_ids]
+            vectors = self.embeddings.embed_documents(texts) if texts else []
+            try:
+                stale_ids = changed + removed
+                if stale_ids:
+                    remove_ids(self.vector_store, stale_ids)
+                
+                if updated_ids:
+                    self.vector_store.add_embeddings(
+                        text_embeddings=list(zip(texts, vectors)),
+                        metadatas=[documents[doc_id][1] for doc_id in updated_ids],
+                        ids=updated_ids
+                    )
+                    upgrade_vector_store(self.vector_store, self.index_type, self.index_build_params)
+                self.vector_store.docstore.commit()
+            except Exception:
+                self.vector_store.docstore.rollback()
+                raise
+            self._digest = records_digest(current.values())
+            self._set_chunks(current)
+            
+            write_index_files(
+                self.vector_store_path,
+                faiss.serialize_index(self.vector_store.index),
+                build_manifest(
+                    self.model_name,
+                    self.vector_store.index.d,
+                    self.vector_store.index.ntotal,
+                    self._digest,
+                    index_type_of(self.vector_store.index),
+                    self.vector_storage,
+                    self.vector_store.docstore.version
+                )
+            )
+            self._map_saved_index()
+            return len(updated_ids) + len(removed)
+        except Exception as e:
+            logging.error(f"Error syncing policy vector store: {str(e)}")
+            return 0
+    
+    def _chunk_positions(self, policy_number: str) -> np.ndarray:
+        """Sorted index positions of one policy's chunks"""
+        doc_ids = self._policy_chunks.get(policy_number, [])
+        id_map = self.vector_store.index_to_docstore_id
+        if hasattr(id_map, "positions_of"):
+            positions = id_map.positions_of(doc_ids).values()
+        else:
+            wanted = set(doc_ids)
+            positions = [position for position, doc_id in id_map.items() if doc_id in wanted]
+        return np.sort(np.fromiter(positions, dtype=np.int64))
+    
+    @timed("retrieval")
+    def search_policies(self, query: str, k: int = 3, policy_number: Optional[str] = None) -> List[Dict]:
+        """Search policies using semantic similarity, only within policy_number's chunks if given"""
         try:
             if not self.vector_store:
                 raise ValueError("Vector store not initialized")
-                
-            results = self.vector_store.similarity_search_with_score(query, k=k)
+            
+            if policy_number is None:
+                results = self.vector_store.similarity_search_with_score(query, k=k)
+            else:
+                store = self.vector_store
+                distances, positions = search_subset(
+                    store.index,
+                    np.asarray(self.embeddings.embed_query(query), dtype=np.float32),
+                    k,
+                    self._chunk_positions(policy_number)
+                )
+                results = [
+                    (store.docstore.search(store.index_to_docstore_id[int(position)]), float(distance))
+                    for distance, position in zip(distances, positions)
+                ]
             return [(doc.page_content, doc.metadata, score) for doc, score in results]
         except Exception as e:
             logging.error(f"Error searching policies: {str(e)}")
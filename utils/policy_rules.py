@@ -0,0 +1,245 @@
+import logging
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.policy_sections import PolicySections
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Documents a claim of each type must come with
+REQUIRED_DOCUMENTS = {
+    "Emergency Care": [
+        "Hospital Report",
+        "Medical Bills",
+        "Treatment Records",
+        "Emergency Room Documentation"
+    ],
+    "Prescription": [
+        "Prescription",
+        "Pharmacy Bill",
+        "Doctor's Note"
+    ],
+    "Specialist Visit": [
+        "Referral Letter",
+        "Specialist Report",
+        "Medical Bills",
+        "Treatment Plan"
+    ],
+    "Preventive Care": [
+        "Provider Report",
+        "Medical Bills",
+        "Preventive Care Schedule"
+    ]
+}
+DEFAULT_REQUIRED_DOCUMENTS = ["Medical Documentation", "Bills"]
+
+# Section limits that depend on what was already paid this period (which the
+# rules cannot see), so claims under such sections always go to the LLM; a
+# section's coverage_limit caps a single claim
+PERIOD_LIMITS = ("annual_limit", "monthly_limit", "daily_limit")
+
+
+def required_documents(claim_type: str) -> List[str]:
+    """Documents required for a claim type"""
+    return REQUIRED_DOCUMENTS.get(claim_type, DEFAULT_REQUIRED_DOCUMENTS)
+
+
+def _parse_date(value) -> Optional[date]:
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def _normalize(text: str) -> str:
+    return " " + " ".join(str(text).lower().replace("-", " ").replace("_", " ").split()) + " "
+
+
+def _keyword(term: str) -> str:
+    """Leading words of an exclusion or waiting period, e.g. 'cosmetic' or 'pre existing'"""
+    words = _normalize(term).split()
+    keyword = ""
+    for word in words:
+        keyword = f"{keyword} {word}".strip()
+        if len(keyword) >= 5:
+            break
+    return keyword
+
+
+def _number(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class PolicyRules:
+    """Deterministic verdicts for clear-cut claims, compiled from the policies.
+
+    Each policy's terms (status, period, deductible, remaining coverage,
+    exclusion and waiting-period keywords) are parsed once, and the coverage
+    rule for a claim type is resolved once per policy; evaluating a claim
+    is then a few comparisons. Anything the policy terms alone cannot
+    settle gets decision "review" and goes to the LLM.
+    """
+
+    def __init__(self, policies_data: Dict[str, Dict], policy_sections: Optional[PolicySections] = None):
+        self.policy_sections = policy_sections or PolicySections(policies_data)
+        self._policies: Dict[str, Dict[str, Any]] = {}
+        self._coverage: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = {}
+
+        for policy_number, policy in policies_data.items():
+            coverage_limit = _number(policy.get("coverage_limit")) or 0.0
+            remaining = _number(policy.get("remaining_coverage"))
+            self._policies[policy_number] = {
+                "active": str(policy.get("status", "")).lower() == "active",
+                "status": policy.get("status"),
+                "effective": _parse_date(policy.get("effective_date")),
+                "expiration": _parse_date(policy.get("expiration_date")),
+                "deductible": _number(policy.get("deductible")) or 0.0,
+                "remaining_coverage": coverage_limit if remaining is None else remaining,
+                "keywords": [
+                    (_keyword(term), term)
+                    for term in list(policy.get("exclusions") or []) + list(policy.get("waiting_periods") or {})
+                    if _keyword(term)
+                ]
+            }
+
+    def _coverage_rule(self, policy_number: str, claim_type: str) -> Optional[Dict[str, Any]]:
+        """The claim type's coverage terms under a policy, None if no single section applies"""
+        key = (policy_number, claim_type)
+        if key not in self._coverage:
+            section = self.policy_sections.coverage_section(policy_number, claim_type)
+            rule = None
+            if section is not None:
+                name, terms = section
+                rule = {
+                    "section": name,
+                    "covered": bool(terms.get("covered", False)),
+                    "percentage": _number(terms.get("coverage_percentage")),
+                    "deductible_applies": bool(terms.get("deductible_applies", True)),
+                    "prior_authorization": bool(terms.get("prior_authorization", False)),
+                    "claim_limit": _number(terms.get("coverage_limit")),
+                    "period_limits": {
+                        limit: _number(terms[limit]) for limit in PERIOD_LIMITS if _number(terms.get(limit)) is not None
+                    }
+                }
+            self._coverage[key] = rule
+        return self._coverage[key]
+
+    def evaluate(self, policy_number: str, claim: Dict) -> Dict[str, Any]:
+        """Verdict for a claim: decision, the terms applied, estimated payment and the reasons.
+
+        The decision is approve, deny or pend (required documents missing)
+        when the rules settle the claim, review when it needs the LLM.
+        """
+        claim_type = claim.get("claim_type") or ""
+        amount = _number(claim.get("amount"))
+        missing = sorted(set(required_documents(claim_type)) - set(claim.get("documents_provided") or []))
+        verdict = {
+            "decision": "review",
+            "policy_number": policy_number,
+            "claim_type": claim_type,
+            "claim_amount": amount,
+            "coverage_section": None,
+            "coverage_percentage": None,
+            "deductible": None,
+            "estimated_payment": None,
+            "remaining_coverage": None,
+            "missing_documents": missing,
+            "reasons": []
+        }
+        reasons = verdict["reasons"]
+
+        policy = self._policies.get(policy_number)
+        if policy is None:
+            verdict["decision"] = "deny"
+            reasons.append("Policy number not found")
+            return verdict
+        verdict["remaining_coverage"] = policy["remaining_coverage"]
+
+        if not policy["active"]:
+            verdict["decision"] = "deny"
+            reasons.append(f"Policy status is {policy['status']}")
+            return verdict
+
+        filed = _parse_date(claim.get("date_filed"))
+        if filed and policy["effective"] and filed < policy["effective"]:
+            verdict["decision"] = "deny"
+            reasons.append(f"Claim filed {filed} before the policy took effect on {policy['effective']}")
+            return verdict
+
+        rule = self._coverage_rule(policy_number, claim_type)
+        if rule is None:
+            reasons.append(f"No single coverage section matches claim type {claim_type!r}")
+            return verdict
+        verdict["coverage_section"] = rule["section"]
+        verdict["coverage_percentage"] = rule["percentage"]
+
+        if not rule["covered"]:
+            verdict["decision"] = "deny"
+            reasons.append(f"{rule['section']} is not covered by the policy")
+            return verdict
+
+        # Everything below needs judgement the policy terms cannot supply
+        if amount is None or amount <= 0:
+            reasons.append("Claim amount is missing")
+        if rule["percentage"] is None:
+            reasons.append(f"{rule['section']} has no coverage percentage")
+        if filed is None:
+            reasons.append("Filing date is missing")
+        elif policy["expiration"] and filed > policy["expiration"]:
+            reasons.append(f"Claim filed after the policy expired on {policy['expiration']}")
+        for limit, value in rule["period_limits"].items():
+            # Whether this claim fits depends on what was already paid this period
+            reasons.append(f"{rule['section']} is subject to a {limit.replace('_', ' ')} of ${value:,.2f}")
+        if rule["prior_authorization"]:
+            reasons.append(f"{rule['section']} requires prior authorization")
+        description = _normalize(claim.get("description") or "")
+        for keyword, term in policy["keywords"]:
+            if f" {keyword}" in description:
+                reasons.append(f"Description may fall under {term!r}")
+        if amount is not None:
+            if amount > policy["remaining_coverage"]:
+                reasons.append(f"Amount exceeds the remaining coverage of ${policy['remaining_coverage']:,.2f}")
+        if reasons:
+            return verdict
+
+        deductible = policy["deductible"] if rule["deductible_applies"] else 0.0
+        payment = max(0.0, amount - deductible) * rule["percentage"] / 100
+        if rule["claim_limit"] is not None:
+            payment = min(payment, rule["claim_limit"])
+        verdict["deductible"] = deductible
+        verdict["estimated_payment"] = round(payment, 2)
+
+        if missing:
+            verdict["decision"] = "pend"
+            reasons.append(f"Missing required documents: {', '.join(missing)}")
+        else:
+            verdict["decision"] = "approve"
+            reasons.append(
+                f"Covered under {rule['section']} at {rule['percentage']:g}% "
+                f"after a ${deductible:,.2f} deductible"
+            )
+        return verdict
+
+
+def format_verdict(verdict: Dict[str, Any]) -> str:
+    """Readable summary of a rule verdict, in place of the LLM's validation text"""
+    lines = [f"Decision: {verdict['decision'].upper()}"]
+    if verdict["coverage_section"]:
+        section = f"Coverage section: {verdict['coverage_section']}"
+        # Sections marked not covered often have no percentage
+        if verdict["coverage_percentage"] is not None:
+            section += f" ({verdict['coverage_percentage']:g}%)"
+        lines.append(section)
+    if verdict["estimated_payment"] is not None:
+        lines.append(
+            f"Claim amount: ${verdict['claim_amount']:,.2f}; deductible: ${verdict['deductible']:,.2f}; "
+            f"estimated payment: ${verdict['estimated_payment']:,.2f}"
+        )
+    if verdict["remaining_coverage"] is not None:
+        lines.append(f"Remaining coverage: ${verdict['remaining_coverage']:,.2f}")
+    lines.extend(f"- {reason}" for reason in verdict["reasons"])
+    return "\n".join(lines)
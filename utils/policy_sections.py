@@ -0,0 +1,93 @@
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Per-claim-type policy sections, keyed by names like "prescription_drugs"
+# or "emergency_claims"
+SECTION_FIELDS = ("coverage_details", "documentation_requirements", "additional_benefits")
+
+# Section and claim-type words are compared on their first few letters, so
+# "Prescription" matches "prescription_drugs" and "prescription_claims"
+PREFIX_LENGTH = 5
+
+
+def _word_prefixes(text: str, separator: Optional[str] = None) -> List[str]:
+    return [word.lower()[:PREFIX_LENGTH] for word in text.split(separator) if word]
+
+
+def matches_claim_type(section_name: str, claim_type: Optional[str]) -> bool:
+    """Check whether a policy section key (e.g. 'prescription_drugs') is about a claim type"""
+    if not claim_type:
+        return False
+    section_words = _word_prefixes(section_name, "_")
+    return any(word in section_words for word in _word_prefixes(claim_type))
+
+
+class PolicySections:
+    """Claim type -> matching policy sections, for every policy.
+
+    Each policy's section names are indexed by word prefix when the policies
+    are loaded, so looking up the sections for a (policy, claim type) costs
+    the same however many policies there are. Lookups are memoized.
+    """
+
+    def __init__(self, policies_data: Dict[str, Dict]):
+        self.policies_data = policies_data
+        # policy number -> field -> word prefix -> section names
+        self._index: Dict[str, Dict[str, Dict[str, List[str]]]] = {}
+        self._matches: Dict[Tuple[str, str], Dict[str, Dict[str, Any]]] = {}
+
+        for policy_number, policy in policies_data.items():
+            fields = {}
+            for field in SECTION_FIELDS:
+                prefixes: Dict[str, List[str]] = {}
+                for name in policy.get(field) or {}:
+                    for prefix in _word_prefixes(name, "_"):
+                        prefixes.setdefault(prefix, []).append(name)
+                fields[field] = prefixes
+            self._index[policy_number] = fields
+        logger.info(f"Indexed policy sections of {len(self._index)} policies")
+
+    def matching(self, policy_number: str, claim_type: Optional[str]) -> Dict[str, Dict[str, Any]]:
+        """Sections of each field in SECTION_FIELDS that are about claim_type (empty if none are)"""
+        key = (policy_number, (claim_type or "").strip().lower())
+        matched = self._matches.get(key)
+        if matched is not None:
+            return matched
+
+        policy = self.policies_data.get(policy_number) or {}
+        fields = self._index.get(policy_number, {})
+        matched = {}
+        for field in SECTION_FIELDS:
+            names = set()
+            for prefix in _word_prefixes(key[1]):
+                names.update(fields.get(field, {}).get(prefix, ()))
+            # Keep the policy's own section order
+            matched[field] = {name: terms for name, terms in policy.get(field, {}).items() if name in names}
+
+        self._matches[key] = matched
+        return matched
+
+    def coverage_section(self, policy_number: str, claim_type: Optional[str]) -> Optional[Tuple[str, Dict]]:
+        """(name, terms) of the coverage or benefit section that best matches claim_type.
+
+        The best section shares the most words with the claim type, so
+        "Emergency Care" picks emergency_care over preventive_care. None if
+        no section matches or two match equally well.
+        """
+        matched = self.matching(policy_number, claim_type)
+        claim_words = set(_word_prefixes(claim_type or ""))
+        scored = sorted(
+            (
+                (len(claim_words & set(_word_prefixes(name, "_"))), name, terms)
+                for field in ("coverage_details", "additional_benefits")
+                for name, terms in matched[field].items()
+            ),
+            key=lambda item: item[0],
+            reverse=True
+        )
+        if not scored or (len(scored) > 1 and scored[0][0] == scored[1][0]):
+            return None
+        return scored[0][1], scored[0][2]
@@ -0,0 +1,118 @@
+import json
+import math
+import heapq
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio for English/JSON text with Llama/Mixtral
+# style tokenizers; close enough for budgeting without a tokenizer dependency
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of a piece of text"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def compact_json(data: Any) -> str:
+    """Serialize data without indentation or separator whitespace"""
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def compact_claim(claim: Dict, description_chars: int = 120) -> Dict:
+    """Keep only the claim fields that matter for analysis"""
+    compact = {
+        "id": claim.get("claim_id"),
+        "type": claim.get("claim_type"),
+        "amount": claim.get("amount"),
+        "settled": claim.get("settlement_amount"),
+        "status": claim.get("status"),
+        "date": claim.get("date_filed"),
+        "days": claim.get("processing_time")
+    }
+    description = claim.get("description")
+    if description:
+        compact["desc"] = description[:description_chars]
+    return {key: value for key, value in compact.items() if value is not None}
+
+
+def rank_claim_history(history: Iterable[Dict], claim_details: Dict, limit: Optional[int] = None) -> List[Dict]:
+    """Order a policy's past claims by relevance: same claim type first, then most recent"""
+    claim_type = claim_details.get("claim_type")
+
+    def relevance(claim: Dict):
+        return claim.get("claim_type") == claim_type, claim.get("date_filed") or ""
+
+    if limit is not None:
+        return heapq.nlargest(limit, history, key=relevance)
+    return sorted(history, key=relevance, reverse=True)
+
+
+class PromptBuilder:
+    """Assemble prompt sections under a token budget.
+
+    Sections are added in priority order; each one is compactly encoded and
+    limited to its own cap and to what is left of the overall budget. Item
+    lists keep their highest-ranked items that fit. report() gives the token
+    count of every section so prompt size stays observable.
+    """
+
+    def __init__(self, token_budget: int = 3000):
+        self.token_budget = token_budget
+        self._sections: Dict[str, str] = {}
+
+    @property
+    def used_tokens(self) -> int:
+        return sum(estimate_tokens(text) for text in self._sections.values())
+
+    @property
+    def remaining_tokens(self) -> int:
+        return max(0, self.token_budget - self.used_tokens)
+
+    def _limit(self, max_tokens: Optional[int]) -> int:
+        remaining = self.remaining_tokens
+        return remaining if max_tokens is None else min(remaining, max_tokens)
+
+    def add(self, name: str, data: Any, max_tokens: Optional[int] = None) -> str:
+        """Add a section, truncating it if it does not fit"""
+        text = data if isinstance(data, str) else compact_json(data)
+        limit = self._limit(max_tokens)
+        if estimate_tokens(text) > limit:
+            text = text[:max(0, limit * CHARS_PER_TOKEN - 3)] + "..."
+        self._sections[name] = text
+        return text
+
+    def add_items(self,
+                  name: str,
+                  items: Iterable[Any],
+                  max_items: Optional[int] = None,
+                  max_tokens: Optional[int] = None) -> str:
+        """Add a list section with as many of the (pre-ranked) items as fit"""
+        limit_chars = self._limit(max_tokens) * CHARS_PER_TOKEN
+        chosen = []
+        used_chars = 2  # enclosing brackets
+        for item in items:
+            if max_items is not None and len(chosen) >= max_items:
+                break
+            item_chars = len(compact_json(item)) + 1
+            if used_chars + item_chars > limit_chars:
+                break
+            chosen.append(item)
+            used_chars += item_chars
+
+        text = compact_json(chosen)
+        self._sections[name] = text
+        return text
+
+    def __getitem__(self, name: str) -> str:
+        return self._sections[name]
+
+    def report(self) -> Dict[str, int]:
+        """Token count per section, plus the total and the budget"""
+        report = {name: estimate_tokens(text) for name, text in self._sections.items()}
+        report["total"] = self.used_tokens
+        report["budget"] = self.token_budget
+        return report
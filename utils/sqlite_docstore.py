@@ -0,0 +1,333 @@
+import os
+import json
+import sqlite3
+import threading
+import logging
+from collections.abc import MutableMapping
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from langchain.docstore.base import AddableMixin, Docstore
+from langchain.docstore.document import Document
+
+from utils.vector_store_manifest import record_hash
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DOCSTORE_FILE = "docstore.sqlite"
+
+WRITE_BATCH_SIZE = 10000
+
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    """Documents of a FAISS store kept in SQLite and read by id on demand.
+
+    Each row also holds the document's position in the FAISS index, exposed
+    through positions (a lazy replacement for index_to_docstore_id). Opening
+    a store reads nothing up front, so it costs the same at any corpus
+    size. Every row keeps the record hash of its text and metadata, so
+    changed records can be found without re-reading them. Stores are
+    opened read-only unless writable; writable stores are
+    changed in place, in transactions ended by commit or rollback. version
+    counts the times positions were renumbered, so an index saved before a
+    renumbering can be told apart from one saved after it.
+    """
+
+    def __init__(self, path: str, writable: bool = False):
+        self.path = path
+        self.writable = writable
+        self._lock = threading.Lock()
+
+        if writable:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            # Readers in other processes are not blocked while documents are written
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    doc_id TEXT PRIMARY KEY,
+                    position INTEGER UNIQUE,
+                    page_content TEXT NOT NULL,
+                    metadata TEXT NOT NULL,
+                    record_hash TEXT
+                )
+            """)
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(documents)")]
+            if "record_hash" not in columns:
+                self._add_record_hashes()
+            self._conn.commit()
+        else:
+            self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self.positions = DocstorePositions(self)
+
+    def _add_record_hashes(self):
+        """Add the record_hash column to a store saved before it existed, hashing every document once"""
+        self._conn.execute("ALTER TABLE documents ADD COLUMN record_hash TEXT")
+        rows = self._conn.execute("SELECT doc_id, page_content, metadata FROM documents").fetchall()
+        self._conn.executemany(
+            "UPDATE documents SET record_hash = ? WHERE doc_id = ?",
+            [(record_hash(text, json.loads(metadata)), doc_id) for doc_id, text, metadata in rows]
+        )
+        logger.info(f"Stored record hashes of {len(rows)} documents in {self.path}")
+
+    def _check_writable(self):
+        if not self.writable:
+            raise ValueError(f"Docstore {self.path} is read-only")
+
+    def search(self, search: str) -> Union[str, Document]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT page_content, metadata FROM documents WHERE doc_id = ?", (search,)
+            ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]))
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        self._check_writable()
+        rows = [
+            (
+                doc_id,
+                doc.page_content,
+                json.dumps(doc.metadata, separators=(",", ":"), default=str),
+                record_hash(doc.page_content, doc.metadata)
+            )
+            for doc_id, doc in texts.items()
+        ]
+        with self._lock:
+            try:
+                self._conn.executemany(
+                    "INSERT INTO documents (doc_id, page_content, metadata, record_hash) VALUES (?, ?, ?, ?)", rows
+                )
+            except sqlite3.IntegrityError:
+                self._conn.rollback()
+                raise ValueError(f"Tried to add ids that already exist: {list(texts)}")
+
+    def add_records(self, records: Iterable[Tuple[str, str, Dict]], start: int) -> List[str]:
+        """Insert (doc_id, text, metadata) records at consecutive positions from start, returning their hashes"""
+        self._check_writable()
+        rows = [
+            (
+                doc_id,
+                start + offset,
+                text,
+                json.dumps(metadata, separators=(",", ":"), default=str),
+                record_hash(text, metadata)
+            )
+            for offset, (doc_id, text, metadata) in enumerate(records)
+        ]
+        with self._lock:
+            try:
+                self._conn.executemany(
+                    "INSERT INTO documents (doc_id, position, page_content, metadata, record_hash) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+            except sqlite3.IntegrityError:
+                self._conn.rollback()
+                raise ValueError(f"Tried to add ids or positions that already exist: {[row[0] for row in rows]}")
+        return [row[4] for row in rows]
+
+    def record_hashes(self, ids: Optional[Sequence[str]] = None) -> Dict[str, str]:
+        """Record hash of the given document ids (those stored), or of every document"""
+        if ids is None:
+            with self._lock:
+                return dict(self._conn.execute("SELECT doc_id, record_hash FROM documents").fetchall())
+        found = {}
+        for start in range(0, len(ids), 500):
+            batch = list(ids[start:start + 500])
+            placeholders = ", ".join("?" * len(batch))
+            with self._lock:
+                found.update(self._conn.execute(
+                    f"SELECT doc_id, record_hash FROM documents WHERE doc_id IN ({placeholders})", batch
+                ).fetchall())
+        return found
+
+    def delete(self, ids: List) -> None:
+        self._check_writable()
+        with self._lock:
+            self._conn.executemany("DELETE FROM documents WHERE doc_id = ?", [(doc_id,) for doc_id in ids])
+
+    def metadata_fields(self, fields: Sequence[str], start: int = 0) -> Iterator[Tuple]:
+        """Yield (position, *field values) for every position from start, in order"""
+        columns = ", ".join("json_extract(metadata, ?)" for _ in fields)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT position, {columns} FROM documents WHERE position >= ? ORDER BY position",
+                [f'$."{field}"' for field in fields] + [start]
+            ).fetchall()
+        return iter(rows)
+
+    @property
+    def version(self) -> int:
+        with self._lock:
+            try:
+                row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            except sqlite3.OperationalError:
+                # Saved before the meta table existed
+                return 0
+        return row[0] if row else 0
+
+    def truncate(self, rows: int) -> int:
+        """Delete the documents at positions from rows on (or without one), returning how many there were"""
+        self._check_writable()
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM documents WHERE position >= ? OR position IS NULL", (rows,)
+            ).rowcount
+            self._conn.commit()
+        return deleted
+
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+
+    def rollback(self):
+        with self._lock:
+            self._conn.rollback()
+
+    def copy_to(self, path: str):
+        """Write a consistent copy of the whole store to path"""
+        target = sqlite3.connect(path)
+        try:
+            with self._lock:
+                if self.writable:
+                    self._conn.commit()
+                self._conn.backup(target)
+        finally:
+            target.close()
+
+    def close(self):
+        with self._lock:
+            if self.writable:
+                self._conn.commit()
+            self._conn.close()
+
+
+class DocstorePositions(MutableMapping):
+    """FAISS position -> document id mapping read from a SQLiteDocstore.
+
+    Positions are always 0..n-1, so the length is one past the largest.
+    """
+
+    def __init__(self, docstore: SQLiteDocstore):
+        self.docstore = docstore
+
+    def _execute(self, sql: str, params: Iterable = ()):
+        with self.docstore._lock:
+            return self.docstore._conn.execute(sql, tuple(params)).fetchall()
+
+    def __getitem__(self, position: int) -> str:
+        rows = self._execute("SELECT doc_id FROM documents WHERE position = ?", (int(position),))
+        if not rows:
+            raise KeyError(position)
+        return rows[0][0]
+
+    def __setitem__(self, position: int, doc_id: str):
+        self.docstore._check_writable()
+        self._execute("UPDATE documents SET position = ? WHERE doc_id = ?", (int(position), doc_id))
+
+    def __delitem__(self, position: int):
+        self.docstore._check_writable()
+        self._execute("UPDATE documents SET position = NULL WHERE position = ?", (int(position),))
+
+    def __len__(self) -> int:
+        return self._execute("SELECT COALESCE(MAX(position) + 1, 0) FROM documents")[0][0]
+
+    def __iter__(self) -> Iterator[int]:
+        rows = self._execute("SELECT position FROM documents WHERE position IS NOT NULL ORDER BY position")
+        return (position for position, in rows)
+
+    def items(self) -> List[Tuple[int, str]]:
+        return self._execute(
+            "SELECT position, doc_id FROM documents WHERE position IS NOT NULL ORDER BY position"
+        )
+
+    def values(self) -> List[str]:
+        return [doc_id for _, doc_id in self.items()]
+
+    def update(self, other=(), **kwargs):
+        self.docstore._check_writable()
+        pairs = other.items() if hasattr(other, "items") else other
+        with self.docstore._lock:
+            self.docstore._conn.executemany(
+                "UPDATE documents SET position = ? WHERE doc_id = ?",
+                [(int(position), doc_id) for position, doc_id in pairs]
+            )
+
+    def positions_of(self, ids: Sequence[str]) -> Dict[str, int]:
+        """Positions of the given document ids (ids not stored are left out)"""
+        found = {}
+        for start in range(0, len(ids), 500):
+            batch = list(ids[start:start + 500])
+            placeholders = ", ".join("?" * len(batch))
+            found.update(self._execute(
+                f"SELECT doc_id, position FROM documents WHERE doc_id IN ({placeholders})", batch
+            ))
+        return found
+
+    def compact(self, dropped: Sequence[int]):
+        """Renumber positions after the vectors at dropped were removed from the index"""
+        self.docstore._check_writable()
+        with self.docstore._lock:
+            conn = self.docstore._conn
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS dropped (position INTEGER PRIMARY KEY)")
+            conn.execute("DELETE FROM dropped")
+            conn.executemany("INSERT INTO dropped VALUES (?)", [(int(position),) for position in dropped])
+            # Through negative values so no two rows ever share a position
+            conn.execute("""
+                UPDATE documents SET position = -1 - (
+                    position - (SELECT COUNT(*) FROM dropped WHERE dropped.position < documents.position)
+                ) WHERE position IS NOT NULL
+            """)
+            conn.execute("UPDATE documents SET position = -1 - position WHERE position IS NOT NULL")
+            conn.execute("""
+                INSERT INTO meta (key, value) VALUES ('version', 1)
+                ON CONFLICT (key) DO UPDATE SET value = value + 1
+            """)
+
+
+def write_docstore(path: str, docstore, index_to_docstore_id) -> SQLiteDocstore:
+    """Write an in-memory docstore and its position mapping to a new SQLite docstore at path"""
+    store = SQLiteDocstore(path, writable=True)
+    batch = {}
+    positions = {}
+    for position, doc_id in sorted(index_to_docstore_id.items()):
+        document = docstore.search(doc_id)
+        if not isinstance(document, Document):
+            raise ValueError(f"Could not find document for id {doc_id}, got {document}")
+        batch[doc_id] = document
+        positions[position] = doc_id
+        if len(batch) >= WRITE_BATCH_SIZE:
+            store.add(batch)
+            store.positions.update(positions)
+            batch, positions = {}, {}
+    store.add(batch)
+    store.positions.update(positions)
+    store.close()
+    return store
+
+
+def migrate_pickle_docstore(directory: str) -> bool:
+    """Convert a store's index.pkl (docstore and id map) to docstore.sqlite and delete the pickle.
+
+    Stores saved before the SQLite docstore was introduced are migrated the
+    first time they are opened; this is the only place a pickle is read.
+    """
+    import pickle
+
+    pickle_path = os.path.join(directory, "index.pkl")
+    if not os.path.exists(pickle_path):
+        return False
+
+    logger.info(f"Migrating {pickle_path} to {DOCSTORE_FILE}")
+    with open(pickle_path, "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+
+    tmp_path = os.path.join(directory, f"{DOCSTORE_FILE}.tmp")
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    write_docstore(tmp_path, docstore, index_to_docstore_id)
+    os.replace(tmp_path, os.path.join(directory, DOCSTORE_FILE))
+    os.remove(pickle_path)
+    return True
@@ -0,0 +1,175 @@
+import os
+import json
+import atexit
+import shutil
+import logging
+import threading
+import weakref
+from typing import Callable, Dict, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain.vectorstores import FAISS
+
+from utils.faiss_index import read_index
+from utils.sqlite_docstore import DOCSTORE_FILE, SQLiteDocstore, migrate_pickle_docstore, write_docstore
+from utils.vector_store_manifest import INDEX_FILE, MANIFEST_FILE
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Persisters with changes that may not be on disk yet, flushed at exit
+_persisters = weakref.WeakSet()
+
+
+def attach_docstore(vector_store, path: str, writable: bool = False):
+    """Serve the store's documents from the docstore saved at path instead of memory"""
+    vector_store.docstore = SQLiteDocstore(os.path.join(path, DOCSTORE_FILE), writable=writable)
+    vector_store.index_to_docstore_id = vector_store.docstore.positions
+
+
+def save_vector_store_atomic(vector_store, path: str, manifest: Optional[Dict] = None):
+    """Persist a FAISS vector store so readers never see a half-written index.
+
+    The index, docstore and manifest (if given) are written to a sibling
+    temp directory which is then swapped into place, keeping index.faiss,
+    docstore.sqlite and manifest.json consistent with each other. A store
+    whose docstore is already SQLite-backed reads it from the saved copy
+    afterwards (writable if it was).
+    """
+    path = os.path.normpath(path)
+    tmp_path = f"{path}.tmp"
+    old_path = f"{path}.old"
+
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    faiss.write_index(vector_store.index, os.path.join(tmp_path, INDEX_FILE))
+
+    docstore = vector_store.docstore
+    docstore_file = os.path.join(tmp_path, DOCSTORE_FILE)
+    if isinstance(docstore, SQLiteDocstore) and docstore.writable:
+        docstore.close()
+        os.replace(docstore.path, docstore_file)
+    elif isinstance(docstore, SQLiteDocstore):
+        docstore.copy_to(docstore_file)
+    else:
+        write_docstore(docstore_file, docstore, vector_store.index_to_docstore_id)
+
+    if manifest is not None:
+        with open(os.path.join(tmp_path, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, separators=(",", ":"))
+
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+    if isinstance(docstore, SQLiteDocstore):
+        if not docstore.writable:
+            docstore.close()
+        attach_docstore(vector_store, path, docstore.writable)
+    logger.debug(f"Persisted vector store to {path}")
+
+
+def _replace_file(path: str, write: Callable):
+    """Write a file through a temp file and rename, so readers see the old or the new contents"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_index_files(path: str, index_data: np.ndarray, manifest: Dict):
+    """Replace the index (as serialized by faiss.serialize_index) and then the manifest of the store at path.
+
+    The docstore is written in place beforehand, so a crash in between
+    leaves it ahead of the index: load_vector_store drops its extra
+    documents, and a manifest that no longer matches the index makes the
+    owner rebuild.
+    """
+    _replace_file(os.path.join(path, INDEX_FILE), index_data.tofile)
+    _replace_file(
+        os.path.join(path, MANIFEST_FILE),
+        lambda f: f.write(json.dumps(manifest, separators=(",", ":")).encode())
+    )
+    logger.debug(f"Persisted index and manifest to {path}")
+
+
+class IndexPersister:
+    """Writes a store's index and manifest after changes, batched and outside the owner's lock.
+
+    snapshot() is called with the owner's lock held; it returns None when
+    nothing changed since the last write, or (token, serialized index,
+    manifest). The files are written after it returns, then on_persisted is
+    called with the token. schedule() writes at most once per interval
+    seconds; flush() writes now.
+    """
+
+    def __init__(self,
+                 path: str,
+                 snapshot: Callable[[], Optional[Tuple[int, np.ndarray, Dict]]],
+                 on_persisted: Optional[Callable[[int], None]] = None,
+                 interval: float = 2.0):
+        self.path = path
+        self.snapshot = snapshot
+        self.on_persisted = on_persisted
+        self.interval = interval
+        self._write_lock = threading.Lock()
+        self._timer_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        _persisters.add(self)
+
+    def schedule(self):
+        """Write the store within interval seconds, together with any later changes"""
+        with self._timer_lock:
+            if self._timer is None:
+                self._timer = threading.Timer(self.interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Write the store now if it changed since the last write"""
+        with self._timer_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        try:
+            with self._write_lock:
+                snapshot = self.snapshot()
+                if snapshot is None:
+                    return
+                token, index_data, manifest = snapshot
+                write_index_files(self.path, index_data, manifest)
+            if self.on_persisted is not None:
+                self.on_persisted(token)
+        except Exception as e:
+            logger.error(f"Error persisting vector store to {self.path}: {str(e)}")
+
+
+@atexit.register
+def _flush_persisters():
+    for persister in list(_persisters):
+        persister.flush()
+
+
+def load_vector_store(path: str, embeddings, mmap: bool = False, writable: bool = False) -> FAISS:
+    """Open a store written by save_vector_store_atomic, optionally memory-mapping its index.
+
+    Documents stay on disk and are read as search hits need them. Stores
+    still holding a pickled docstore (index.pkl) are migrated first. A
+    writable docstore drops documents added after the index was last
+    written (by a process that stopped before persisting them).
+    """
+    if not os.path.exists(os.path.join(path, DOCSTORE_FILE)):
+        migrate_pickle_docstore(path)
+
+    index = read_index(os.path.join(path, INDEX_FILE), mmap)
+    docstore = SQLiteDocstore(os.path.join(path, DOCSTORE_FILE), writable=writable)
+    if writable:
+        dropped = docstore.truncate(index.ntotal)
+        if dropped:
+            logger.warning(f"Dropped {dropped} documents of {path} that were added after its index was saved")
+    return FAISS(embeddings, index, docstore, docstore.positions)
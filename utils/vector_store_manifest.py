@@ -0,0 +1,117 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.faiss_index import accepts_index_type
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+# Version 1 manifests also listed the hash of every record (now kept in the
+# docstore); they are still read, and rewritten as version 2 on the next save
+MANIFEST_VERSION = 2
+INDEX_FILE = "index.faiss"
+
+# Record hashes are summed modulo 2**160 (their SHA-1 width) into the
+# digest, so a record can be added or removed without re-reading the rest
+_DIGEST_MODULUS = 2 ** 160
+EMPTY_DIGEST = "0" * 40
+
+
+def record_hash(text: str, metadata: Dict) -> str:
+    """Fingerprint of one indexed record (its embedded text and stored metadata)"""
+    payload = json.dumps([text, metadata], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def update_digest(digest: str, added: Iterable[str] = (), removed: Iterable[str] = ()) -> str:
+    """Digest of a collection of records after adding and removing the given record hashes"""
+    value = int(digest, 16) + sum(int(h, 16) for h in added) - sum(int(h, 16) for h in removed)
+    return f"{value % _DIGEST_MODULUS:040x}"
+
+
+def records_digest(hashes: Iterable[str]) -> str:
+    """Fingerprint of a whole collection of record hashes, independent of their order"""
+    return update_digest(EMPTY_DIGEST, hashes)
+
+
+def build_manifest(model_name: str,
+                   dimension: int,
+                   rows: int,
+                   digest: str,
+                   index_type: str = "flat",
+                   storage: str = "float32",
+                   docstore_version: int = 0,
+                   source: Optional[Dict] = None) -> Dict:
+    """Manifest describing an index (of the type actually built) and the records it holds.
+
+    source is the position in the records' source the index is known to be
+    up to date with, if the owner tracks one.
+    """
+    return {
+        "version": MANIFEST_VERSION,
+        "model_name": model_name,
+        "index_type": index_type,
+        "storage": storage,
+        "dimension": dimension,
+        "rows": rows,
+        "digest": digest,
+        "docstore_version": docstore_version,
+        "source": source,
+        "updated_at": time.time()
+    }
+
+
+def load_manifest(path: str) -> Optional[Dict]:
+    """Read the manifest of the index at path, None if there is no usable index"""
+    if not os.path.exists(os.path.join(path, INDEX_FILE)):
+        return None
+    try:
+        with open(os.path.join(path, MANIFEST_FILE), "r") as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if manifest.get("version") not in (1, MANIFEST_VERSION):
+        return None
+    return manifest
+
+
+def check_manifest(manifest: Optional[Dict],
+                   model_name: str,
+                   vector_store=None,
+                   index_type: str = "flat",
+                   storage: str = "float32") -> Optional[str]:
+    """Reason the index cannot be reused, or None if it matches the model, index layout (and loaded store)"""
+    if manifest is None:
+        return "no index with a manifest"
+    if manifest["model_name"] != model_name:
+        return f"built with {manifest['model_name']}, not {model_name}"
+    built_type = manifest.get("index_type", "flat")
+    if not accepts_index_type(built_type, index_type, manifest["rows"]):
+        return f"built as a {built_type} index, not {index_type}"
+    if manifest.get("storage", "float32") != storage:
+        return f"stores {manifest.get('storage', 'float32')} vectors, not {storage}"
+    if vector_store is not None:
+        if vector_store.index.d != manifest["dimension"]:
+            return f"dimension {vector_store.index.d} does not match manifest ({manifest['dimension']})"
+        if vector_store.index.ntotal != manifest["rows"]:
+            return f"{vector_store.index.ntotal} vectors but manifest lists {manifest['rows']} rows"
+        docstore_version = getattr(vector_store.docstore, "version", None)
+        if docstore_version is not None and docstore_version != manifest.get("docstore_version", 0):
+            return "docstore was renumbered after the index was saved"
+    return None
+
+
+def diff_records(indexed: Dict[str, str], current: Dict[str, str]) -> Tuple[List[str], List[str], List[str]]:
+    """Ids that were added, changed and removed between the indexed and current records"""
+    added = [record_id for record_id in current if record_id not in indexed]
+    changed = [
+        record_id for record_id, digest in current.items()
+        if record_id in indexed and indexed[record_id] != digest
+    ]
+    removed = [record_id for record_id in indexed if record_id not in current]
+    return added, changed, removed